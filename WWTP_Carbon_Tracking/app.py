@@ -1,23 +1,104 @@
 # app.py
 import streamlit as st
 import pandas as pd
-import re
-import numpy as np
 import math
 import time
 import os
 import sys
 import json
+import functools
+import tempfile
 from PIL import Image
 import plotly.graph_objects as go
-from streamlit.components.v1 import html
+import streamlit.components.v1 as components
 
 # 添加src目录到系统路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 # 修复导入问题
-from src.carbon_calculator import CarbonCalculator
+from src.carbon_calculator import AREA_COLUMNS
+from src.data_ingestion import load_compact_operating_data, memory_report, COLUMN_MAPPING
+from src.column_resolver import ColumnResolver, default_profile_dir
+from src.upload_cache import UploadCache
+from src.month_index import MonthIndex
+from src.uncertainty import MonteCarloEngine
+from src.scenario_sweep import ENERGY_RANGE, SWEEP_COVERED_AREAS, ScenarioSweep
+from src.emission_factors import FactorRegistry
+from src.unit_allocation import UnitAllocation
+from src.plant_diagram import PlantDiagramEngine
+from src.figure_cache import FigureCache
+from src.incremental_calculator import IncrementalCalculator
+from src.pipeline import ComputePipeline, history_results, month_results
 import src.visualization as vis
 
+# 启用pandas写时复制：切片与列选择不再隐式复制整表，也不会回写session_state中的原表
+pd.set_option("mode.copy_on_write", True)
+
+
+@st.cache_resource
+def get_upload_cache():
+    """跨会话共享的上传数据缓存（内存LRU + 临时目录下的Parquet磁盘缓存）"""
+    return UploadCache(cache_dir=os.path.join(tempfile.gettempdir(), "wwtp_carbon_uploads"), version="2")
+
+
+@st.cache_resource
+def get_figure_cache():
+    """跨会话共享的图表缓存（同一份上传、同一月份的图表只生成一次）"""
+    return FigureCache()
+
+
+@st.cache_resource
+def get_unit_allocation():
+    """排放源→工艺单元分配矩阵（由 src/unit_allocation.py 中的单元配置生成）"""
+    return UnitAllocation.from_areas()
+
+
+@st.cache_resource
+def get_column_resolver():
+    """跨会话共享的列名解析器（用户确认后的各厂站列映射保存在用户缓存目录，见 default_profile_dir）"""
+    return ColumnResolver(exact=COLUMN_MAPPING, profile_dir=default_profile_dir())
+
+
+def build_pipeline(incremental_calc):
+    """本会话的计算流水线：读取 → 月份切片 / 全历史核算 → 当月核算 → 单元分配、区域合计 → 图表
+
+    参数 upload（上传文件内容，指纹为内容哈希）、month（选中月份）、factor_registry（因子库，
+    指纹为因子文件哈希）、factor_set（因子集及其版本）变化时只重算其下游节点，其余节点直接复用上次结果。
+    """
+    pipeline = ComputePipeline()
+    pipeline.declare_param("upload", "month", "factor_registry", "factor_set")
+
+    def ingest(data):
+        # 按文件内容哈希取跨会话缓存；解析后立即压缩：去掉核算不用的列，测量列降为float32
+        loader = functools.partial(load_compact_operating_data, resolver=get_column_resolver())
+        df, upload_info = get_upload_cache().get_or_load(data, loader, key=pipeline.fingerprint("upload"))
+        # 月份索引每次上传只构建一次，选择月份为按行号切片
+        return MonthIndex(df), upload_info
+
+    def figures(df_calc, emission_data):
+        # 图表按核算节点指纹（上传内容、月份、因子集及版本）跨会话缓存
+        figure_key = pipeline.fingerprint("carbon")
+        figure_cache = get_figure_cache()
+        return {
+            "heatmap": figure_cache.get_or_build(
+                "heatmap", figure_key, lambda: vis.create_heatmap_overlay(emission_data)),
+            "efficiency_ranking": figure_cache.get_or_build(
+                "efficiency_ranking", figure_key, lambda: vis.create_efficiency_ranking(df_calc))
+        }
+
+    pipeline.add_node("ingest", ingest, ["upload"])
+    pipeline.add_node("month_slice", lambda ingested, month: ingested[0].select(month), ["ingest", "month"])
+    # 全历史核算只在上传内容变化时运行：本会话的增量核算器只重新核算新增或变化的行
+    pipeline.add_node("history", lambda ingested: history_results(ingested[0], incremental_calc), ["ingest"])
+    pipeline.add_node("carbon", lambda ingested, *args: month_results(ingested[0], *args),
+                      ["ingest", "history", "month", "factor_registry", "factor_set"])
+    # 各工艺单元日均排放：排放源×单元分配矩阵一次矩阵乘法
+    pipeline.add_node("unit_emissions", lambda df_calc: get_unit_allocation().daily_mean(df_calc), ["carbon"])
+    pipeline.add_node("area_totals",
+                      lambda df_calc: {area: df_calc[col].sum() for area, col in AREA_COLUMNS.items()}, ["carbon"])
+    pipeline.add_node("figures", figures, ["carbon", "area_totals"])
+    return pipeline
+
+
 # 页面配置
 st.set_page_config(page_title="污水处理厂碳足迹追踪系统", layout="wide", page_icon="🌍")
 st.title("基于碳核算-碳账户模型的污水处理厂碳足迹追踪与评估系统")
@@ -27,8 +108,22 @@ if 'df' not in st.session_state:
     st.session_state.df = None
 if 'df_calc' not in st.session_state:
     st.session_state.df_calc = None
+if 'incremental_calc' not in st.session_state:
+    st.session_state.incremental_calc = IncrementalCalculator()
+if 'pipeline' not in st.session_state:
+    st.session_state.pipeline = build_pipeline(st.session_state.incremental_calc)
+if 'month_index' not in st.session_state:
+    st.session_state.month_index = None
+if 'history_calc' not in st.session_state:
+    st.session_state.history_calc = None
 if 'selected_month' not in st.session_state:
     st.session_state.selected_month = None
+if 'factor_registry' not in st.session_state:
+    st.session_state.factor_registry = FactorRegistry()
+if 'factor_file_key' not in st.session_state:
+    st.session_state.factor_file_key = None
+if 'factor_set' not in st.session_state:
+    st.session_state.factor_set = None
 if 'unit_data' not in st.session_state:
     st.session_state.unit_data = {
         "粗格栅": {"water_flow": 10000.0, "energy": 1500.0, "emission": 450.0, "enabled": True},
@@ -74,6 +169,8 @@ if 'water_quality' not in st.session_state:
     }
 if 'last_clicked_unit' not in st.session_state:
     st.session_state.last_clicked_unit = None
+if 'last_unit_click' not in st.session_state:
+    st.session_state.last_unit_click = None
 if 'unit_details' not in st.session_state:
     st.session_state.unit_details = {}
 if 'flow_data' not in st.session_state:
@@ -81,87 +178,46 @@ if 'flow_data' not in st.session_state:
         "flow_rate": 10000,
         "direction": "right"
     }
+if 'plant_figure_cache' not in st.session_state:
+    # 工艺动画图随本会话编辑的单元参数变化，只在会话内缓存，不写入跨会话共享的图表缓存
+    st.session_state.plant_figure_cache = FigureCache(max_entries=4)
+
+pipeline = st.session_state.pipeline
+pipeline.begin_run()
 
 # 侧边栏：数据输入与处理
 with st.sidebar:
     st.header("数据输入与设置")
     # 上传运行数据（表格）
-    data_file = st.file_uploader("上传运行数据（Excel）", type=["xlsx"])
+    data_file = st.file_uploader("上传运行数据（Excel/CSV）", type=["xlsx", "xls", "csv"])
     if data_file:
         try:
-            # 读取多级表头（前2行为表头）
-            df = pd.read_excel(data_file, header=[0, 1])
-            # 合并多级表头为单级列名
-            new_columns = []
-            for col in df.columns:
-                part1 = str(col[0]).strip()  # 第一行表头（指标名）
-                part2 = str(col[1]).strip() if not pd.isna(col[1]) else ""  # 第二行表头（状态/单位）
-                # 改进合并规则：去除多余空格和换行符
-                merged_col = f"{part1}_{part2}" if part2 else part1
-                merged_col = re.sub(r'\s+', ' ', merged_col)  # 替换多个空格为单个空格
-                merged_col = merged_col.replace('\n', '')  # 移除换行符
-                new_columns.append(merged_col)
-            df.columns = new_columns
+            # 以文件内容哈希为参数指纹，同一文件的重跑不再重新解析表格和核算全历史
+            data = data_file.getvalue()
+            pipeline.set_param("upload", data, fingerprint=UploadCache.content_hash(data))
+            month_index, upload_info = pipeline.get("ingest")
             # 调试：显示合并后的列名
             st.subheader("合并后的列名")
-            col_dict = {i: col for i, col in enumerate(df.columns)}
+            col_dict = {i: col for i, col in enumerate(upload_info["columns"])}
             st.write(col_dict)  # 使用字典格式显示列名
-            # 列名映射（根据实际列名调整）
-            date_col_candidates = [col for col in df.columns if "日期" in col]
-            if not date_col_candidates:
-                st.error("错误：表格中未找到包含'日期'的列，请检查表格结构！")
-                st.stop()
-            date_col = date_col_candidates[0]  # 自动获取日期列实际名称
-            # 修正映射关系（根据实际列名）
-            column_mapping = {
-                date_col: "日期",
-                "处理水量 m3/d_Unnamed: 1_level_1": "处理水量(m³)",
-                "能耗 kWh/d_Unnamed: 2_level_1": "电耗(kWh)",
-                "自来水 m³/d_Unnamed: 3_level_1": "自来水(m³/d)",
-                "CODcr(mg/l)_进水": "进水COD(mg/L)",
-                "CODcr(mg/l)_出水": "出水COD(mg/L)",
-                "SS(mg/l)_进水": "进水SS(mg/L)",
-                "SS(mg/l)_出水": "出水SS(mg/L)",
-                "NH3-N(mg/l)_进水": "进水NH3-N(mg/L)",
-                "NH3-N(mg/l)_出水": "出水NH3-N(mg/L)",
-                "TN(mg/l)_进水": "进水TN(mg/L)",
-                "TN(mg/l)_出水": "出水TN(mg/L)",
-                "PAC消耗 kg/d_Unnamed: 12_level_1": "PAC投加量(kg)",
-                "次氯酸钠消耗 kg/d_Unnamed: 13_level_1": "次氯酸钠投加量(kg)",
-                "污泥脱水药剂消耗(PAM) kg/d_Unnamed: 14_level_1": "PAM投加量(kg)",
-                "脱水污泥外运量(80%)_Unnamed: 15_level_1": "脱水污泥外运量(80%)"
-            }
-            # 应用映射
-            df = df.rename(columns=column_mapping)
-            # 检查必需的列是否存在
-            required_columns = [
-                "日期", "处理水量(m³)", "电耗(kWh)", "进水COD(mg/L)", "出水COD(mg/L)",
-                "进水TN(mg/L)", "出水TN(mg/L)", "PAC投加量(kg)", "次氯酸钠投加量(kg)", "PAM投加量(kg)"
-            ]
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                col_dict = {i: col for i, col in enumerate(df.columns)}
-                st.error(f"错误：映射后仍缺少以下必需列：{missing_columns}。当前列名：{col_dict}")
-                st.stop()
-            # 改进日期解析
-            if df["日期"].dtype in [np.int64, np.float64]:
-                # 处理Excel序列号日期
-                base_date = pd.Timestamp("1899-12-30")
-                df["日期"] = base_date + pd.to_timedelta(df["日期"], unit='D')
-            else:
-                # 处理文本格式日期
-                df["日期"] = pd.to_datetime(df["日期"], errors="coerce", format='mixed')
+            # 含模糊匹配的列映射须由用户确认后才保存为厂站配置，同一布局下次直接使用
+            resolver = get_column_resolver()
+            if resolver.needs_confirmation(upload_info["columns"], upload_info["mapping"]):
+                with st.expander("确认列名映射", expanded=True):
+                    st.write(upload_info["mapping"])
+                    plant_name = st.text_input("厂站名称（可选）")
+                    if st.button("确认并保存列映射"):
+                        resolver.save_profile(upload_info["columns"], upload_info["mapping"],
+                                              plant=plant_name or None)
+                        st.success("列映射已保存")
             # 处理无效日期
-            invalid_rows = df[df["日期"].isna()].index.tolist()
+            invalid_rows = upload_info["invalid_rows"]
             if invalid_rows:
                 st.warning(f"警告：表格第{[i + 3 for i in invalid_rows]}行（表头占2行）日期格式无效，已过滤")
-            df = df.dropna(subset=["日期"]).sort_values("日期")
-            if len(df) == 0:
-                st.error("错误：没有有效日期数据，请检查表格日期格式")
-                st.stop()
-            # 创建年月选择（动态生成）
-            df["年月"] = df["日期"].dt.strftime("%Y年%m月")
-            unique_months = df["年月"].unique().tolist()
+            st.session_state.month_index = month_index
+            st.session_state.history_calc = pipeline.get("history")
+            df = month_index.frame
+            unique_months = month_index.labels
             st.success(
                 f"数据加载成功！共{len(df)}条有效记录（覆盖{df['日期'].dt.year.min()}-{df['日期'].dt.year.max()}年度）")
             # 月份选择器
@@ -170,591 +226,132 @@ with st.sidebar:
                 unique_months,
                 index=len(unique_months) - 1 if unique_months else 0
             )
-            df_selected = df[df["年月"] == selected_month].drop(columns=["年月"])
+            pipeline.set_param("month", selected_month)
+            df_selected = pipeline.get("month_slice")
             st.session_state.df = df  # 存储整个df
             st.session_state.df_selected = df_selected  # 存储选中的月份数据
             st.session_state.selected_month = selected_month
+            # 各阶段内存占用（切片与原表共享内存时会重复计入）
+            with st.expander("内存占用报告"):
+                st.dataframe(memory_report({
+                    "原始上传文件": len(data),
+                    "解析后": upload_info["memory"]["解析后"],
+                    "压缩后": upload_info["memory"]["压缩后"],
+                    "全部数据（含月份键）": df,
+                    "当月切片": df_selected,
+                    "全历史核算结果": st.session_state.history_calc,
+                    "增量核算缓存": st.session_state.incremental_calc.nbytes()
+                }), hide_index=True, use_container_width=True)
+                st.caption("原始上传文件、全历史核算结果与增量核算缓存由每个会话各自保存，"
+                           "压缩只减少解析后数据表本身的占用")
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
         except Exception as e:
             st.error(f"数据加载错误: {str(e)}")
             st.stop()
-    # 工艺优化参数
-    st.header("工艺优化模拟")
-    aeration_adjust = st.slider("曝气时间调整（%）", -30, 30, 0)
-    pac_adjust = st.slider("PAC投加量调整（%）", -20, 20, 0)
+    # 排放因子版本：分年度、分省份的电网因子及修订后的药剂因子，按日期逐行生效
+    with st.expander("排放因子版本"):
+        factor_file = st.file_uploader("上传因子记录（CSV：set_id, factor, valid_from, valid_to, value）",
+                                       type=["csv"])
+        if factor_file:
+            factor_key = UploadCache.content_hash(factor_file.getvalue())
+            if st.session_state.factor_file_key != factor_key:
+                try:
+                    registry = FactorRegistry()
+                    registry.load_csv(factor_file)
+                    st.session_state.factor_registry = registry
+                    st.session_state.factor_file_key = factor_key
+                except ValueError as e:
+                    st.error(str(e))
+        factor_set = st.selectbox("排放因子集", ["默认因子", *st.session_state.factor_registry.set_ids])
+        st.session_state.factor_set = None if factor_set == "默认因子" else factor_set
     # 动态效果控制
     st.header("动态效果设置")
     st.session_state.animation_active = st.checkbox("启用动态水流效果", value=True)
     st.session_state.flow_data["flow_rate"] = st.slider("水流速度", 1000, 20000, 10000)
 
 # 主界面使用选项卡组织内容
-tab1, tab2, tab3, tab4 = st.tabs(["工艺流程仿真", "碳足迹追踪", "碳账户管理", "优化与决策"])
-
-
-# 工艺流程图HTML组件
-def create_plant_diagram(selected_unit=None, flow_position=0, flow_rate=10000, animation_active=True):
-    # 创建动态水流效果
-    flow_animation = "animation: flow 10s linear infinite;" if animation_active else ""
-
-    # 创建工艺流程图HTML
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>污水处理厂工艺流程</title>
-        <style>
-            .plant-container {{
-                position: relative;
-                width: 100%;
-                height: 900px;
-                background-color: #e6f7ff;
-                border: 2px solid #0078D7;
-                border-radius: 10px;
-                overflow: hidden;
-                font-family: Arial, sans-serif;
-            }}
-
-            .unit {{
-                position: absolute;
-                border: 2px solid #2c3e50;
-                border-radius: 8px;
-                padding: 10px;
-                text-align: center;
-                cursor: pointer;
-                transition: all 0.3s;
-                font-weight: bold;
-                color: white;
-                display: flex;
-                flex-direction: column;
-                justify-content: center;
-                align-items: center;
-                z-index: 10;
-            }}
-
-            .unit:hover {{
-                transform: scale(1.05);
-                box-shadow: 0 5px 15px rgba(0,0,0,0.3);
-                z-index: 20;
-            }}
-
-            .unit.active {{
-                border: 3px solid #FFD700;
-                box-shadow: 0 0 10px #FFD700;
-            }}
-
-            .unit-name {{
-                font-size: 15px;
-                margin-bottom: 5px;
-                text-shadow: 1px 1px 2px rgba(0,0,0,0.7);
-            }}
-
-            .unit-status {{
-                font-size: 12px;
-                padding: 2px 5px;
-                border-radius: 3px;
-                background-color: rgba(255,255,255,0.2);
-            }}
-
-            .pre-treatment {{ background-color: #3498db; }}
-            .bio-treatment {{ background-color: #2ecc71; }}
-            .advanced-treatment {{ background-color: #e74c3c; }}
-            .sludge-treatment {{ background-color: #f39c12; }}
-            .auxiliary {{ background-color: #9b59b6; }}
-            .effluent-area {{ background-color: #1abc9c; }}
-
-            .flow-line {{
-                position: absolute;
-                background-color: #1e90ff;
-                z-index: 5;
-            }}
-
-            .water-flow {{
-                position: absolute;
-                background: linear-gradient(90deg, transparent, rgba(30, 144, 255, 0.8), transparent);
-                {flow_animation}
-                z-index: 6;
-                border-radius: 3px;
-            }}
-
-            .gas-flow {{
-                position: absolute;
-                background: linear-gradient(90deg, transparent, rgba(169, 169, 169, 0.8), transparent);
-                {flow_animation}
-                z-index: 6;
-                border-radius: 3px;
-            }}
-
-            .sludge-flow {{
-                position: absolute;
-                background: linear-gradient(90deg, transparent, rgba(139, 69, 19, 0.8), transparent);
-                {flow_animation}
-                z-index: 6;
-                border-radius: 3px;
-            }}
-
-            .air-flow {{
-                position: absolute;
-                background: linear-gradient(90deg, transparent, rgba(255, 255, 255, 0.6), transparent);
-                {flow_animation}
-                z-index: 6;
-                border-radius: 3px;
-            }}
-
-            .flow-arrow {{
-                position: absolute;
-                width: 0;
-                height: 0;
-                border-style: solid;
-                z-index: 7;
-            }}
-
-            .flow-label {{
-                position: absolute;
-                font-size: 13px;
-                background: rgba(255, 255, 255, 0.7);
-                padding: 2px 5px;
-                border-radius: 3px;
-                z-index: 8;
-            }}
-
-            .special-flow-label {{
-                position: absolute;
-                color: black;
-                font-size: 15px;  /* 这里设置你需要的字体大小 */
-                background:none;
-            }}
-
-            .particle {{
-                position: absolute;
-                width: 4px;
-                height: 4px;
-                border-radius: 50%;
-                background-color: #1e90ff;
-                z-index: 9;
-                opacity: 0.7;
-            }}
-
-            .sludge-particle {{
-                background-color: #8B4513;
-            }}
-
-            .gas-particle {{
-                background-color: #A9A9A9;
-            }}
-
-            .waste-particle {{
-                background-color: #FF6347;
-            }}
-
-            .air-particle {{
-                background-color: #FFFFFF;
-            }}
-
-            .info-panel {{
-                position: absolute;
-                bottom: 10px;
-                left: 10px;
-                background-color: rgba(255, 255, 255, 0.9);
-                padding: 10px;
-                border-radius: 5px;
-                border: 1px solid #ccc;
-                z-index: 100;
-                font-size: 12px;
-                max-width: 250px;
-            }}
-
-            .bio-deodorization {{
-                position: absolute;
-                text-align: center;
-                font-weight: bold;
-                color: #333;
-                z-index: 10;
-            }}
-
-            /* 区域标注样式 */
-            .region-box {{
-                position: absolute;
-                border: 3px solid;
-                border-radius: 10px;
-                z-index: 3;
-                opacity: 0.3;
-            }}
-
-            .region-label {{
-                position: absolute;
-                font-weight: bold;
-                font-size: 16px;
-                color: black;
-                text-shadow: 1px 1px 2px white;
-                z-index: 4;
-            }}
-
-            .region-pre-treatment {{
-                background-color: rgba(52, 152, 219, 0.3);
-                border-color: #3498db;
-            }}
-
-            .region-bio-treatment {{
-                background-color: rgba(46, 204, 113, 0.3);
-                border-color: #2ecc71;
-            }}
-
-            .region-advanced-treatment {{
-                background-color: rgba(231, 76, 60, 0.3);
-                border-color: #e74c3c;
-            }}
-
-            .region-sludge-treatment {{
-                background-color: rgba(243, 156, 18, 0.3);
-                border-color: #f39c12;
-            }}
-
-            .region-effluent-area {{
-                background-color: rgba(26, 188, 156, 0.3);
-                border-color: #1abc9c;
-            }}
-
-            @keyframes flow {{
-                0% {{ background-position: -100% 0; }}
-                100% {{ background-position: 200% 0; }}
-            }}
-
-            @keyframes moveParticle {{
-                0% {{ transform: translateX(0); }}
-                100% {{ transform: translateX(50px); }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="plant-container">
-            <!-- 区域标注框 -->
-            <!-- 预处理区 -->
-            <div class="region-box region-pre-treatment" style="top: 126px; left: 110px; width: 783px; height: 142px;"></div>
-            <div class="region-label" style="top: 133px; left: 120px;">预处理区</div>
-
-            <!-- 生物处理区 -->
-            <div class="region-box region-bio-treatment" style="top: 400px; left: 490px; width: 415px; height: 140px;"></div>
-            <div class="region-label" style="top: 405px; left: 500px;">生物处理区</div>
-
-            <!-- 深度处理区 -->
-            <div class="region-box region-advanced-treatment" style="top: 620px; left: 500px; width: 370px; height: 140px;"></div>
-            <div class="region-label" style="top: 735px; left: 520px;">深度处理区</div>
-
-            <!-- 泥处理区 -->
-            <div class="region-box region-sludge-treatment" style="top: 400px; left: 270px; width: 170px; height: 200px;"></div>
-            <div class="region-label" style="top: 405px; left: 280px;">泥处理区</div>
-
-            <!-- 出水区 -->
-            <div class="region-box region-effluent-area" style="top: 640px; left: 180px; width: 250px; height: 100px;"></div>
-            <div class="region-label" style="top: 650px; left: 190px;">出水区</div>
-
-            <!-- 新增除臭系统区域标注框 -->
-            <div class="region-box region-effluent-area" style="top: 282px; left: 26px; width: 135px; height: 160px;"></div>
-            <div class="region-label" style="top: 286px; left: 35px;">出水区</div>
-
-            <!-- 工艺单元 -->
-            <!-- 第一行：预处理区 -->
-            <div class="unit pre-treatment" style="top: 160px; left: 150px; width: 90px; height: 60px;" onclick="selectUnit('粗格栅')">
-                <div class="unit-name">粗格栅</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit pre-treatment" style="top: 160px; left: 300px; width: 90px; height: 60px;" onclick="selectUnit('提升泵房')">
-                <div class="unit-name">提升泵房</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit pre-treatment" style="top: 160px; left: 450px; width: 90px; height: 60px;" onclick="selectUnit('细格栅')">
-                <div class="unit-name">细格栅</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit pre-treatment" style="top: 160px; left: 600px; width: 90px; height: 60px;" onclick="selectUnit('曝气沉砂池')">
-                <div class="unit-name">曝气沉砂池</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit pre-treatment" style="top: 160px; left: 750px; width: 90px; height: 60px;" onclick="selectUnit('膜格栅')">
-                <div class="unit-name">膜格栅</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <!-- 第二行：生物处理区（中行） -->
-            <div class="unit bio-treatment" style="top: 430px; left: 810px; width: 50px; height: 60px;" onclick="selectUnit('厌氧池')">
-                <div class="unit-name">厌氧池</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit bio-treatment" style="top: 430px; left: 750px; width: 50px; height: 60px;" onclick="selectUnit('缺氧池')">
-                <div class="unit-name">缺氧池</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit bio-treatment" style="top: 430px; left: 690px; width: 50px; height: 60px;" onclick="selectUnit('好氧池')">
-                <div class="unit-name">好氧池</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit bio-treatment" style="top: 430px; left: 520px; width: 90px; height: 60px;" onclick="selectUnit('MBR膜池')">
-                <div class="unit-name">MBR膜池</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit sludge-treatment" style="top: 430px; left: 300px; width: 90px; height: 60px;" onclick="selectUnit('污泥处理车间')">
-                <div class="unit-name">污泥处理车间</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <!-- 中行最右侧：鼓风机房 -->
-            <div class="unit auxiliary" style="top: 430px; left: 930px; width: 90px; height: 60px;" onclick="selectUnit('鼓风机房')">
-                <div class="unit-name">鼓风机房</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <!-- 除臭系统单元 -->
-            <div class="unit effluent-area" style="top: 310px; left: 50px; width: 70px; height: 40px;" onclick="selectUnit('除臭系统')">
-                <div class="unit-name">除臭系统</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <!-- 第三行：深度处理区 -->
-            <div class="unit advanced-treatment" style="top: 650px; left: 520px; width: 90px; height: 60px;" onclick="selectUnit('DF系统')">
-                <div class="unit-name">DF系统</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <div class="unit advanced-treatment" style="top: 650px; left: 740px; width: 90px; height: 60px;" onclick="selectUnit('催化氧化')">
-                <div class="unit-name">催化氧化</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <!-- 出水区单元 -->
-            <div class="unit effluent-area" style="top: 660px; left: 325px; width: 76px; height: 40px;" onclick="selectUnit('消毒接触池')">
-                <div class="unit-name">消毒接触池</div>
-                <div class="unit-status">运行中</div>
-            </div>
-
-            <!-- 水流线条与箭头 -->
-
-            <!-- 污泥流向 -->
-            <div class="flow-line" style="top: 410px; left: 460px; width: 5px; height: 120px; transform: rotate(90deg); background-color: #8B4513;"></div>
-            <div class="flow-line" style="top: 540px; left: 322px; width: 68px; height: 5px; transform: rotate(90deg); background-color: #8B4513;"></div>
-            <div class="flow-arrow" style="top: 573px; left: 349px; width: 0; height: 0; border-style: solid;border-width: 7px 7px 0 7px;border-color: #8B4513 transparent transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 463px; left: 412px; width: 0; height: 0; border-style: solid;border-width: 7px 7px 7px 0;border-color: transparent #8B4513 transparent transparent;"></div>
+# 如果有选中的数据，进行碳核算计算
+if 'df_selected' in st.session_state and st.session_state.df_selected is not None:
+    try:
+        # 因子库指纹为因子文件内容哈希，因子集指纹含版本号：换文件或新增记录后当月核算自动失效
+        registry, factor_set = st.session_state.factor_registry, st.session_state.factor_set
+        pipeline.set_param("factor_registry", registry, fingerprint=st.session_state.factor_file_key)
+        pipeline.set_param("factor_set", factor_set,
+                           fingerprint=(factor_set, registry.version(factor_set) if factor_set else None))
+        st.session_state.df_calc = pipeline.get("carbon")
+        # 计算单元排放数据（包含除臭系统）
+        st.session_state.emission_data = pipeline.get("area_totals")
+        for unit, emission in pipeline.get("unit_emissions").items():
+            if unit in st.session_state.unit_data:
+                st.session_state.unit_data[unit]["emission"] = emission
+    except Exception as e:
+        st.error(f"碳核算计算错误: {str(e)}")
+        st.stop()
 
-            <!-- 鼓风机到MBR膜池的气流 -->
-            <div class="flow-line" style="top: 470px; left: 770px; width: 180px; height: 5px; background-color: #999999; opacity: 0.6;"></div>
-
-            <!-- 水流动画 -->
-            <div class="water-flow" style="top: 197px; left: 80px; width: 66px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 270px; width: 30px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 411px; width: 40px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 560px; width: 42px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 709px; width: 42px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 100px; width: 30px; height: 7px; transform: rotate(180deg);"></div>
-            <div class="water-flow" style="top: 197px; left: 290px; width: 30px; height: 7px; transform: rotate(180deg);"></div>
-            <div class="water-flow" style="top: 197px; left: 431px; width: 30px; height: 7px; transform: rotate(180deg);"></div>
-            <div class="water-flow" style="top: 197px; left: 580px; width: 30px; height: 7px; transform: rotate(180deg);"></div>
-            <div class="water-flow" style="top: 197px; left: 729px; width: 30px; height: 7px; transform: rotate(180deg);"></div>
-            <div class="water-flow" style="top: 467px; left: 629px; width: 66px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 850px; width: 56px; height: 7px;"></div>
-            <div class="water-flow" style="top: 197px; left: 896px; width: 8px; height: 250px;"></div>
-            <div class="water-flow" style="top: 443px; left: 874px; width: 30px; height: 7px;"></div>
-            <div class="water-flow" style="top: 685px; left: 850px; width: 50px; height: 7px;"></div>
-
-            <div class="water-flow" style="top: 500px; left: 896px; width: 8px; height: 190px;"></div>
-            <div class="water-flow" style="top: 500px; left: 880px; width: 20px; height: 7px;"></div>
-
-            <div class="water-flow" style="top: 685px; left: 626px; width: 125px; height: 7px;"></div>
-            <div class="water-flow" style="top: 685px; left: 305px; width: 220px; height: 7px;"></div>
-            <div class="water-flow" style="top: 685px; left: 205px; width: 220px; height: 7px;"></div>
-
-            <div class="water-flow" style="top: 510px; left: 575px; width: 8px; height: 200px;"></div>
-
-            <!-- 污泥流动画 -->
-            <div class="sludge-flow" style="top: 120px; left: 207px; width: 5px; height: 40px;"></div>
-            <div class="sludge-flow" style="top: 120px; left: 508px; width: 5px; height: 40px;"></div>
-            <div class="sludge-flow" style="top: 120px; left: 658px; width: 5px; height: 40px;"></div>
-            <div class="sludge-flow" style="top: 120px; left: 807px; width: 5px; height: 40px;"></div>
-            <div class="flow-arrow" style="top: 123px; left: 204px; width: 0; height: 0; border-style: solid; border-width: 0 6px 6px 6px; border-color: transparent transparent #8B4513 transparent;"></div>
-            <div class="flow-arrow" style="top: 123px; left: 505px; width: 0; height: 0; border-style: solid; border-width: 0 6px 6px 6px; border-color: transparent transparent #8B4513 transparent;"></div>
-            <div class="flow-arrow" style="top: 123px; left: 655px; width: 0; height: 0; border-style: solid; border-width: 0 6px 6px 6px; border-color: transparent transparent #8B4513 transparent;"></div>
-            <div class="flow-arrow" style="top: 123px; left: 804px; width: 0; height: 0; border-style: solid; border-width: 0 6px 6px 6px; border-color: transparent transparent #8B4513 transparent;"></div>
-
-
-            <!-- 臭气流动画 -->
-            <div class="gas-flow" style="top: 243px; left: 202px; width: 6px; height: 100px;"></div>
-            <div class="gas-flow" style="top: 243px; left: 503px; width: 6px; height: 100px;"></div>
-            <div class="gas-flow" style="top: 243px; left: 652px; width: 6px; height: 100px;"></div>
-            <div class="gas-flow" style="top: 243px; left: 802px; width: 6px; height: 190px;"></div>
-            <div class="gas-flow" style="top: 340px; left: 350px; width: 6px; height: 100px;"></div>
-            <div class="gas-flow" style="top: 340px; left: 570px; width: 6px; height: 100px;"></div>
-            <div class="gas-flow" style="top: 340px; left: 35px; width: 800px; height: 4px;"></div>
-            <div class="gas-flow" style="top: 340px; left: 660px; width: 150px; height: 3px;"></div>
-            <div class="gas-flow" style="top: 352px; left: 90px; width: 6px; height: 61px;"></div>
-
-            <!-- 鼓风机到MBR膜池的气流动画 -->
-            <div class="air-flow" style="top: 900px; left: 770px; width: 230px; height: 5px;"></div>
-
-            <!-- 水流箭头 -->
-            <div class="flow-arrow" style="top: 193px; left: 136px; border-width: 8px 0 8px 8px; border-color: transparent transparent transparent #1e90ff;"></div>
-            <div class="flow-arrow" style="top: 193px; left: 293px; border-width: 8px 0 8px 8px; border-color: transparent transparent transparent #1e90ff;"></div>
-            <div class="flow-arrow" style="top: 193px; left: 442px; border-width: 8px 0 8px 8px; border-color: transparent transparent transparent #1e90ff;"></div>
-            <div class="flow-arrow" style="top: 193px; left: 593px; border-width: 8px 0 8px 8px; border-color: transparent transparent transparent #1e90ff;"></div>
-            <div class="flow-arrow" style="top: 193px; left: 741px; border-width: 8px 0 8px 8px; border-color: transparent transparent transparent #1e90ff;"></div>
-            <div class="flow-arrow" style="top: 642px; left: 572px; border-width: 8px 8px 0 8px; border-color: #1e90ff transparent transparent transparent;"></div>
-
-            <div class="flow-arrow" style="top: 464px; left: 633px; border-width: 8px 8px 8px 0; border-color: transparent #1e90ff transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 439px; left: 882px; border-width: 8px 8px 8px 0; border-color: transparent #1e90ff transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 496px; left: 882px; border-width: 8px 8px 8px 0; border-color: transparent #1e90ff transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 682px; left: 423px; border-width: 8px 8px 8px 0; border-color: transparent #1e90ff transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 682px; left: 222px; border-width: 8px 8px 8px 0; border-color: transparent #1e90ff transparent transparent;"></div>
-
-            <div class="flow-arrow" style="top: 682px; left: 732px; border-width: 8px 8px 8px 0; border-color: transparent #1e90ff transparent transparent; transform: rotate(180deg);"></div>
-
-
-            <!-- 臭气箭头 -->
-            <div class="flow-arrow" style="top: 410px; left: 85px; border-width: 8px 8px 0 8px; border-color: #A9A9A9 transparent transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 334px; left: 144px; border-width: 8px 8px 8px 0; border-color: transparent #A9A9A9 transparent transparent;"></div>
-            <div class="flow-arrow" style="top: 464px; left: 883px; border-width: 8px 8px 8px 0; border-color: transparent #A9A9A9 transparent transparent;"></div>
-
-
-            <!-- 鼓风机到MBR膜池的箭头（白灰色透明） -->
-            <div class="flow-arrow" style="top: 450px; left: 775px; border-width: 5px 0 5px 8px; border-color: transparent transparent transparent rgba(255, 255, 255, 0.8);"></div>
-
-            <!-- 流向标签 -->
-            <div class="flow-label" style="top: 190px; left: 40px;">污水</div>
-            <div class="flow-label" style="top: 540px; left: 308px;">污泥</div>
-            <div class="flow-label" style="top: 435px; left: 440px;">污泥S5</div>
-            <div class="flow-label" style="top: 290px; left: 180px;">臭气G1</div>
-            <div class="flow-label" style="top: 290px; left: 480px;">臭气G2</div>
-            <div class="flow-label" style="top: 290px; left: 635px;">臭气G3</div>
-            <div class="flow-label" style="top: 290px; left: 780px;">臭气G4</div>
-            <div class="flow-label" style="top: 370px; left: 780px;">臭气G5</div>
-            <div class="flow-label" style="top: 370px; left: 545px;">臭气G6</div>
-            <div class="flow-label" style="top: 370px; left: 325px;">臭气G7</div>
-            <div class="flow-label" style="top: 415px; left: 46px;background:none;">处理后的臭气排放</div>
-            <div class="flow-label" style="top: 645px; left: 672px;">浓水</div>
-            <div class="flow-label" style="top: 710px; left: 672px;">臭氧</div>
-
-            <!-- 排出物标签 -->
-            <div class="flow-label" style="top: 100px; left: 185px; background: #FF6347;">栅渣S1</div>
-            <div class="flow-label" style="top: 100px; left: 485px; background: #FF6347;">栅渣S2</div>
-            <div class="flow-label" style="top: 100px; left: 635px; background: #FF6347;">沉渣S3</div>
-            <div class="flow-label" style="top: 100px; left: 785px; background: #FF6347;">栅渣S4</div>
-            <div class="flow-label" style="top: 580px; left: 340px; background: none;">外运</div>
-            <div class="flow-label" style="top: 675px; left: 190px; background: none;">排河</div>
-            <div class="special-flow-label" style="top: 520px; left: 750px;">MBR生物池</div>
-
-            <!-- 动态粒子 -->
-            <div class="particle" id="particle1" style="top: 197px; left: 80px;"></div>
-            <div class="particle" id="particle2" style="top: 197px; left: 411px;"></div>
-            <div class="particle" id="particle3" style="top: 197px; left: 560px;"></div>
-            <div class="particle" id="particle4" style="top: 197px; left: 709px;"></div>
-            <div class="particle" id="particle5" style="top: 197px; left: 270px;"></div>
-            <div class="particle" id="particle6" style="top: 685px; left: 660px;"></div>
-            <div class="particle" id="particle7" style="top: 685px; left: 675px;"></div>
-
-
-            <!-- 信息面板 -->
-            <div class="info-panel">
-                <h3>当前水流状态</h3>
-                <p>流量: {flow_rate} m³/d</p>
-                <p>COD: {st.session_state.water_quality["COD"]["in"]} → {st.session_state.water_quality["COD"]["out"]} mg/L</p>
-                <p>TN: {st.session_state.water_quality["TN"]["in"]} → {st.session_state.water_quality["TN"]["out"]} mg/L</p>
-            </div>
-        </div>
-
-        <script>
-            // 设置选中单元
-            function selectUnit(unitName) {{
-                // 高亮显示选中的单元
-                document.querySelectorAll('.unit').forEach(unit => {{
-                    unit.classList.remove('active');
-                }});
-
-                // 找到并高亮选中的单元
-                const units = document.querySelectorAll('.unit');
-                units.forEach(unit => {{
-                    if (unit.querySelector('.unit-name').textContent === unitName) {{
-                        unit.classList.add('active');
-                    }}
-                }});
-
-                // 发送单元选择信息到Streamlit
-                if (window.Streamlit) {{
-                    window.Streamlit.setComponentValue(unitName);
-                }}
-            }}
-
-            // 初始化选中单元
-            document.addEventListener('DOMContentLoaded', function() {{
-                const units = document.querySelectorAll('.unit');
-                units.forEach(unit => {{
-                    if (unit.querySelector('.unit-name').textContent === "{selected_unit}") {{
-                        unit.classList.add('active');
-                    }}
-                }});
-
-                // 粒子动画
-                function animateParticles() {{
-                    for (let i = 1; i <= 12; i++) {{
-                        const particle = document.getElementById(`particle${{i}}`);
-                        if (particle) {{
-                            const top = Math.random() * 5;
-                            const left = Math.random() * 50;
-                            particle.style.animation = `moveParticle ${{1 + Math.random()}}s linear infinite`;
-                        }}
-                    }}
-                    requestAnimationFrame(animateParticles);
-                }}
-                animateParticles();
-            }});
-        </script>
-    </body>
-    </html>
-    """
-    return html_content
+tab1, tab2, tab3, tab4 = st.tabs(["工艺流程仿真", "碳足迹追踪", "碳账户管理", "优化与决策"])
 
 
-with tab1:
-    st.header("2D水厂工艺流程仿真")
+# 工艺流程图组件：静态页面（frontend/plant_diagram/index.html）只在首次加载时传输，
+# 之后每次重跑只向前端发送几百字节的状态参数，由页面脚本自行更新，不再重新加载iframe
+plant_diagram_component = components.declare_component(
+    "plant_diagram",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "plant_diagram")
+)
+
+
+def create_plant_diagram(selected_unit=None, flow_rate=10000, animation_active=True, key="plant_diagram"):
+    water_quality = st.session_state.water_quality
+    return plant_diagram_component(
+        selected_unit=selected_unit,
+        flow_rate=flow_rate,
+        cod=[water_quality["COD"]["in"], water_quality["COD"]["out"]],
+        tn=[water_quality["TN"]["in"], water_quality["TN"]["out"]],
+        animation_active=bool(animation_active),
+        key=key,
+        default=None
+    )
+
+
+@st.fragment
+def plant_simulation_tab():
+    """工艺流程仿真选项卡：点击流程图中的单元或修改单元参数只重跑本片段，
+    不重新执行数据读取与碳核算，也不重建其他选项卡的图表"""
+    # 组件返回最近一次点击（单元名与点击时间），同一单元再次点击也能区分
+    click = st.session_state.get("plant_diagram")
+    if click and click != st.session_state.last_unit_click:
+        st.session_state.last_unit_click = click
+        if click["unit"] in st.session_state.unit_data:
+            st.session_state.last_clicked_unit = click["unit"]
+            st.session_state.unit_selector = click["unit"]
+    if st.session_state.get("unit_selector") not in st.session_state.unit_data:
+        st.session_state.unit_selector = st.session_state.selected_unit
 
     # 创建两列布局
     col1, col2 = st.columns([3, 1])
 
+    with col2:
+        # 下拉框与流程图点击同步，选项中包含除臭系统
+        selected_unit = st.selectbox(
+            "选择工艺单元",
+            list(st.session_state.unit_data.keys()),
+            key="unit_selector"
+        )
+        st.session_state.selected_unit = selected_unit
+
     with col1:
         # 渲染工艺流程图
-        plant_html = create_plant_diagram(
-            selected_unit=st.session_state.get('selected_unit', "粗格栅"),
+        create_plant_diagram(
+            selected_unit=selected_unit,
             flow_rate=st.session_state.flow_data["flow_rate"],
             animation_active=st.session_state.animation_active
         )
-        html(plant_html, height=920)
-
-        # 处理单元选择事件
-        selected_unit = st.session_state.get('last_clicked_unit', "粗格栅")
-        if st.session_state.get('component_value'):
-            selected_unit = st.session_state.component_value
-            st.session_state.last_clicked_unit = selected_unit
-            st.session_state.selected_unit = selected_unit
-            st.experimental_rerun()
 
         # 显示当前选中单元
-        if selected_unit:
-            st.success(f"当前选中单元: {selected_unit}")
+        st.success(f"当前选中单元: {selected_unit}")
 
     with col2:
-        # 根据点击事件或下拉框选择单元
-        if st.session_state.get('last_clicked_unit'):
-            selected_unit = st.session_state.last_clicked_unit
-        else:
-            # 下拉框选项中包含除臭系统
-            selected_unit = st.selectbox(
-                "选择工艺单元",
-                list(st.session_state.unit_data.keys()),
-                key="unit_selector"
-            )
         st.subheader(f"{selected_unit} - 参数设置")
         unit_params = st.session_state.unit_data[selected_unit]
         # 单元开关
@@ -852,56 +449,94 @@ with tab1:
         elif selected_unit == "消毒接触池":
             st.info("消毒接触池对处理后的水进行消毒，确保水质安全")
 
-# 其余选项卡保持不变
-with tab2:
-    st.header("碳足迹追踪与评估")
-    # 如果有选中的数据，进行碳核算计算
-    if 'df_selected' in st.session_state and st.session_state.df_selected is not None:
-        df_selected = st.session_state.df_selected
-        calculator = CarbonCalculator()
-        try:
-            df_calc = calculator.calculate_direct_emissions(df_selected)
-            df_calc = calculator.calculate_indirect_emissions(df_calc)
-            df_calc = calculator.calculate_unit_emissions(df_calc)
-            st.session_state.df_calc = df_calc
-            # 计算单元排放数据（包含除臭系统）
-            st.session_state.emission_data = {
-                "预处理区": df_calc['pre_CO2eq'].sum(),
-                "生物处理区": df_calc['bio_CO2eq'].sum(),
-                "深度处理区": df_calc['depth_CO2eq'].sum(),
-                "泥处理区": df_calc['sludge_CO2eq'].sum(),
-                "出水区": df_calc['effluent_CO2eq'].sum(),
-                "除臭系统": df_calc['deodorization_CO2eq'].sum()  # 新增除臭系统
-            }
-        except Exception as e:
-            st.error(f"碳核算计算错误: {str(e)}")
-            st.stop()
+    # 沿管网传递的水量与碳排放归属：只重算参数变化单元的下游子图
+    if 'flow_network' not in st.session_state:
+        st.session_state.flow_network = PlantDiagramEngine(st.session_state.unit_data).flow_network()
+    flow_network = st.session_state.flow_network
+    flow_network.refresh(st.session_state.unit_data)
+    with st.expander("矢量工艺图（浏览器端播放水流动画）"):
+        # 粒子位置一次性预计算为动画帧，播放时不再回到服务端重绘
+        # 粒子数量与速度随单元处理水量和侧边栏水流速度缩放
+        flow_rate = st.session_state.flow_data["flow_rate"]
+        plant_fig = st.session_state.plant_figure_cache.get_or_build(
+            "plant_animation", FigureCache.fingerprint(st.session_state.unit_data, flow_rate),
+            lambda: PlantDiagramEngine(st.session_state.unit_data).render_animation(flow_rate=flow_rate))
+        st.plotly_chart(plant_fig, use_container_width=True)
+    with st.expander("碳流传递（上游→下游累计）"):
+        st.dataframe(flow_network.frame().style.format(precision=1), use_container_width=True)
+        st.caption(f"本次重算单元：{'、'.join(flow_network.last_recomputed) or '无'}")
+
+
+with tab1:
+    st.header("2D水厂工艺流程仿真")
+    plant_simulation_tab()
+
+
+@st.fragment
+def carbon_tracking_tab(df_selected, df_calc, emission_data, figures, figure_key):
+    """碳足迹追踪选项卡：依赖当月数据、核算结果、区域排放及流水线图表节点，切换展示层级等操作只重跑本片段
+
+    figure_key 为核算节点指纹（上传内容、月份、因子集及版本），用作桑基图的缓存键。
+    """
+    figure_cache = get_figure_cache()
     # 工艺全流程碳排热力图
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("工艺全流程碳排热力图")
-        if st.session_state.emission_data:
-            heatmap_fig = vis.create_heatmap_overlay(st.session_state.emission_data)
-            st.plotly_chart(heatmap_fig, use_container_width=True)
+        if emission_data:
+            st.plotly_chart(figures["heatmap"], use_container_width=True)
         else:
             st.warning("请先上传运行数据")
     with col2:
         st.subheader("碳流动态追踪图谱")
-        if 'df_calc' in st.session_state and st.session_state.df_calc is not None:
-            sankey_fig = vis.create_sankey_diagram(st.session_state.df_calc)
+        if df_calc is not None:
+            sankey_level = st.radio("展示层级", ["工艺区域", "工艺单元"], horizontal=True)
+            sankey_frames = st.checkbox("逐日动画", value=False)
+            level = "unit" if sankey_level == "工艺单元" else "area"
+            sankey_fig = figure_cache.get_or_build(
+                ("sankey", level, sankey_frames), figure_key,
+                lambda: vis.create_sankey_diagram(df_calc, level=level,
+                                                  unit_allocation=get_unit_allocation(),
+                                                  daily_frames=sankey_frames))
             st.plotly_chart(sankey_fig, use_container_width=True)
         else:
             st.warning("请先上传运行数据")
     # 碳排放效率排行榜
-    if 'df_calc' in st.session_state and st.session_state.df_calc is not None:
+    if df_calc is not None:
         st.subheader("碳排放效率排行榜")
-        eff_fig = vis.create_efficiency_ranking(st.session_state.df_calc)
-        st.plotly_chart(eff_fig, use_container_width=True)
+        st.plotly_chart(figures["efficiency_ranking"], use_container_width=True)
+        # 排放因子不确定性分析（蒙特卡洛模拟）
+        with st.expander("排放因子不确定性分析"):
+            n_samples = st.select_slider("抽样次数", options=[1000, 10000, 100000], value=10000)
+            # 选择了因子集时，各因子分布以该因子集的逐行取值为中心
+            factor_set = st.session_state.factor_set
+            if factor_set is not None:
+                st.caption(f"因子分布以因子集“{factor_set}”的取值为中心")
+            if st.button("运行不确定性分析"):
+                factors = (st.session_state.factor_registry.factor_arrays(df_selected["日期"], factor_set)
+                           if factor_set is not None else None)
+                with st.spinner("蒙特卡洛模拟中..."):
+                    bands = MonteCarloEngine(seed=0).run(df_selected, n_samples, factors=factors)
+                bands = bands.rename(columns={col: area for area, col in AREA_COLUMNS.items()})
+                st.dataframe(bands.rename(columns={"total_CO2eq": "总排放"}).T.style.format("{:,.1f}"),
+                             use_container_width=True)
+                st.caption("P2.5~P97.5 为95%置信区间（kgCO2eq），因子分布见 src/uncertainty.py")
 
-with tab3:
-    st.header("碳账户管理")
-    if 'df_calc' in st.session_state and st.session_state.df_calc is not None:
-        df_calc = st.session_state.df_calc
+
+with tab2:
+    st.header("碳足迹追踪与评估")
+    if st.session_state.df_calc is not None:
+        figures, figure_key = pipeline.get("figures"), pipeline.fingerprint("carbon")
+    else:
+        figures, figure_key = {}, None
+    carbon_tracking_tab(st.session_state.df_selected, st.session_state.df_calc, st.session_state.emission_data,
+                        figures, figure_key)
+
+
+@st.fragment
+def carbon_account_tab(df_calc):
+    """碳账户管理选项卡：依赖当月核算结果，编辑公式、输入变量只重跑本片段"""
+    if df_calc is not None:
         # 碳账户明细（包含除臭系统）
         st.subheader("碳账户收支明细（当月）")
         account_df = pd.DataFrame({
@@ -1040,19 +675,30 @@ with tab3:
                     st.markdown(f"**{formula_name}**: {result_data['result']:.4f}")
                     st.json(result_data["variables"])
 
-with tab4:
-    st.header("优化与决策支持")
-    if 'df_calc' in st.session_state and st.session_state.df_calc is not None:
-        df_calc = st.session_state.df_calc
-        df = st.session_state.df
-        df_selected = st.session_state.df_selected
+
+with tab3:
+    st.header("碳账户管理")
+    carbon_account_tab(st.session_state.df_calc)
+
+
+@st.fragment
+def optimization_tab(df, df_selected, df_calc):
+    """优化与决策选项卡：依赖全部历史数据、当月数据与核算结果，拖动优化滑块只重跑本片段"""
+    if df_calc is not None:
         # 异常识别与优化建议
         st.subheader("异常识别与优化建议")
-        if len(df) >= 3 and 'total_CO2eq' in df_calc.columns and '处理水量(m³)' in df.columns:
-            # 计算历史平均值（使用处理水量加权）
-            total_water = df['处理水量(m³)'].sum()
+        month_index = st.session_state.month_index
+        if (len(df) >= 3 and 'total_CO2eq' in df_calc.columns and '处理水量(m³)' in df.columns
+                and month_index is not None and st.session_state.history_calc is not None):
+            # 计算历史平均值（使用处理水量加权），按月份索引汇总全部历史核算结果
+            history_calc = st.session_state.history_calc
+            if st.session_state.factor_set is not None:
+                history_calc = st.session_state.factor_registry.calculate(month_index.frame,
+                                                                          st.session_state.factor_set)
+            history = month_index.monthly_sums(history_calc, ['处理水量(m³)', 'total_CO2eq'])
+            total_water = history['处理水量(m³)'].sum()
             if total_water > 0:
-                historical_mean = df_calc['total_CO2eq'].sum() / total_water
+                historical_mean = history['total_CO2eq'].sum() / total_water
             else:
                 historical_mean = 0
             current_water = df_selected['处理水量(m³)'].sum()
@@ -1106,11 +752,34 @@ with tab4:
         # 优化效果模拟
         st.subheader("工艺优化效果模拟")
         if not df_selected.empty:
-            optimized_bio = df_calc['bio_CO2eq'].sum() * (1 - aeration_adjust / 100)
-            optimized_depth = df_calc['depth_CO2eq'].sum() * (1 - pac_adjust / 100)
-            optimized_total = (df_calc['total_CO2eq'].sum()
-                               - (df_calc['bio_CO2eq'].sum() - optimized_bio)
-                               - (df_calc['depth_CO2eq'].sum() - optimized_depth))
+            # 优化滑块位于本片段内：拖动只重跑本选项卡，减排结果直接从情景扫描查表
+            col1, col2 = st.columns(2)
+            with col1:
+                aeration_adjust = st.slider("曝气时间调整（%）", -30, 30, 0)
+            with col2:
+                pac_adjust = st.slider("PAC投加量调整（%）", -20, 20, 0)
+            # 区域能耗调整：按能耗分配比例削减该区域分摊的电耗排放，最多同时扫描两个区域；
+            # 生物处理区、深度处理区的电耗已包含在曝气/PAC调整中
+            energy_areas = st.multiselect("区域能耗调整",
+                                          [area for area in AREA_COLUMNS if area not in SWEEP_COVERED_AREAS],
+                                          max_selections=2)
+            energy_setting = {}
+            for area in energy_areas:
+                energy_setting[f"{area}能耗调整"] = st.slider(
+                    f"{area}能耗调整（%）", int(ENERGY_RANGE[0]), int(ENERGY_RANGE[-1]), 0,
+                    step=int(ENERGY_RANGE[1] - ENERGY_RANGE[0]))
+            # 情景扫描：每个月份的核算结果与所选区域只扫描一次全部滑块组合，之后移动滑块只需查表
+            sweep_key = (st.session_state.selected_month, len(df_calc), float(df_calc['total_CO2eq'].sum()),
+                         tuple(energy_areas))
+            if st.session_state.get('scenario_sweep_key') != sweep_key:
+                st.session_state.scenario_sweep = ScenarioSweep(
+                    df_calc, energy_adjust={area: ENERGY_RANGE for area in energy_areas})
+                st.session_state.scenario_sweep_key = sweep_key
+            sweep = st.session_state.scenario_sweep
+            scenario = sweep.lookup(aeration_adjust, pac_adjust, **energy_setting)
+            optimized_bio = df_calc['bio_CO2eq'].sum() - scenario["bio_reduction"]
+            optimized_depth = df_calc['depth_CO2eq'].sum() - scenario["depth_reduction"]
+            optimized_total = scenario["optimized_total"]
             # 创建优化效果图表 - 所有文字改为黑色
             opt_fig = go.Figure()
             opt_fig.add_trace(go.Bar(
@@ -1162,7 +831,51 @@ with tab4:
                 st.metric("PAC投加量调整", f"{pac_adjust}%",
                           delta=f"深度处理区减排: {df_calc['depth_CO2eq'].sum() - optimized_depth:.1f} kgCO2eq",
                           delta_color="inverse")
+            for col, (name, reduction) in zip(st.columns(2), scenario["energy_reductions"].items()):
+                with col:
+                    st.metric(name, f"{energy_setting[name]}%",
+                              delta=f"电耗排放减排: {reduction:.1f} kgCO2eq", delta_color="inverse")
+            # 全部调整组合的减排曲面（区域能耗取当前设置）与帕累托最优方案
+            st.subheader("优化情景扫描")
+            surface = sweep.surface(**energy_setting)
+            sweep_fig = go.Figure(go.Heatmap(
+                z=surface.to_numpy(),
+                x=surface.columns,
+                y=surface.index,
+                colorscale="Greens",
+                colorbar=dict(title="减排量(kg)"),
+                hovertemplate="PAC: %{x}%<br>曝气: %{y}%<br>减排: %{z:.1f} kgCO2eq<extra></extra>"
+            ))
+            sweep_fig.add_trace(go.Scatter(
+                x=[pac_adjust], y=[aeration_adjust], mode="markers",
+                marker=dict(color="red", size=12, symbol="x"), name="当前设置", showlegend=False
+            ))
+            sweep_fig.update_layout(
+                xaxis_title="PAC投加量调整（%）",
+                yaxis_title="曝气时间调整（%）",
+                font=dict(size=14, color="black"),
+                height=400
+            )
+            st.plotly_chart(sweep_fig, use_container_width=True)
+            with st.expander("帕累托最优调整方案"):
+                st.dataframe(sweep.pareto_front(), use_container_width=True, hide_index=True)
         else:
             st.warning("没有选中数据，无法进行优化模拟")
     else:
         st.warning("请先上传运行数据")
+
+
+with tab4:
+    st.header("优化与决策支持")
+    optimization_tab(st.session_state.df, st.session_state.df_selected, st.session_state.df_calc)
+
+# 计算流水线各节点的依赖、本次是否重算及耗时
+with st.sidebar:
+    with st.expander("计算流水线"):
+        st.dataframe(pipeline.report().style.format({"耗时(ms)": "{:.1f}"}, na_rep="-"),
+                     hide_index=True, use_container_width=True)
+    # 已保存的厂站列映射：映射有误时可清除后重新上传确认
+    with st.expander("列名映射配置"):
+        st.caption(f"保存目录：{get_column_resolver().profile_dir}")
+        if st.button("清除已保存的列映射"):
+            st.success(f"已清除{get_column_resolver().clear_profiles()}个列映射配置")
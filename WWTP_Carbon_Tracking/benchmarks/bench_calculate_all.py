@@ -0,0 +1,70 @@
+"""CarbonCalculator 单次向量化核算与三步计算链的性能对比
+
+用法：python benchmarks/bench_calculate_all.py [行数 ...]
+默认测试 1e5、1e6 行；1e7 行需要约 8GB 内存，可手动指定：
+    python benchmarks/bench_calculate_all.py 100000 1000000 10000000
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.carbon_calculator import CarbonCalculator, DIRECT_INPUT_COLUMNS, INDIRECT_INPUT_COLUMNS, RESULT_COLUMNS
+
+
+def make_operating_data(n_rows, seed=0):
+    """生成模拟运行数据（含少量缺失值）"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        '日期': pd.date_range("2015-01-01", periods=n_rows, freq="h"),
+        '处理水量(m³)': rng.uniform(8000, 12000, n_rows),
+        '电耗(kWh)': rng.uniform(20000, 40000, n_rows),
+        '自来水(m³/d)': rng.uniform(0, 50, n_rows),
+        '进水COD(mg/L)': rng.uniform(150, 400, n_rows),
+        '出水COD(mg/L)': rng.uniform(10, 40, n_rows),
+        '进水TN(mg/L)': rng.uniform(25, 50, n_rows),
+        '出水TN(mg/L)': rng.uniform(5, 15, n_rows),
+        'PAC投加量(kg)': rng.uniform(100, 500, n_rows),
+        '次氯酸钠投加量(kg)': rng.uniform(50, 200, n_rows),
+        'PAM投加量(kg)': rng.uniform(20, 120, n_rows),
+    })
+    for col in DIRECT_INPUT_COLUMNS + INDIRECT_INPUT_COLUMNS:
+        df.loc[rng.random(n_rows) < 0.01, col] = np.nan
+    return df
+
+
+def run_chain(calculator, df):
+    df_calc = calculator.calculate_direct_emissions(df.copy())
+    df_calc = calculator.calculate_indirect_emissions(df_calc)
+    return calculator.calculate_unit_emissions(df_calc)
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(sizes):
+    calculator = CarbonCalculator()
+    print(f"{'行数':>10} {'三步计算链(s)':>14} {'calculate_all(s)':>17} {'加速比':>8}")
+    for n_rows in sizes:
+        df = make_operating_data(n_rows)
+        repeat = 3 if n_rows <= 1_000_000 else 1
+        chain_time, chain_result = best_of(lambda: run_chain(calculator, df), repeat)
+        fused_time, fused_result = best_of(lambda: calculator.calculate_all(df), repeat)
+        for col in RESULT_COLUMNS:
+            np.testing.assert_array_equal(chain_result[col].to_numpy(), fused_result[col].to_numpy(), err_msg=col)
+        del chain_result, fused_result
+        print(f"{n_rows:>10} {chain_time:>14.3f} {fused_time:>17.3f} {chain_time / fused_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(float(arg)) for arg in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,78 @@
+"""运行数据表格解析性能对比：原 pd.read_excel(header=[0, 1]) 流程 vs data_ingestion.load_operating_data
+
+用法：python benchmarks/bench_ingestion.py [年数]
+默认生成10年逐日数据的工作簿（与上传表格相同的双行表头、含合并单元格）。
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src import data_ingestion
+from src.data_ingestion import COLUMN_MAPPING, merge_header_levels, load_operating_data
+
+TOP_HEADER = ["日期", "处理水量 m3/d", "能耗 kWh/d", "自来水 m³/d", "CODcr(mg/l)", None, "SS(mg/l)", None,
+              "NH3-N(mg/l)", None, "TN(mg/l)", None, "PAC消耗 kg/d", "次氯酸钠消耗 kg/d",
+              "污泥脱水药剂消耗(PAM) kg/d", "脱水污泥外运量(80%)"]
+SUB_HEADER = [None, None, None, None, "进水", "出水", "进水", "出水", "进水", "出水", "进水", "出水",
+              None, None, None, None]
+
+
+def make_workbook(years, seed=0):
+    """生成逐日运行数据工作簿（内存中的xlsx字节）"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2015-01-01", periods=int(years * 365.25), freq="D")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(TOP_HEADER)
+    sheet.append(SUB_HEADER)
+    for col in (5, 7, 9, 11):
+        sheet.merge_cells(start_row=1, start_column=col, end_row=1, end_column=col + 1)
+    values = rng.uniform(1, 500, size=(len(dates), len(TOP_HEADER) - 1)).round(2)
+    for date, row in zip(dates.strftime("%Y/%m/%d"), values.tolist()):
+        sheet.append([date] + row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def baseline_pipeline(data):
+    """上传时原有的解析流程：整表读取、合并表头、列名映射、日期解析"""
+    df = pd.read_excel(io.BytesIO(data), header=[0, 1])
+    df.columns = merge_header_levels(df.columns)
+    date_col = [col for col in df.columns if "日期" in col][0]
+    df = df.rename(columns={date_col: "日期", **COLUMN_MAPPING})
+    df["日期"] = pd.to_datetime(df["日期"], errors="coerce", format='mixed')
+    return df.dropna(subset=["日期"]).sort_values("日期")
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(years):
+    data = make_workbook(years)
+    print(f"{years}年逐日数据，工作簿大小 {len(data) / 1024:.0f} KB")
+    baseline = best_of(lambda: baseline_pipeline(data))
+    print(f"{'原流程 pd.read_excel':<32}{baseline:>8.3f} s")
+
+    engines = [("calamine", True), ("openpyxl 只读流式", False)] if data_ingestion.HAS_CALAMINE else \
+        [("openpyxl 只读流式", False)]
+    for name, use_calamine in engines:
+        data_ingestion.HAS_CALAMINE = use_calamine
+        elapsed = best_of(lambda: load_operating_data(data))
+        print(f"{'load_operating_data（' + name + '）':<32}{elapsed:>8.3f} s  {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -1,6 +1,29 @@
+import os
+
 import pandas as pd
 import numpy as np
 
+# 直接排放核算所需输入列
+DIRECT_INPUT_COLUMNS = ['处理水量(m³)', '进水TN(mg/L)', '出水TN(mg/L)', '进水COD(mg/L)', '出水COD(mg/L)']
+# 间接排放核算所需输入列
+INDIRECT_INPUT_COLUMNS = ['电耗(kWh)', 'PAC投加量(kg)', 'PAM投加量(kg)', '次氯酸钠投加量(kg)']
+# 工艺区域与排放列的对应关系（含除臭系统）
+AREA_COLUMNS = {
+    "预处理区": "pre_CO2eq",
+    "生物处理区": "bio_CO2eq",
+    "深度处理区": "depth_CO2eq",
+    "泥处理区": "sludge_CO2eq",
+    "出水区": "effluent_CO2eq",
+    "除臭系统": "deodorization_CO2eq"
+}
+# 单次核算输出的全部结果列（与三步计算链的列顺序一致）
+RESULT_COLUMNS = [
+    'N2O_emission', 'N2O_CO2eq', 'COD_removed', 'CH4_emission', 'CH4_CO2eq',
+    'energy_CO2eq', 'PAC_CO2eq', 'PAM_CO2eq', 'NaClO_CO2eq', 'chemicals_CO2eq',
+    *AREA_COLUMNS.values(), 'total_CO2eq', 'carbon_efficiency'
+]
+
+
 class CarbonCalculator:
     def __init__(self):
         # 排放因子（严格遵循《可行性方案》2.1节公式参数）
@@ -37,9 +60,8 @@ class CarbonCalculator:
         if not isinstance(df, pd.DataFrame):
             raise TypeError("输入数据必须为pandas DataFrame格式")
 
-        # 确保数值列正确转换
-        for col in required_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+        # 确保数值列正确转换（assign生成新表，不回写调用方的DataFrame）
+        df = df.assign(**{col: pd.to_numeric(df[col], errors='coerce') for col in required_cols})
 
         # 处理缺失值
         df = df.fillna(0)
@@ -112,3 +134,163 @@ class CarbonCalculator:
         df['carbon_efficiency'] = df['处理水量(m³)'] / df['total_CO2eq'].replace(0, 1)  # 避免除零错误
 
         return df
+
+    def calculate_all(self, df, factors=None):
+        """单次向量化核算：一次性提取输入列并计算全部直接/间接/单元排放
+
+        与 calculate_direct_emissions → calculate_indirect_emissions → calculate_unit_emissions
+        三步计算链结果一致，但不复制整表，只返回输入列与结果列组成的紧凑DataFrame。
+        纯函数：只按列读取输入，从不修改传入的DataFrame（可直接传入session_state中的切片）。
+        factors 为排放因子字典（可含与行对齐的逐行数组），缺省使用当前因子。
+        """
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError("输入数据必须为pandas DataFrame格式")
+
+        input_cols = DIRECT_INPUT_COLUMNS + INDIRECT_INPUT_COLUMNS
+        missing_cols = [col for col in input_cols if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"数据缺少必需列：{missing_cols}，请检查数据或列名映射！")
+
+        inputs = {col: self._column_array(df[col]) for col in input_cols}
+        results = self.emission_kernel(inputs, factors)
+
+        columns = {}
+        if '日期' in df.columns:
+            columns['日期'] = df['日期'].to_numpy()
+        columns.update(inputs)
+        columns.update(results)
+        return pd.DataFrame(columns, index=df.index)
+
+    def calculate_stream(self, source, chunksize=100_000, totals=None, **read_kwargs):
+        """流式分块核算：逐块产出排放结果，适用于多年逐时SCADA导出等超大数据
+
+        source 可以是DataFrame分块的迭代器，也可以是CSV文件路径（按 chunksize 分块读取）。
+        传入 totals（EmissionTotals）时同步累计各月份、各工艺区域的排放合计。
+        峰值内存只与分块大小有关，与历史数据长度无关。
+        """
+        if isinstance(source, (str, os.PathLike)):
+            if not str(source).lower().endswith('.csv'):
+                raise ValueError("流式核算仅支持CSV文件路径，其他格式请传入DataFrame分块迭代器")
+            source = pd.read_csv(source, chunksize=chunksize, **read_kwargs)
+
+        for chunk in source:
+            result = self.calculate_all(chunk)
+            if totals is not None:
+                totals.add(result)
+            yield result
+
+    @staticmethod
+    def _column_array(series):
+        """将单列转换为连续的float64数组（非数值与缺失值按0处理）"""
+        # copy=True：结果数组独立于调用方数据，原地填充缺失值不会修改输入
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        values[np.isnan(values)] = 0.0
+        return values
+
+    def emission_factors(self):
+        """当前排放因子（名称→数值），供核算内核与不确定性分析使用"""
+        return {
+            "EF_N2O": self.EF_N2O,
+            "C_N2O_N2": self.C_N2O_N2,
+            "f_N2O": self.f_N2O,
+            "B0": self.B0,
+            "MCF": self.MCF,
+            "f_CH4": self.f_CH4,
+            "f_e": self.f_e,
+            "EF_PAC": self.EF_chemicals["PAC"],
+            "EF_PAM": self.EF_chemicals["PAM"],
+            "EF_NaClO": self.EF_chemicals["次氯酸钠"]
+        }
+
+    def emission_kernel(self, x, factors=None):
+        """核算内核：输入为列名→float64数组的字典，输出全部结果列数组
+
+        calculate_all 与不确定性分析共用此内核；输入数组可用 _column_array 由数据列转换得到。
+
+        factors 缺省为 emission_factors()；其中的值也可以是数组（如逐行因子、
+        形状为(样本数, 1)的抽样因子），按NumPy广播规则参与计算。
+        运算顺序与三步计算链保持一致，以保证数值完全相同。
+        """
+        f = self.emission_factors() if factors is None else factors
+        water = x['处理水量(m³)']
+        r = {}
+
+        # N₂O直接排放（生物处理区）
+        r['N2O_emission'] = water * (x['进水TN(mg/L)'] - x['出水TN(mg/L)']) * f['EF_N2O'] * f['C_N2O_N2'] / 1000
+        r['N2O_CO2eq'] = r['N2O_emission'] * f['f_N2O']
+
+        # CH4直接排放（预处理/污泥区）
+        r['COD_removed'] = water * np.abs(x['进水COD(mg/L)'] - x['出水COD(mg/L)']) / 1000
+        r['CH4_emission'] = r['COD_removed'] * f['B0'] * f['MCF']
+        r['CH4_CO2eq'] = r['CH4_emission'] * f['f_CH4']
+
+        # 能耗、药耗间接排放
+        energy = x['电耗(kWh)'] * f['f_e']
+        r['energy_CO2eq'] = energy
+        r['PAC_CO2eq'] = x['PAC投加量(kg)'] * f['EF_PAC']
+        r['PAM_CO2eq'] = x['PAM投加量(kg)'] * f['EF_PAM']
+        r['NaClO_CO2eq'] = x['次氯酸钠投加量(kg)'] * f['EF_NaClO']
+        r['chemicals_CO2eq'] = r['PAC_CO2eq'] + r['PAM_CO2eq'] + r['NaClO_CO2eq']
+
+        # 按工艺单元分配碳排放
+        share = self.energy_distribution
+        r['pre_CO2eq'] = energy * share["预处理区"]
+        r['bio_CO2eq'] = r['N2O_CO2eq'] + r['CH4_CO2eq'] + energy * share["生物处理区"]
+        r['depth_CO2eq'] = r['chemicals_CO2eq'] + energy * share["深度处理区"]
+        r['sludge_CO2eq'] = energy * share["泥处理区"]
+        r['effluent_CO2eq'] = energy * share["出水区"]
+        r['deodorization_CO2eq'] = energy * share["除臭系统"]
+
+        # 总排放与效率
+        r['total_CO2eq'] = (r['pre_CO2eq'] + r['bio_CO2eq'] +
+                            r['depth_CO2eq'] + r['sludge_CO2eq'] +
+                            r['effluent_CO2eq'] + r['deodorization_CO2eq'])
+        r['carbon_efficiency'] = water / np.where(r['total_CO2eq'] == 0, 1, r['total_CO2eq'])  # 避免除零错误
+
+        return r
+
+
+class EmissionTotals:
+    """按月份、工艺区域累计的排放合计
+
+    接收 calculate_all 的结果分块，只保存每月一行的小型汇总数组，
+    内存占用与月份数相关而与原始行数无关。
+    """
+
+    COLUMNS = ['处理水量(m³)', *AREA_COLUMNS.values(), 'total_CO2eq']
+
+    def __init__(self):
+        self._monthly = {}  # pd.Period -> 各汇总列合计
+        self._overall = np.zeros(len(self.COLUMNS))
+        self.row_count = 0
+
+    def add(self, result, sign=1):
+        """累加一个结果分块；sign=-1 时扣除（用于增量核算中替换旧结果）"""
+        values = result[self.COLUMNS].to_numpy(dtype=np.float64)
+        self._overall += sign * values.sum(axis=0)
+        self.row_count += sign * len(values)
+
+        if '日期' not in result.columns or len(values) == 0:
+            return
+        months = pd.to_datetime(result['日期'], errors='coerce').dt.to_period('M')
+        grouped = pd.DataFrame(values, columns=self.COLUMNS).groupby(months.to_numpy()).sum()
+        for month, row in zip(grouped.index, grouped.to_numpy()):
+            if month in self._monthly:
+                self._monthly[month] += sign * row
+            else:
+                self._monthly[month] = sign * row
+
+    def discard_month(self, month):
+        """去掉某月份的合计行（该月结果已全部扣除后调用，不保留只含浮点残差的空月份）"""
+        self._monthly.pop(month, None)
+
+    def monthly(self):
+        """各月份合计，列为处理水量、各工艺区域排放和总排放"""
+        months = sorted(self._monthly)
+        data = np.array([self._monthly[m] for m in months]).reshape(len(months), len(self.COLUMNS))
+        return pd.DataFrame(data, index=pd.PeriodIndex(months, freq='M', name='年月'), columns=self.COLUMNS)
+
+    def area_totals(self):
+        """全部已累计数据的各工艺区域排放合计"""
+        overall = dict(zip(self.COLUMNS, self._overall))
+        return {area: overall[col] for area, col in AREA_COLUMNS.items()}
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+# 标准列名及其识别规则：aliases 为指标别名（中文按子串匹配，英文按完整词匹配），
+# stage 为需要同时出现的进/出水标记
+CANONICAL_COLUMNS = {
+    "日期": {"aliases": ["日期", "时间", "date", "time"]},
+    "处理水量(m³)": {"aliases": ["处理水量", "处理量", "进水量", "污水量", "flow"]},
+    "电耗(kWh)": {"aliases": ["能耗", "电耗", "用电量", "耗电量", "kwh"]},
+    "自来水(m³/d)": {"aliases": ["自来水"]},
+    "进水COD(mg/L)": {"aliases": ["cod", "codcr"], "stage": "进水"},
+    "出水COD(mg/L)": {"aliases": ["cod", "codcr"], "stage": "出水"},
+    "进水SS(mg/L)": {"aliases": ["ss", "悬浮物"], "stage": "进水"},
+    "出水SS(mg/L)": {"aliases": ["ss", "悬浮物"], "stage": "出水"},
+    "进水NH3-N(mg/L)": {"aliases": ["nh3-n", "nh3", "氨氮"], "stage": "进水"},
+    "出水NH3-N(mg/L)": {"aliases": ["nh3-n", "nh3", "氨氮"], "stage": "出水"},
+    "进水TN(mg/L)": {"aliases": ["tn", "总氮"], "stage": "进水"},
+    "出水TN(mg/L)": {"aliases": ["tn", "总氮"], "stage": "出水"},
+    "PAC投加量(kg)": {"aliases": ["pac", "聚合氯化铝"]},
+    "次氯酸钠投加量(kg)": {"aliases": ["次氯酸钠", "naclo"]},
+    "PAM投加量(kg)": {"aliases": ["pam", "聚丙烯酰胺"]},
+    "脱水污泥外运量(80%)": {"aliases": ["脱水污泥", "污泥外运", "外运量"]},
+}
+
+STAGE_TOKENS = {"进水": ["进水", "进口", "inf", "influent"], "出水": ["出水", "出口", "eff", "effluent"]}
+
+# 厂站列映射配置的保存目录：环境变量优先，默认为用户缓存目录（不写入源码目录）
+PROFILE_DIR_ENV = "WWTP_COLUMN_PROFILE_DIR"
+
+_PANDAS_PLACEHOLDER = re.compile(r"unnamed: ?\d+_level_\d+")
+_LATIN_TOKEN = re.compile(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)*")
+_CJK_TEXT = re.compile(r"[一-鿿]+")
+
+
+def normalize_header(name):
+    """表头归一化：全半角统一、转小写、去掉pandas为空表头生成的占位名"""
+    text = unicodedata.normalize("NFKC", str(name)).lower()
+    return _PANDAS_PLACEHOLDER.sub(" ", text)
+
+
+def default_profile_dir():
+    """厂站列映射配置目录：$WWTP_COLUMN_PROFILE_DIR，否则为 $XDG_CACHE_HOME（默认 ~/.cache）/wwtp_carbon/column_profiles"""
+    configured = os.environ.get(PROFILE_DIR_ENV)
+    if configured:
+        return configured
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "wwtp_carbon", "column_profiles")
+
+
+def header_signature(headers):
+    """表头布局签名：同一布局的表格签名相同"""
+    return hashlib.sha1("\x1f".join(headers).encode("utf-8")).hexdigest()[:16]
+
+
+class ColumnResolver:
+    """列名解析器：把任意表头变体映射为标准列名
+
+    初始化时把标准列名的别名编译为归一化词索引（英文词→候选、中文别名→一个正则），
+    每个表头只需扫描一次即可得到候选标准列。已知布局（exact 精确映射或已保存的厂站配置）
+    直接查表，跳过模糊匹配。
+    """
+
+    def __init__(self, exact=None, profile_dir=None):
+        self.exact = dict(exact or {})
+        self.profile_dir = profile_dir
+        self._profiles = {}  # 表头签名 -> 厂站配置
+        self._latin_index = {}  # 英文别名 -> [(标准列名, 权重)]
+        cjk_aliases = {}
+        for canonical, spec in CANONICAL_COLUMNS.items():
+            for alias in spec["aliases"]:
+                if _CJK_TEXT.fullmatch(alias):
+                    cjk_aliases.setdefault(alias, []).append(canonical)
+                else:
+                    self._latin_index.setdefault(alias, []).append(canonical)
+        self._cjk_index = cjk_aliases
+        # 长别名优先，避免"污泥"类短词抢先匹配
+        self._cjk_pattern = re.compile("|".join(sorted(map(re.escape, cjk_aliases), key=len, reverse=True)))
+        self._stage_index = {token: stage for stage, tokens in STAGE_TOKENS.items() for token in tokens}
+        if profile_dir:
+            self._load_profiles()
+
+    def candidates(self, header):
+        """单个表头的候选标准列及得分（命中的别名越长得分越高）"""
+        text = normalize_header(header)
+        latin = _LATIN_TOKEN.findall(text)
+        cjk = "".join(_CJK_TEXT.findall(text))
+        stages = {self._stage_index[t] for t in latin if t in self._stage_index}
+        stages |= {stage for stage, tokens in STAGE_TOKENS.items() if any(t in cjk for t in tokens)}
+
+        scores = {}
+        for token in latin:
+            for canonical in self._latin_index.get(token, []):
+                scores[canonical] = scores.get(canonical, 0) + len(token)
+        for match in self._cjk_pattern.finditer(cjk):
+            for canonical in self._cjk_index[match.group()]:
+                scores[canonical] = scores.get(canonical, 0) + len(match.group())
+
+        result = {}
+        for canonical, score in scores.items():
+            stage = CANONICAL_COLUMNS[canonical].get("stage")
+            if stage is None:
+                result[canonical] = score
+            elif stage in stages and len(stages) == 1:
+                result[canonical] = score + 1
+        return result
+
+    def resolve(self, headers):
+        """解析整行表头，返回 {原始表头: 标准列名}；每个标准列最多对应一个表头"""
+        headers = list(headers)
+        profile = self._profiles.get(header_signature(headers))
+        if profile is not None:
+            return dict(profile["mapping"])
+
+        mapping = {}
+        taken = set()
+        for header in headers:
+            canonical = self.exact.get(header)
+            if canonical is not None and canonical not in taken:
+                mapping[header] = canonical
+                taken.add(canonical)
+
+        # 模糊匹配：所有(表头, 标准列)候选按得分从高到低分配
+        ranked = []
+        for order, header in enumerate(headers):
+            if header in mapping:
+                continue
+            for canonical, score in self.candidates(header).items():
+                ranked.append((-score, order, header, canonical))
+        for _, _, header, canonical in sorted(ranked):
+            if header not in mapping and canonical not in taken:
+                mapping[header] = canonical
+                taken.add(canonical)
+        return {header: mapping[header] for header in headers if header in mapping}
+
+    def save_profile(self, headers, mapping, plant=None):
+        """保存厂站列映射配置；同一表头布局再次出现时直接使用，不再模糊匹配"""
+        headers = list(headers)
+        signature = header_signature(headers)
+        profile = {"plant": plant, "headers": headers, "mapping": dict(mapping)}
+        self._profiles[signature] = profile
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            with open(os.path.join(self.profile_dir, f"{signature}.json"), "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+
+    def has_profile(self, headers):
+        return header_signature(list(headers)) in self._profiles
+
+    def needs_confirmation(self, headers, mapping):
+        """映射是否含模糊匹配结果且尚未保存为厂站配置（需用户确认后再保存）
+
+        日期列一向按列名自动识别，不计入需确认的模糊匹配。
+        """
+        if self.has_profile(headers):
+            return False
+        return any(self.exact.get(header) != canonical
+                   for header, canonical in mapping.items() if canonical != "日期")
+
+    def clear_profiles(self):
+        """删除全部已保存的厂站配置（含 profile_dir 中的文件），返回删除的配置数"""
+        count = len(self._profiles)
+        self._profiles.clear()
+        if self.profile_dir and os.path.isdir(self.profile_dir):
+            for name in os.listdir(self.profile_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.profile_dir, name))
+        return count
+
+    def _load_profiles(self):
+        if not os.path.isdir(self.profile_dir):
+            return
+        for name in os.listdir(self.profile_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.profile_dir, name), encoding="utf-8") as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._profiles[header_signature(profile["headers"])] = profile
@@ -0,0 +1,341 @@
+import datetime
+import io
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .column_resolver import ColumnResolver
+
+try:
+    import python_calamine  # noqa: F401  Rust实现的高速xlsx/xls读取引擎（可选）
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+try:
+    import xlrd  # noqa: F401  旧版BIFF格式（.xls）读取（可选）
+    HAS_XLRD = True
+except ImportError:
+    HAS_XLRD = False
+
+# 文件头魔数：xlsx为zip包，xls为OLE2复合文档
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+HEADER_ROWS = 2
+# pandas为空的第一行表头单元格生成的占位名
+BLANK_TOP_HEADER = re.compile(r"Unnamed: \d+_level_0")
+
+# Excel序列号日期的起点
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+# 文本日期格式：(识别正则, pd.to_datetime 的 format)
+DATE_TEXT_FORMATS = [
+    (re.compile(r"\d{4}-\d{1,2}-\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?"), "ISO8601"),
+    (re.compile(r"\d{4}年\d{1,2}月\d{1,2}日"), "%Y年%m月%d日"),
+    (re.compile(r"\d{4}/\d{1,2}/\d{1,2}"), "%Y/%m/%d"),
+    (re.compile(r"\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}"), "%Y/%m/%d %H:%M"),
+    (re.compile(r"\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}:\d{2}"), "%Y/%m/%d %H:%M:%S"),
+]
+DATE_SAMPLE_SIZE = 200
+
+# 核算必需的列（列名映射后）
+REQUIRED_COLUMNS = [
+    "日期", "处理水量(m³)", "电耗(kWh)", "进水COD(mg/L)", "出水COD(mg/L)",
+    "进水TN(mg/L)", "出水TN(mg/L)", "PAC投加量(kg)", "次氯酸钠投加量(kg)", "PAM投加量(kg)"
+]
+
+# 已知表格布局的精确列名映射（合并多级表头后的实际列名 → 标准列名），其余表头由ColumnResolver识别
+COLUMN_MAPPING = {
+    "处理水量 m3/d_Unnamed: 1_level_1": "处理水量(m³)",
+    "能耗 kWh/d_Unnamed: 2_level_1": "电耗(kWh)",
+    "自来水 m³/d_Unnamed: 3_level_1": "自来水(m³/d)",
+    "CODcr(mg/l)_进水": "进水COD(mg/L)",
+    "CODcr(mg/l)_出水": "出水COD(mg/L)",
+    "SS(mg/l)_进水": "进水SS(mg/L)",
+    "SS(mg/l)_出水": "出水SS(mg/L)",
+    "NH3-N(mg/l)_进水": "进水NH3-N(mg/L)",
+    "NH3-N(mg/l)_出水": "出水NH3-N(mg/L)",
+    "TN(mg/l)_进水": "进水TN(mg/L)",
+    "TN(mg/l)_出水": "出水TN(mg/L)",
+    "PAC消耗 kg/d_Unnamed: 12_level_1": "PAC投加量(kg)",
+    "次氯酸钠消耗 kg/d_Unnamed: 13_level_1": "次氯酸钠投加量(kg)",
+    "污泥脱水药剂消耗(PAM) kg/d_Unnamed: 14_level_1": "PAM投加量(kg)",
+    "脱水污泥外运量(80%)_Unnamed: 15_level_1": "脱水污泥外运量(80%)"
+}
+
+DEFAULT_RESOLVER = ColumnResolver(exact=COLUMN_MAPPING)
+
+
+def merge_header_levels(columns):
+    """合并多级表头为单级列名
+
+    第一行表头的空单元格沿用左侧的指标名：Excel合并单元格由pandas自动向右填充，
+    CSV没有合并单元格（如 COD,"" 下接 进水,出水），需在此补齐。
+    """
+    new_columns = []
+    part1 = ""
+    for col in columns:
+        top = str(col[0]).strip() if not pd.isna(col[0]) else ""
+        if top and (not part1 or not BLANK_TOP_HEADER.fullmatch(top)):
+            part1 = top  # 第一行表头（指标名）
+        part2 = str(col[1]).strip() if not pd.isna(col[1]) else ""  # 第二行表头（状态/单位）
+        # 改进合并规则：去除多余空格和换行符
+        merged_col = f"{part1}_{part2}" if part2 else part1
+        merged_col = re.sub(r'\s+', ' ', merged_col)  # 替换多个空格为单个空格
+        merged_col = merged_col.replace('\n', '')  # 移除换行符
+        new_columns.append(merged_col)
+    return new_columns
+
+
+def _date_kind(value):
+    """单个日期值的类型：'datetime'（日期单元格）、'serial'（Excel序列号）或文本格式的format"""
+    if isinstance(value, (datetime.date, np.datetime64)):
+        return "datetime"
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return "serial"
+    if isinstance(value, str):
+        text = value.strip()
+        for pattern, fmt in DATE_TEXT_FORMATS:
+            if pattern.fullmatch(text):
+                return fmt
+    return None
+
+
+def detect_date_format(values, sample_size=DATE_SAMPLE_SIZE):
+    """均匀抽样识别日期列的主要格式，无法识别时返回 None"""
+    non_null = values.dropna()
+    if non_null.empty:
+        return None
+    positions = np.unique(np.linspace(0, len(non_null) - 1, min(sample_size, len(non_null))).astype(int))
+    kinds = Counter(_date_kind(value) for value in non_null.iloc[positions])
+    kind, _ = kinds.most_common(1)[0]
+    return kind
+
+
+def _serial_to_datetime(values):
+    """Excel序列号 → 日期（非数值按缺失处理）"""
+    return EXCEL_EPOCH + pd.to_timedelta(pd.to_numeric(values, errors="coerce"), unit='D')
+
+
+def parse_dates(values):
+    """日期列快速解析
+
+    先抽样识别格式（Excel序列号、日期单元格、ISO、YYYY年MM月DD日、YYYY/M/D），
+    用一次显式格式的向量化调用解析整列，只对解析失败的行逐行兜底解析；
+    仍无法解析的行为 NaT。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if pd.api.types.is_numeric_dtype(values):
+        # 处理Excel序列号日期
+        return _serial_to_datetime(values)
+
+    kind = detect_date_format(values)
+    if kind == "serial":
+        parsed = _serial_to_datetime(values)
+    elif kind == "datetime":
+        # 日期单元格直接转换，其中的ISO文本一并解析
+        parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    elif kind is not None:
+        parsed = pd.to_datetime(values, errors="coerce", format=kind)
+    else:
+        # 未识别出主要格式：按原方式逐元素推断
+        parsed = pd.to_datetime(values, errors="coerce", format='mixed')
+
+    # 兜底：只对快速路径解析失败的行，按各自识别出的格式逐行解析
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        rest = values[failed]
+        for row_kind, rows in rest.groupby(rest.map(_date_kind).fillna("")):
+            if row_kind == "serial":
+                converted = _serial_to_datetime(rows)
+            elif row_kind in ("", "datetime", kind):
+                converted = pd.to_datetime(rows, errors="coerce", format='mixed')
+            else:
+                converted = pd.to_datetime(rows.str.strip(), errors="coerce", format=row_kind)
+            parsed[rows.index] = converted
+    return parsed
+
+
+def detect_format(data):
+    """根据文件头判断表格格式：xlsx、xls 或 csv"""
+    if data.startswith(XLSX_MAGIC):
+        return "xlsx"
+    if data.startswith(XLS_MAGIC):
+        return "xls"
+    return "csv"
+
+
+def _csv_encoding(data):
+    """CSV编码识别：优先UTF-8（含BOM），否则按国标编码读取"""
+    try:
+        data[:65536].decode("utf-8")
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+
+def _excel_engine(fmt):
+    if HAS_CALAMINE:
+        return "calamine"
+    if fmt == "xls":
+        if not HAS_XLRD:
+            raise ValueError("错误：读取.xls文件需要安装 xlrd 或 python-calamine")
+        return "xlrd"
+    return "openpyxl"
+
+
+def read_header(data, fmt):
+    """只读取前2行表头，返回合并后的单级列名"""
+    if fmt == "csv":
+        header = pd.read_csv(io.BytesIO(data), header=list(range(HEADER_ROWS)), nrows=1,
+                             encoding=_csv_encoding(data))
+    else:
+        # xlsx表头用openpyxl只读模式流式读取前几行；calamine会先载入整张表，不适合只读表头
+        engine = "openpyxl" if fmt == "xlsx" else _excel_engine(fmt)
+        header = pd.read_excel(io.BytesIO(data), header=list(range(HEADER_ROWS)), nrows=1, engine=engine)
+    return merge_header_levels(header.columns)
+
+
+def read_columns(data, fmt, positions):
+    """只读取指定位置的数据列（跳过表头），返回以列位置为列名的DataFrame"""
+    if fmt == "csv":
+        return pd.read_csv(io.BytesIO(data), header=None, skiprows=HEADER_ROWS, usecols=positions,
+                           encoding=_csv_encoding(data))
+    engine = _excel_engine(fmt)
+    if engine != "openpyxl":
+        return pd.read_excel(io.BytesIO(data), header=None, skiprows=HEADER_ROWS, usecols=positions, engine=engine)
+
+    # 无calamine时用openpyxl只读模式逐行流式读取，只保留所需列
+    import openpyxl
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        columns = {pos: [] for pos in positions}
+        last_filled = 0
+        for row in sheet.iter_rows(min_row=HEADER_ROWS + 1, values_only=True):
+            filled = False
+            for pos, values in columns.items():
+                value = row[pos] if pos < len(row) else None
+                values.append(value)
+                filled = filled or value is not None
+            if filled:
+                last_filled = len(columns[positions[0]])
+    finally:
+        workbook.close()
+    # 与pandas一致：去掉表格末尾的空行
+    return pd.DataFrame({pos: values[:last_filled] for pos, values in columns.items()})
+
+
+def load_operating_data(data, resolver=None):
+    """解析上传的运行数据表格（支持xlsx、xls、csv，前2行为表头）
+
+    data 为文件内容（bytes）。先只读取表头、由 resolver（默认 DEFAULT_RESOLVER）解析列名映射，
+    再只加载映射到的列。解析结果不会自动保存为厂站配置，由调用方在用户确认映射后
+    调用 resolver.save_profile。
+    返回 (df, info)：df 为映射列名、解析日期、过滤无效日期并按日期排序后的数据；
+    info 记录合并后的原始列名、列名映射与被过滤的无效日期行号，可直接序列化为JSON。
+    表格结构不符合要求时抛出 ValueError。
+    """
+    resolver = resolver or DEFAULT_RESOLVER
+    fmt = detect_format(data)
+    merged_columns = read_header(data, fmt)
+
+    # 列名映射：已知布局直接查表，其余表头按归一化词索引一次匹配
+    mapping = resolver.resolve(merged_columns)
+    if "日期" not in mapping.values():
+        raise ValueError("错误：表格中未找到日期列（如'日期'、'时间'），请检查表格结构！")
+    selected = {pos: mapping[col] for pos, col in enumerate(merged_columns) if col in mapping}
+
+    # 检查必需的列是否存在
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in selected.values()]
+    if missing_columns:
+        mapped_columns = [mapping.get(col, col) for col in merged_columns]
+        col_dict = {i: col for i, col in enumerate(mapped_columns)}
+        raise ValueError(f"错误：映射后仍缺少以下必需列：{missing_columns}。当前列名：{col_dict}")
+
+    positions = sorted(selected)
+    df = read_columns(data, fmt, positions)
+    df = df[positions].set_axis([selected[pos] for pos in positions], axis=1)
+    # 测量列统一转为数值，无法解析的文本按缺失值处理
+    for col in df.columns.drop("日期"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # 日期解析：抽样识别格式后整列向量化解析，失败行再逐行兜底
+    df["日期"] = parse_dates(df["日期"])
+
+    # 处理无效日期
+    invalid_rows = df[df["日期"].isna()].index.tolist()
+    df = df.dropna(subset=["日期"]).sort_values("日期")
+    if len(df) == 0:
+        raise ValueError("错误：没有有效日期数据，请检查表格日期格式")
+
+    info = {"columns": merged_columns, "mapping": mapping, "invalid_rows": [int(i) for i in invalid_rows]}
+    return df, info
+
+
+def load_operating_batch(sources, resolver=None):
+    """批量解析多个表格（如各月报表），按日期合并；同一日期以后出现的表格为准
+
+    返回 (df, infos)，infos 与 sources 一一对应。
+    """
+    frames, infos = [], []
+    for data in sources:
+        df, info = load_operating_data(data, resolver=resolver)
+        frames.append(df)
+        infos.append(info)
+    if not frames:
+        raise ValueError("错误：没有可解析的表格")
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=["日期"], keep="last").sort_values("日期").reset_index(drop=True)
+    return df, infos
+
+
+def compact_frame(df, keep_columns=None):
+    """压缩运行数据：只保留核算所需列，测量列在精度允许时降为float32
+
+    keep_columns 默认为 REQUIRED_COLUMNS。float64 与整数列（含可空 Int64，缺失值转为 NaN）
+    只有全部取值都能由float32精确还原时才降为float32（如 2**24 以内的整数、0.5、0.25），
+    否则保留原类型：4037.82 之类的小数转为float32会变成 4037.820068，核算结果随之改变。
+    因此压缩不改变任何核算结果。
+    """
+    keep_columns = REQUIRED_COLUMNS if keep_columns is None else keep_columns
+    df = df[[col for col in keep_columns if col in df.columns]]
+    downcast = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if dtype != np.float64 and not pd.api.types.is_integer_dtype(dtype):
+            continue
+        values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        compact = values.astype(np.float32)
+        if np.array_equal(compact.astype(np.float64), values, equal_nan=True):
+            downcast[col] = compact
+    return df.assign(**downcast) if downcast else df
+
+
+def frame_bytes(df):
+    """DataFrame占用的内存字节数（含object列内容）"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def memory_report(stages):
+    """各处理阶段的内存占用报告；stages 为 {阶段名: DataFrame 或 已统计的字节数}"""
+    rows = []
+    for name, stage in stages.items():
+        if stage is None:
+            continue
+        if isinstance(stage, pd.DataFrame):
+            rows.append({"阶段": name, "行数": len(stage), "列数": stage.shape[1], "内存(KB)": frame_bytes(stage) / 1024})
+        else:
+            rows.append({"阶段": name, "行数": None, "列数": None, "内存(KB)": stage / 1024})
+    return pd.DataFrame(rows, columns=["阶段", "行数", "列数", "内存(KB)"])
+
+
+def load_compact_operating_data(data, resolver=None):
+    """解析并压缩运行数据，info["memory"] 记录解析后与压缩后的字节数"""
+    df, info = load_operating_data(data, resolver=resolver)
+    parsed_bytes = frame_bytes(df)
+    df = compact_frame(df)
+    info["memory"] = {"解析后": parsed_bytes, "压缩后": frame_bytes(df)}
+    return df, info
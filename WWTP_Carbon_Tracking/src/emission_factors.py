@@ -0,0 +1,137 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .carbon_calculator import CarbonCalculator, DIRECT_INPUT_COLUMNS, INDIRECT_INPUT_COLUMNS
+
+# 因子记录表的列：因子集编号、因子名称、生效起止日期（止日期当天全天有效，为空表示长期有效）、取值
+FACTOR_RECORD_COLUMNS = ["set_id", "factor", "valid_from", "valid_to", "value"]
+
+
+class FactorRegistry:
+    """分版本、分时段的排放因子库
+
+    每条记录为某个因子集（如"华东电网-2024修订"）中某个因子在一段日期内的取值。
+    核算时用一次 pd.merge_asof（按因子分组）把记录按日期对齐到每一行，得到逐行因子数组，
+    再交给核算内核一次算完，不按时段循环。因子集内没有记录、或日期不在任何有效期内的
+    因子使用核算器的默认值。
+
+    核算结果按（因子集、因子集版本、数据指纹）缓存；因子集新增记录后版本号递增，旧结果自然失效。
+    """
+
+    def __init__(self, calculator=None, max_cached=8):
+        self.calculator = calculator or CarbonCalculator()
+        self.max_cached = max_cached
+        self.records = pd.DataFrame({
+            "set_id": pd.Series(dtype=object),
+            "factor": pd.Series(dtype=object),
+            "valid_from": pd.Series(dtype="datetime64[ns]"),
+            "valid_to": pd.Series(dtype="datetime64[ns]"),
+            "value": pd.Series(dtype=np.float64)
+        })
+        self._versions = {}  # 因子集编号 -> 版本号
+        self._cache = OrderedDict()
+
+    @property
+    def set_ids(self):
+        return list(self._versions)
+
+    def version(self, set_id):
+        if set_id not in self._versions:
+            raise KeyError(f"没有排放因子集：{set_id}")
+        return self._versions[set_id]
+
+    def add(self, set_id, factor, value, valid_from, valid_to=None):
+        """添加单条因子记录"""
+        self.add_records([{"set_id": set_id, "factor": factor, "value": value,
+                           "valid_from": valid_from, "valid_to": valid_to}])
+
+    def add_records(self, records):
+        """批量添加因子记录（DataFrame或字典列表，列见 FACTOR_RECORD_COLUMNS）"""
+        frame = pd.DataFrame(records)
+        if "valid_to" not in frame.columns:
+            frame["valid_to"] = pd.NaT
+        missing_cols = [col for col in FACTOR_RECORD_COLUMNS if col not in frame.columns]
+        if missing_cols:
+            raise ValueError(f"因子记录缺少必需列：{missing_cols}")
+        frame = frame[FACTOR_RECORD_COLUMNS].copy()
+
+        unknown = sorted(set(frame["factor"]) - set(self.calculator.emission_factors()))
+        if unknown:
+            raise ValueError(f"错误：未知的排放因子：{unknown}")
+        frame["set_id"] = frame["set_id"].astype(str)
+        frame["valid_from"] = pd.to_datetime(frame["valid_from"], errors="coerce")
+        frame["valid_to"] = pd.to_datetime(frame["valid_to"], errors="coerce")
+        frame["value"] = pd.to_numeric(frame["value"], errors="coerce")
+        if frame["valid_from"].isna().any() or frame["value"].isna().any():
+            raise ValueError("错误：因子记录的生效日期或取值无效")
+        if (frame["valid_to"] < frame["valid_from"]).any():
+            raise ValueError("错误：因子记录的失效日期早于生效日期")
+
+        self.records = pd.concat([self.records, frame], ignore_index=True)
+        for set_id in frame["set_id"].unique():
+            self._versions[set_id] = self._versions.get(set_id, 0) + 1
+
+    def load_csv(self, source, **read_kwargs):
+        """从CSV（文件路径或文件对象）读取因子记录"""
+        self.add_records(pd.read_csv(source, **read_kwargs))
+
+    def factor_arrays(self, dates, set_id):
+        """按日期取因子集中的因子，返回与 dates 逐行对齐的因子字典（未覆盖的因子为默认标量）"""
+        self.version(set_id)
+        factors = self.calculator.emission_factors()
+        records = self.records[self.records["set_id"] == set_id].sort_values("valid_from", kind="stable")
+        names = records["factor"].unique()
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy()
+        rows = np.flatnonzero(~np.isnat(dates))
+        n = len(dates)
+
+        # 每个（行, 因子）组合一行，按日期排序后与记录表做一次分组as-of合并
+        left = pd.DataFrame({
+            "日期": np.tile(dates[rows], len(names)),
+            "factor": np.repeat(names, len(rows)),
+            "row": np.tile(rows, len(names)),
+            "code": np.repeat(np.arange(len(names)), len(rows))
+        }).sort_values("日期", kind="stable")
+        right = records[["factor", "valid_from", "valid_to", "value"]]
+        merged = pd.merge_asof(left, right, left_on="日期", right_on="valid_from", by="factor", direction="backward")
+
+        defaults = np.array([factors[name] for name in names], dtype=np.float64)
+        matrix = np.repeat(defaults[:, None], n, axis=1)
+        while len(merged):
+            # 止日期覆盖当天全天：带时刻的数据行（如 18:00）在止日期当天仍然有效
+            expired = (merged["日期"] >= merged["valid_to"].dt.normalize() + pd.Timedelta(days=1)).to_numpy()
+            found = merged[~expired & merged["value"].notna().to_numpy()]
+            matrix[found["code"].to_numpy(), found["row"].to_numpy()] = found["value"].to_numpy(dtype=np.float64)
+            # 匹配到的最近记录已失效：改查其生效日期之前的记录（更早的长期或更长有效期记录可能仍有效）
+            retry = merged.loc[expired, ["日期", "factor", "row", "code", "valid_from"]]
+            retry = retry.rename(columns={"valid_from": "before"}).sort_values("before", kind="stable")
+            merged = pd.merge_asof(retry, right, left_on="before", right_on="valid_from", by="factor",
+                                   direction="backward", allow_exact_matches=False)
+        factors.update(zip(names, matrix))
+        return factors
+
+    def calculate(self, df, set_id):
+        """在指定因子集下核算（按日期逐行取因子），结果同 CarbonCalculator.calculate_all"""
+        key = (set_id, self.version(set_id), self._fingerprint(df))
+        result = self._cache.get(key)
+        if result is None:
+            factors = self.factor_arrays(df["日期"], set_id)
+            result = self.calculator.calculate_all(df, factors)
+            self._cache[key] = result
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(key)
+        return result.copy(deep=False)
+
+    @staticmethod
+    def _fingerprint(df):
+        """核算输入（日期与输入列）的内容指纹"""
+        columns = ["日期", *DIRECT_INPUT_COLUMNS, *INDIRECT_INPUT_COLUMNS]
+        missing_cols = [col for col in columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"数据缺少必需列：{missing_cols}，请检查数据或列名映射！")
+        hashes = pd.util.hash_pandas_object(df[columns], index=True).to_numpy()
+        return hashlib.sha1(hashes.tobytes()).hexdigest()
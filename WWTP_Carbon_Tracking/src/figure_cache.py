@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class FigureCache:
+    """按输入指纹缓存Plotly图表（跨重跑、跨会话共享）
+
+    键为（图表名称, 输入指纹），指纹由数据内容哈希、月份、因子集等组成。
+    按最近使用顺序淘汰，条目数与图表JSON总大小均有上限。
+    返回的是缓存中的同一个Figure对象，调用方只用于展示，不要修改。
+    """
+
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (名称, 指纹) -> (Figure, JSON字节数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(*parts):
+        """输入指纹：DataFrame/Series按内容哈希，其余按JSON（字典按键排序）或repr"""
+        digest = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, (pd.DataFrame, pd.Series)):
+                digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+                digest.update(repr(list(part.columns) if isinstance(part, pd.DataFrame) else part.name).encode())
+            else:
+                try:
+                    digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode())
+                except TypeError:
+                    digest.update(repr(part).encode())
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def get_or_build(self, name, key, builder):
+        """命中时返回缓存的图表，否则调用 builder() 生成并缓存"""
+        cache_key = (name, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+
+        fig = builder()
+        size = len(fig.to_json(validate=False))
+        with self._lock:
+            self.misses += 1
+            if size > self.max_bytes:
+                return fig
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[cache_key] = (fig, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """缓存条目数、占用字节数与命中情况"""
+        with self._lock:
+            return {"条目数": len(self._entries), "占用字节": self._bytes, "命中": self.hits, "未命中": self.misses}
@@ -0,0 +1,157 @@
+from collections import deque
+
+import pandas as pd
+
+# 输送水量的管道类型（污泥、空气管道只传递碳排放归属，不输送水量）
+WATER_FLOW_TYPES = ("main", "bio")
+# 传递碳排放归属的管道类型：臭气管道只收集臭气，不承接上游归属的排放
+CARBON_FLOW_TYPES = ("main", "bio", "sludge", "air")
+# unit_data 中未给出 enabled 的单元是否启用（与 PlantDiagramEngine 的管道激活判断一致）
+DEFAULT_ENABLED = False
+# 管网节点名与 unit_data 中单元名不一致时的对应关系
+UNIT_ALIASES = {"生物除臭": "除臭系统"}
+
+
+class FlowNetwork:
+    """沿工艺管网传递水量与碳排放归属
+
+    以 PlantDiagramEngine.connections 的有向图为拓扑，初始化时做一次拓扑排序并缓存
+    各单元的下游闭包。按拓扑顺序计算：
+    - 水量：没有上游进水管道的单元以自身处理水量为进水，其余单元进水为上游水管道来水之和，
+      出水按权重分配到启用的下游水管道；
+    - 碳排放：单元累计排放 = 上游传入 + 自身排放，再按权重分配到下游水、污泥、空气管道
+      （臭气管道不传递），没有下游时滞留在该单元。各单元滞留排放之和等于全部自身排放。
+    停用的单元自身排放与出水均为0，连接停用单元的水管道视为断开；上游传入的排放滞留在停用单元，
+    不随停用而丢失。
+    节点参数按 UNIT_ALIASES 换名后从 unit_data 读取；未给出 enabled 的单元（含 unit_data 中没有的
+    单元，如臭氧、离心脱水机）按 DEFAULT_ENABLED 处理，与流程图的管道激活判断一致。
+
+    单元参数变化时只重算受影响的下游子图：排放或水量变化影响该单元的下游；
+    启停变化还会改变上游单元的分流比例，因此同时重算其上游单元的下游。
+    """
+
+    def __init__(self, connections, unit_data, weights=None):
+        self.unit_data = unit_data
+        self.weights = dict(weights or {})  # (上游, 下游) -> 分流权重，默认1
+        self.edges = [(start, end, flow_type) for start, end, _, flow_type in connections]
+        units = list(dict.fromkeys([u for start, end, _ in self.edges for u in (start, end)]))
+        self.successors = {unit: [] for unit in units}
+        self.predecessors = {unit: [] for unit in units}
+        for start, end, flow_type in self.edges:
+            self.successors[start].append((end, flow_type))
+            self.predecessors[end].append((start, flow_type))
+
+        self.order = self._topological_order(units)
+        self._rank = {unit: i for i, unit in enumerate(self.order)}
+        self._downstream = {}
+        for unit in reversed(self.order):
+            closure = {unit}
+            for end, _ in self.successors[unit]:
+                closure |= self._downstream[end]
+            self._downstream[unit] = frozenset(closure)
+
+        self.state = {}  # 单元 -> 计算结果
+        self.edge_water = {}  # (上游, 下游) -> 管道水量
+        self.edge_carbon = {}  # (上游, 下游) -> 管道传递的排放
+        self._snapshot = {}
+        self.last_recomputed = []
+        self.refresh()
+
+    def _topological_order(self, units):
+        indegree = {unit: len(self.predecessors[unit]) for unit in units}
+        queue = deque(unit for unit in units if indegree[unit] == 0)
+        order = []
+        while queue:
+            unit = queue.popleft()
+            order.append(unit)
+            for end, _ in self.successors[unit]:
+                indegree[end] -= 1
+                if indegree[end] == 0:
+                    queue.append(end)
+        if len(order) != len(units):
+            cyclic = [unit for unit in units if indegree[unit] > 0]
+            raise ValueError(f"错误：工艺管网存在环路，涉及单元：{cyclic}")
+        return tuple(order)
+
+    def downstream(self, unit):
+        """单元自身及其全部下游单元"""
+        return self._downstream[unit]
+
+    def _params(self, unit):
+        info = self.unit_data.get(UNIT_ALIASES.get(unit, unit), {})
+        return (bool(info.get("enabled", DEFAULT_ENABLED)), float(info.get("emission", 0.0)),
+                float(info.get("water_flow", 0.0)))
+
+    def _recompute(self, dirty):
+        """按拓扑顺序重算 dirty 中的单元，其余单元沿用缓存结果"""
+        dirty = sorted(dirty, key=self._rank.get)
+        for unit in dirty:
+            enabled, emission, water_flow = self._params(unit)
+            water_in_edges = [start for start, flow_type in self.predecessors[unit] if flow_type in WATER_FLOW_TYPES]
+            if water_in_edges:
+                water_in = sum(self.edge_water.get((start, unit), 0.0) for start in water_in_edges)
+            else:
+                water_in = water_flow if enabled else 0.0
+            carbon_in = sum(self.edge_carbon.get((start, unit), 0.0) for start, _ in self.predecessors[unit])
+            own = emission if enabled else 0.0
+            carbon_total = carbon_in + own
+
+            active = [(end, flow_type) for end, flow_type in self.successors[unit]
+                      if enabled and self._params(end)[0]]
+            water_active = [end for end, flow_type in active if flow_type in WATER_FLOW_TYPES]
+            # 碳排放归属也送往停用的下游单元并滞留在那里（水量只分配给启用的下游）
+            carbon_active = [end for end, flow_type in self.successors[unit]
+                             if enabled and flow_type in CARBON_FLOW_TYPES]
+            water_weight = sum(self.weights.get((unit, end), 1.0) for end in water_active)
+            carbon_weight = sum(self.weights.get((unit, end), 1.0) for end in carbon_active)
+            for end, flow_type in self.successors[unit]:
+                w = self.weights.get((unit, end), 1.0)
+                self.edge_water[(unit, end)] = (water_in * w / water_weight
+                                                if end in water_active and water_weight else 0.0)
+                self.edge_carbon[(unit, end)] = (carbon_total * w / carbon_weight
+                                                 if end in carbon_active and carbon_weight else 0.0)
+
+            passed = sum(self.edge_carbon[(unit, end)] for end, _ in self.successors[unit])
+            self.state[unit] = {
+                "启用": enabled,
+                "进水量(m³)": water_in if enabled else 0.0,
+                "自身排放(kgCO2eq)": own,
+                "上游传入排放(kgCO2eq)": carbon_in,
+                "累计排放(kgCO2eq)": carbon_total,
+                "向下游传递(kgCO2eq)": passed,
+                "滞留排放(kgCO2eq)": carbon_total - passed
+            }
+        self.last_recomputed = dirty
+        return dirty
+
+    def refresh(self, unit_data=None):
+        """与上次计算时的单元参数比较，只重算变化单元影响到的子图；返回重算的单元列表"""
+        if unit_data is not None:
+            self.unit_data = unit_data
+        params = {unit: self._params(unit) for unit in self.order}
+        if not self.state:
+            changed, toggled = set(self.order), set()
+        else:
+            changed = {unit for unit in self.order if params[unit] != self._snapshot[unit]}
+            toggled = {unit for unit in changed if params[unit][0] != self._snapshot[unit][0]}
+        self._snapshot = params
+
+        roots = set(changed)
+        for unit in toggled:
+            roots.update(start for start, _ in self.predecessors[unit])
+        dirty = set()
+        for unit in roots:
+            dirty |= self._downstream[unit]
+        return self._recompute(dirty)
+
+    def update(self, unit, **params):
+        """修改单个单元参数（如 enabled=False、emission=...）并增量重算"""
+        node = {name: node for node, name in UNIT_ALIASES.items()}.get(unit, unit)
+        if node not in self._rank or unit not in self.unit_data:
+            raise KeyError(f"工艺管网中没有可设置的单元：{unit}")
+        self.unit_data[unit].update(params)
+        return self.refresh()
+
+    def frame(self):
+        """按拓扑顺序排列的各单元水量与排放传递结果"""
+        return pd.DataFrame.from_dict(self.state, orient="index").loc[list(self.order)]
@@ -0,0 +1,132 @@
+import pandas as pd
+
+from .carbon_calculator import CarbonCalculator, EmissionTotals, DIRECT_INPUT_COLUMNS, INDIRECT_INPUT_COLUMNS
+
+
+class IncrementalCalculator:
+    """以"日期"为键的增量碳核算
+
+    已核算的行按月份分区保存，键为（日期, 日内序号）：同一日期的多行（逐时数据、
+    重复导出等）按出现顺序编号，各自核算、各自计入合计。同时记录每行输入值的哈希。每次 update 只重新核算
+    新增或输入值发生变化的行，月份/工艺区域合计通过"扣除旧值、累加新值"维护，
+    工作量只与变化行数（及其所在月份的行数）有关，不随历史数据增长。
+    """
+
+    INPUT_COLUMNS = DIRECT_INPUT_COLUMNS + INDIRECT_INPUT_COLUMNS
+
+    def __init__(self, calculator=None):
+        self.calculator = calculator or CarbonCalculator()
+        self.totals = EmissionTotals()
+        self._results = {}  # pd.Period -> 以（日期, 日内序号）为索引的核算结果
+        self._hashes = {}  # pd.Period -> 以（日期, 日内序号）为索引的输入行哈希
+        self.last_recomputed = 0
+
+    def update(self, df):
+        """合并一批运行数据，返回与 df 行顺序一致的核算结果
+
+        df 可以是完整历史、单月切片或仅新增的几天数据；未出现在 df 中的已有日期保持不变，
+        出现在 df 中的日期以 df 中该日期的全部行为准（行数减少时多出的旧行被删除）。
+        """
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError("输入数据必须为pandas DataFrame格式")
+        missing_cols = [col for col in ['日期'] + self.INPUT_COLUMNS if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"数据缺少必需列：{missing_cols}，请检查数据或列名映射！")
+
+        dates = pd.to_datetime(df['日期'], errors='coerce')
+        if dates.isna().any():
+            raise ValueError("增量核算要求所有行都有有效日期")
+
+        keys = pd.MultiIndex.from_arrays(
+            [pd.DatetimeIndex(dates), dates.groupby(dates).cumcount().to_numpy()], names=['日期', '序号'])
+        inputs = df[self.INPUT_COLUMNS].set_axis(keys)
+        hashes = pd.util.hash_pandas_object(inputs, index=False)
+        months = pd.DatetimeIndex(dates).to_period('M')
+
+        self.last_recomputed = 0
+        for month, positions in pd.Series(range(len(inputs))).groupby(months).groups.items():
+            self._update_month(month, inputs.iloc[positions], hashes.iloc[positions])
+
+        return self._collect(dates, keys, df.index)
+
+    def sync(self, df):
+        """以 df 为完整历史合并：同 update，另外删除 df 中已不存在的日期
+
+        同一会话连续上传追加了几天数据的表格时，只重新核算新增行所在的月份；
+        换成另一份文件时，旧文件独有的日期随之删除，不会残留在结果和合计中。
+        """
+        result = self.update(df)
+        present = pd.DatetimeIndex(pd.to_datetime(df['日期'])).unique()
+        for month in list(self._results):
+            stored = self._results[month]
+            missing = ~stored.index.get_level_values('日期').isin(present)
+            if not missing.any():
+                continue
+            self.totals.add(stored[missing].reset_index(), sign=-1)
+            if missing.all():
+                del self._results[month], self._hashes[month]
+                self.totals.discard_month(month)
+            else:
+                self._results[month] = stored[~missing]
+                self._hashes[month] = self._hashes[month][~missing]
+        return result
+
+    def _update_month(self, month, inputs, hashes):
+        """只重新核算该月中新增或变化的行，并同步维护合计"""
+        known = self._hashes.get(month)
+        if known is not None:
+            previous = known.reindex(hashes.index, fill_value=0).to_numpy()
+            changed = ~hashes.index.isin(known.index) | (previous != hashes.to_numpy())
+            # 本批出现的日期上、本批中已不存在的旧行（该日期行数减少）
+            batch_dates = known.index.get_level_values('日期').isin(inputs.index.get_level_values('日期'))
+            stale = known.index[batch_dates & ~known.index.isin(inputs.index)]
+        else:
+            changed = slice(None)
+            stale = None
+
+        rows = inputs[changed]
+        if rows.empty and (stale is None or stale.empty):
+            return
+        self.last_recomputed += len(rows)
+
+        result = self.calculator.calculate_all(rows.reset_index())
+        result.index = rows.index
+        stored = self._results.get(month)
+        if stored is not None:
+            removed = stored.index.intersection(rows.index).union(stale)
+            if len(removed):
+                self.totals.add(stored.loc[removed].reset_index(), sign=-1)
+            stored = pd.concat([stored.drop(index=removed), result.drop(columns='日期')]).sort_index()
+            known = pd.concat([known.drop(index=removed), hashes[changed]]).sort_index()
+        else:
+            stored = result.drop(columns='日期')
+            known = hashes.copy()
+        if len(result):
+            self.totals.add(result)
+        self._results[month] = stored
+        self._hashes[month] = known
+
+    def _collect(self, dates, keys, index):
+        """按原始行顺序取出核算结果"""
+        months = dates.dt.to_period('M').unique()
+        stored = pd.concat([self._results[month] for month in months])
+        result = stored.loc[keys].reset_index().drop(columns='序号')
+        result.index = index
+        return result
+
+    def nbytes(self):
+        """已保存的逐行核算结果与输入哈希占用的内存字节数"""
+        results = sum(frame.memory_usage(deep=True, index=True).sum() for frame in self._results.values())
+        hashes = sum(series.memory_usage(deep=True, index=True) for series in self._hashes.values())
+        return int(results + hashes)
+
+    def month_result(self, month):
+        """某月份（pd.Period 或可转换的字符串，如"2024-05"）的全部核算结果"""
+        stored = self._results.get(pd.Period(month, freq='M'))
+        if stored is None:
+            return pd.DataFrame(columns=['日期'] + self.INPUT_COLUMNS)
+        return stored.reset_index().drop(columns='序号')
+
+    def monthly(self):
+        """各月份的处理水量、各工艺区域排放与总排放合计"""
+        return self.totals.monthly()
@@ -0,0 +1,162 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from .figure_cache import FigureCache
+
+
+class ComputePipeline:
+    """带依赖追踪的计算流水线
+
+    由参数（上传文件、月份、因子集等外部输入）和节点（读取→月份切片→核算→单元分配→
+    区域合计→图表）组成有向无环图。每个节点声明自己的输入（参数或更早添加的节点），
+    输出按输入指纹缓存：参数指纹由调用方给出（如文件内容哈希）或按内容计算，
+    节点指纹由节点名与各输入指纹组合而成，因此无需对中间结果做哈希。
+
+    参数指纹变化时只把其下游节点标记为脏；读取节点时脏节点才重新计算，若其输入指纹
+    与缓存一致（参数改动后在读取前又改回）则直接复用。每个节点只缓存最近一次输出，
+    并记录最近一次耗时与计算/命中次数。
+    """
+
+    def __init__(self):
+        self._params = {}  # 参数名 -> (取值, 指纹)
+        self._nodes = OrderedDict()  # 节点名 -> (计算函数, 输入名元组)
+        self._downstream = {}  # 参数/节点名 -> 依赖它的全部下游节点
+        self._values = {}  # 节点名 -> (输入指纹元组, 输出, 节点指纹)
+        self._dirty = set()
+        self.timings = {}  # 节点名 -> {"耗时(ms)", "计算次数", "命中次数"}
+        self.last_recomputed = []
+
+    def add_node(self, name, func, inputs=()):
+        """添加节点：func 按 inputs 顺序接收各输入的值；输入须为已声明的参数或已添加的节点"""
+        if name in self._nodes:
+            raise ValueError(f"错误：节点 {name} 已存在")
+        inputs = tuple(inputs)
+        undefined = [item for item in inputs if item not in self._downstream]
+        if undefined:
+            raise ValueError(f"错误：节点 {name} 的输入未定义：{undefined}")
+        self._nodes[name] = (func, inputs)
+        self._downstream[name] = set()
+        self.timings[name] = {"耗时(ms)": None, "计算次数": 0, "命中次数": 0}
+        for item in inputs:
+            # 输入本身及其上游都把该节点计入下游
+            for upstream in self._upstream(item):
+                self._downstream[upstream].add(name)
+        self._dirty.add(name)
+
+    def declare_param(self, *names):
+        """预先声明参数名（取值稍后由 set_param 给出）"""
+        for name in names:
+            self._downstream.setdefault(name, set())
+
+    def _upstream(self, name):
+        """name 自身及其全部上游参数/节点"""
+        result, stack = {name}, [name]
+        while stack:
+            item = stack.pop()
+            for parent in self._nodes.get(item, (None, ()))[1]:
+                if parent not in result:
+                    result.add(parent)
+                    stack.append(parent)
+        return result
+
+    def set_param(self, name, value, fingerprint=None):
+        """设置参数；指纹变化时把下游节点标记为脏，返回是否发生变化"""
+        if name in self._nodes:
+            raise ValueError(f"错误：{name} 是计算节点，不能作为参数设置")
+        fingerprint = FigureCache.fingerprint(value) if fingerprint is None else str(fingerprint)
+        self._downstream.setdefault(name, set())
+        old = self._params.get(name)
+        self._params[name] = (value, fingerprint)
+        if old is not None and old[1] == fingerprint:
+            return False
+        self._dirty |= self._downstream[name]
+        return True
+
+    def fingerprint(self, name):
+        """参数或节点的指纹（节点会先确保已计算）"""
+        if name in self._params:
+            return self._params[name][1]
+        if name in self._dirty or name not in self._values:
+            self.get(name)
+        return self._values[name][2]
+
+    def is_dirty(self, name):
+        return name in self._dirty
+
+    def dirty_nodes(self):
+        return [name for name in self._nodes if name in self._dirty]
+
+    def get(self, name):
+        """取参数或节点的值，脏节点先按依赖顺序重算上游"""
+        if name in self._params:
+            return self._params[name][0]
+        if name not in self._nodes:
+            if name in self._downstream:
+                raise KeyError(f"计算流水线参数尚未设置：{name}")
+            raise KeyError(f"计算流水线中没有参数或节点：{name}")
+
+        func, inputs = self._nodes[name]
+        cached = self._values.get(name)
+        if name not in self._dirty and cached is not None:
+            self.timings[name]["命中次数"] += 1
+            return cached[1]
+
+        values = [self.get(item) for item in inputs]
+        key = tuple(self.fingerprint(item) for item in inputs)
+        if cached is not None and cached[0] == key:
+            # 被标记为脏但输入指纹与缓存一致，沿用缓存
+            self.timings[name]["命中次数"] += 1
+        else:
+            start = time.perf_counter()
+            output = func(*values)
+            elapsed = (time.perf_counter() - start) * 1000
+            digest = hashlib.sha1(repr((name, key)).encode()).hexdigest()
+            self._values[name] = (key, output, digest)
+            self.timings[name]["耗时(ms)"] = elapsed
+            self.timings[name]["计算次数"] += 1
+            self.last_recomputed.append(name)
+        self._dirty.discard(name)
+        return self._values[name][1]
+
+    def begin_run(self):
+        """开始一次脚本重跑：清空"本次重算"记录"""
+        self.last_recomputed = []
+
+    def report(self):
+        """各节点的输入、状态与耗时（DataFrame）"""
+        rows = []
+        for name, (_, inputs) in self._nodes.items():
+            timing = self.timings[name]
+            if name in self._dirty:
+                status = "待重算"
+            elif name in self.last_recomputed:
+                status = "本次重算"
+            elif name in self._values:
+                status = "缓存"
+            else:
+                status = "未计算"
+            rows.append({"节点": name, "输入": "、".join(inputs), "状态": status, **timing})
+        return pd.DataFrame(rows)
+
+
+def history_results(month_index, incremental_calc):
+    """全历史核算（流水线 history 节点）
+
+    incremental_calc 为本会话的增量核算器：上传追加了数据的新版表格时只重新核算新增或变化的行
+    （其余月份的结果原样复用）；上传另一份文件时，旧文件独有的日期被删除，不会混入本次结果与合计。
+    """
+    return incremental_calc.sync(month_index.frame)
+
+
+def month_results(month_index, history_calc, month, factor_registry=None, factor_set=None):
+    """当月核算结果（流水线 carbon 节点）：全历史结果按月切片
+
+    直接、间接排放由同一向量化内核一次算出；选择时变因子集时先按因子集版本取全历史核算
+    （一次合并+一次核算，带缓存）。结果与对当月切片直接调用 calculate_all 一致。
+    """
+    if factor_set is not None:
+        history_calc = factor_registry.calculate(month_index.frame, factor_set)
+    return month_index.select(month, history_calc)
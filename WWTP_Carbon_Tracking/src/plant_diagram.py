@@ -1,6 +1,31 @@
+import json
+
 import plotly.graph_objects as go
 import numpy as np
 
+from .flow_network import DEFAULT_ENABLED, FlowNetwork
+
+# 背景区域
+PLANT_AREAS = {
+    "预处理区": {"x": 80, "y": 80, "width": 750, "height": 120, "color": "rgba(220, 240, 255, 0.5)"},
+    "生物处理区": {"x": 80, "y": 180, "width": 750, "height": 120, "color": "rgba(220, 255, 220, 0.5)"},
+    "深度处理区": {"x": 830, "y": 80, "width": 350, "height": 220, "color": "rgba(255, 240, 220, 0.5)"},
+    "污泥处理区": {"x": 280, "y": 280, "width": 400, "height": 180, "color": "rgba(255, 220, 220, 0.5)"},
+    "辅助设施": {"x": 680, "y": 30, "width": 200, "height": 120, "color": "rgba(240, 220, 255, 0.5)"}
+}
+
+# 粒子数量与速度的基准：处理水量、水流速度均为 10000 m³/d 时每根管道5个粒子、1倍速
+REFERENCE_FLOW = 10000.0
+PARTICLES_PER_PIPE = 5
+
+# 排放着色阈值：中高/高排放为图中运行单元平均排放的倍数，随核算数据的量级缩放；
+# 默认单元数据（平均约885 kgCO2eq）下约为 1020/2035，着色与原固定阈值 1000/2000 一致
+EMISSION_LEVELS = (1.15, 2.3)
+
+# 静态底图与管道路径数组缓存（跨实例共享）：布局签名 -> 缓存内容
+_BASE_FIGURES = {}
+_PATH_ARRAYS = {}
+
 
 class PlantDiagramEngine:
     def __init__(self, unit_data):
@@ -78,63 +103,143 @@ class PlantDiagramEngine:
             ("污泥处理车间", "生物除臭", '#9c27b0', "gas")
         ]
 
+    def flow_network(self, weights=None):
+        """基于管道连接关系的水量与碳排放传递网络（见 flow_network.FlowNetwork）"""
+        return FlowNetwork(self.connections, self.unit_data, weights)
+
     def _is_path_active(self, start_unit, end_unit):
         """检查路径是否激活（上下游单元都启用）"""
-        start_active = self.unit_data.get(start_unit, {}).get("enabled", False)
-        end_active = self.unit_data.get(end_unit, {}).get("enabled", False)
+        start_active = self.unit_data.get(start_unit, {}).get("enabled", DEFAULT_ENABLED)
+        end_active = self.unit_data.get(end_unit, {}).get("enabled", DEFAULT_ENABLED)
         return start_active and end_active
 
-    def _create_flow_particles(self, flow_position):
-        """创建水流粒子，基于当前流动位置"""
-        particles = []
-        for start_unit, end_unit, color, flow_type in self.connections:
-            if not self._is_path_active(start_unit, end_unit):
-                continue
-
+    def _path_arrays(self):
+        """管道路径数组（按布局签名缓存）：起点、终点-起点向量、法向量及各管道的颜色与类型"""
+        signature = self._layout_signature()
+        paths = _PATH_ARRAYS.get(signature)
+        if paths is None:
+            geometry = self._pipe_geometry()
+            pipes = [(start, end, color, flow_type) for start, end, color, flow_type in self.connections
+                     if (start, end) in geometry]
+            points = np.array([geometry[(start, end)] for start, end, _, _ in pipes], dtype=np.float64).reshape(-1, 6)
+            delta = points[:, [4, 5]] - points[:, [0, 1]]
+            paths = {
+                "pipes": [(start, end) for start, end, _, _ in pipes],
+                "start": points[:, [0, 1]],
+                "delta": delta,
+                "normal": np.stack([delta[:, 1], -delta[:, 0]], axis=1),
+                "color": np.array([color for _, _, color, _ in pipes], dtype=object),
+                "main": np.array([flow_type == "main" for _, _, _, flow_type in pipes], dtype=bool)
+            }
+            _PATH_ARRAYS[signature] = paths
+        return paths
+
+    def _particle_layout(self, density=PARTICLES_PER_PIPE, max_per_pipe=200):
+        """各粒子所属管道、初始相位与速度倍数
+
+        启用管道的粒子数与速度倍数随上游单元处理水量（相对 REFERENCE_FLOW）缩放：
+        粒子数 = density × 水量比（至少1个），速度倍数为取整后的水量比（至少1倍，
+        取整保证一个周期后粒子回到起点，便于循环播放）。无水量数据的单元按基准水量计。
+        """
+        paths = self._path_arrays()
+        active = np.array([self._is_path_active(start, end) for start, end in paths["pipes"]], dtype=bool)
+        ratio = np.array([self.unit_data.get(start, {}).get("water_flow", REFERENCE_FLOW) / REFERENCE_FLOW
+                          for start, _ in paths["pipes"]], dtype=np.float64)
+        index = np.flatnonzero(active)
+        counts = np.clip(np.rint(density * ratio[index]), 1, max_per_pipe).astype(np.intp)
+        laps = np.maximum(np.rint(ratio[index]), 1)
+
+        pipe = np.repeat(index, counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        per_pipe = np.repeat(counts, counts)
+        offset = (np.arange(len(pipe)) - first) * (100 / per_pipe)
+        return pipe, offset, np.repeat(laps, counts)
+
+    def _particle_positions(self, flow_positions, speed=1.0, density=PARTICLES_PER_PIPE):
+        """一次广播计算多个流动位置下全部粒子的坐标，返回 ((位置数, 粒子数, 2)数组, 颜色, 大小, 透明度)"""
+        paths = self._path_arrays()
+        pipe, offset, laps = self._particle_layout(density)
+        flow_positions = np.atleast_1d(np.asarray(flow_positions, dtype=np.float64))
+        phase = (flow_positions[:, None] * speed * laps[None, :] + offset[None, :]) % 100
+        progress = (phase / 100.0)[..., None]
+        # 曲线流动效果
+        curve = 0.1 * np.sin(progress * np.pi)
+        xy = paths["start"][pipe] + paths["delta"][pipe] * progress + curve * paths["normal"][pipe]
+
+        main = paths["main"][pipe]
+        # 根据流程类型调整粒子大小和透明度
+        return xy, paths["color"][pipe], np.where(main, 8, 6), np.where(main, 0.8, 0.6)
+
+    @staticmethod
+    def _particle_groups(colors):
+        """按颜色（即流程类型）分组的粒子下标；每组画成一条标记属性为标量的轨迹，避免逐点校验颜色"""
+        unique, inverse = np.unique(colors.astype(str), return_inverse=True)
+        return [(color, np.flatnonzero(inverse == i)) for i, color in enumerate(unique)]
+
+    def _particle_traces(self, xy, colors, sizes, opacities):
+        return [dict(
+            type="scatter",
+            x=xy[idx, 0],
+            y=xy[idx, 1],
+            mode='markers',
+            marker=dict(size=int(sizes[idx[0]]), color=color, opacity=float(opacities[idx[0]]), symbol='circle'),
+            showlegend=False,
+            hoverinfo='none'
+        ) for color, idx in self._particle_groups(colors)]
+
+    def _create_flow_particles(self, flow_position, flow_rate=REFERENCE_FLOW, density=PARTICLES_PER_PIPE):
+        """创建水流粒子，基于当前流动位置；流速按侧边栏水流速度相对基准缩放"""
+        xy, colors, sizes, opacities = self._particle_positions(flow_position, flow_rate / REFERENCE_FLOW, density)
+        return xy[0], colors, sizes, opacities
+
+    def _layout_signature(self):
+        """静态布局（单元坐标、管道连接）的签名，作为底图缓存的键"""
+        return json.dumps([self.unit_coords, self.connections], sort_keys=True, ensure_ascii=False)
+
+    def _pipe_geometry(self):
+        """各管道的起点、中点、终点坐标：{(上游, 下游): (start_x, start_y, mid_x, mid_y, end_x, end_y)}"""
+        geometry = {}
+        for start_unit, end_unit, _, _ in self.connections:
             if start_unit in self.unit_coords and end_unit in self.unit_coords:
                 start_coords = self.unit_coords[start_unit]
                 end_coords = self.unit_coords[end_unit]
-
-                # 计算起点和终点坐标
                 start_x = start_coords["x"] + start_coords["width"]
                 start_y = start_coords["y"] + start_coords["height"] / 2
                 end_x = end_coords["x"]
                 end_y = end_coords["y"] + end_coords["height"] / 2
-
-                # 计算水流粒子位置 - 创建多个粒子以形成流动效果
-                num_particles = 5
-                for i in range(num_particles):
-                    # 粒子间距和位置计算
-                    phase = (flow_position + i * 20) % 100
-                    progress = phase / 100.0
-
-                    # 曲线流动效果
-                    curve_factor = 0.1 * np.sin(progress * np.pi)
-                    flow_x = start_x + (end_x - start_x) * progress + curve_factor * (end_y - start_y)
-                    flow_y = start_y + (end_y - start_y) * progress - curve_factor * (end_x - start_x)
-
-                    # 根据流程类型调整粒子大小和透明度
-                    size = 8 if flow_type == "main" else 6
-                    opacity = 0.8 if flow_type == "main" else 0.6
-                    particles.append((flow_x, flow_y, color, size, opacity))
-
-        return particles
-
-    def render(self, animation_active=True, flow_position=0):
-        """渲染交互式工艺图，完全复刻PDF图纸"""
-        fig = go.Figure()
-
-        # 绘制背景区域
-        areas = {
-            "预处理区": {"x": 80, "y": 80, "width": 750, "height": 120, "color": "rgba(220, 240, 255, 0.5)"},
-            "生物处理区": {"x": 80, "y": 180, "width": 750, "height": 120, "color": "rgba(220, 255, 220, 0.5)"},
-            "深度处理区": {"x": 830, "y": 80, "width": 350, "height": 220, "color": "rgba(255, 240, 220, 0.5)"},
-            "污泥处理区": {"x": 280, "y": 280, "width": 400, "height": 180, "color": "rgba(255, 220, 220, 0.5)"},
-            "辅助设施": {"x": 680, "y": 30, "width": 200, "height": 120, "color": "rgba(240, 220, 255, 0.5)"}
-        }
-
-        for area, props in areas.items():
-            fig.add_shape(
+                geometry[(start_unit, end_unit)] = (start_x, start_y, (start_x + end_x) / 2,
+                                                    (start_y + end_y) / 2, end_x, end_y)
+        return geometry
+
+    def _pipe_traces(self, active_only, opacity):
+        """每种流程类型一条多段折线（段间以None断开），而不是每根管道一条曲线"""
+        geometry = self._pipe_geometry()
+        segments = {}
+        for start_unit, end_unit, color, flow_type in self.connections:
+            points = geometry.get((start_unit, end_unit))
+            if points is None or (active_only and not self._is_path_active(start_unit, end_unit)):
+                continue
+            xs, ys = segments.setdefault((flow_type, color), ([], []))
+            xs.extend((points[0], points[2], points[4], None))
+            ys.extend((points[1], points[3], points[5], None))
+        return [dict(type="scatter", x=xs, y=ys, mode="lines",
+                     line=dict(color=color, width=4 if flow_type == "main" else 3, shape="spline"),
+                     opacity=opacity, hoverinfo="none", showlegend=False)
+                for (flow_type, color), (xs, ys) in segments.items()]
+
+    def _base_figure(self):
+        """静态底图（区域、单元名称、全部管道底色、图例、坐标轴布局），按布局签名缓存
+
+        返回plotly JSON结构的字典，供 render 叠加动态图层后一次性生成Figure。
+        """
+        signature = self._layout_signature()
+        base = _BASE_FIGURES.get(signature)
+        if base is not None:
+            return base
+
+        shapes, annotations = [], []
+        for area, props in PLANT_AREAS.items():
+            shapes.append(dict(
                 type="rect",
                 x0=props["x"],
                 y0=props["y"],
@@ -143,17 +248,86 @@ class PlantDiagramEngine:
                 line=dict(color="rgba(0,0,0,0.2)", width=1),
                 fillcolor=props["color"],
                 layer="below"
-            )
-            fig.add_annotation(
+            ))
+            annotations.append(dict(
                 x=props["x"] + props["width"] / 2,
                 y=props["y"] + props["height"] + 15,
                 text=area,
                 showarrow=False,
                 font=dict(size=14, color="black", weight="bold")
-            )
+            ))
+        # 单元名称标签
+        for unit, coords in self.unit_coords.items():
+            annotations.append(dict(
+                x=coords["x"] + coords["width"] / 2,
+                y=coords["y"] + coords["height"] / 2 + 5,
+                text=unit,
+                showarrow=False,
+                font=dict(size=12, color="black", family="Arial", weight="bold")
+            ))
+
+        # 全部管道以停用时的透明度打底，启用的管道在 render 中叠加
+        data = self._pipe_traces(active_only=False, opacity=0.3)
+        # 图例（一条轨迹多个点）
+        legend = [("主流程", '#1e88e5'), ("生物处理流程", '#4CAF50'), ("污泥流程", '#795548'), ("臭气流程", '#9c27b0')]
+        data.append(dict(
+            type="scatter",
+            x=[1150] * len(legend),
+            y=[650 - 30 * i for i in range(len(legend))],
+            mode='markers',
+            marker=dict(size=10, color=[color for _, color in legend]),
+            text=[name for name, _ in legend],
+            hoverinfo='text',
+            showlegend=False
+        ))
 
-        # 绘制工艺单元（矢量矩形）
+        layout = dict(
+            title=dict(text='污水处理工艺流程仿真（基于PDF图纸）', font=dict(size=24, family="Arial", color="black")),
+            xaxis=dict(
+                showgrid=False,
+                zeroline=False,
+                visible=False,
+                range=[0, 1200]
+            ),
+            yaxis=dict(
+                showgrid=False,
+                zeroline=False,
+                visible=False,
+                range=[400, 0]  # 反转Y轴，使顶部为0
+            ),
+            plot_bgcolor='rgba(245,245,245,1)',
+            paper_bgcolor='rgba(245,245,245,1)',
+            height=700,
+            width=1200,
+            hovermode='closest',
+            showlegend=False,
+            clickmode='event+select',  # 启用点击事件
+            shapes=shapes,
+            annotations=annotations
+        )
+        base = {"data": data, "layout": layout}
+        _BASE_FIGURES[signature] = base
+        return base
+
+    def emission_thresholds(self):
+        """中高/高排放着色阈值（kgCO2eq）：按图中运行单元的平均排放乘以 EMISSION_LEVELS"""
+        emissions = [info.get("emission", 0) for unit, info in self.unit_data.items()
+                     if unit in self.unit_coords and info.get("enabled", True)]
+        mean = float(np.mean(emissions)) if emissions else 0.0
+        return tuple(mean * level for level in EMISSION_LEVELS)
+
+    def render(self, animation_active=True, flow_position=0, flow_rate=REFERENCE_FLOW, density=PARTICLES_PER_PIPE):
+        """渲染交互式工艺图，完全复刻PDF图纸
+
+        静态底图只构建一次；每次渲染只生成动态图层（排放着色、状态标签、启用管道、
+        点击层与水流粒子），以列表一次性并入布局，最后只构造一次Figure。
+        """
+        base = self._base_figure()
+        shapes, annotations = [], []
+
+        # 工艺单元（按排放与状态着色的矩形）
         scatter_x, scatter_y, scatter_text, scatter_customdata = [], [], [], []
+        medium, high = self.emission_thresholds()
         for unit, coords in self.unit_coords.items():
             unit_info = self.unit_data.get(unit, {})
             emission = unit_info.get("emission", 0)
@@ -162,15 +336,14 @@ class PlantDiagramEngine:
             # 根据状态和排放量确定颜色
             if not enabled:
                 color = 'rgba(200, 200, 200, 0.7)'  # 灰色表示关闭
-            elif emission > 2000:
+            elif emission > high:
                 color = 'rgba(255, 100, 100, 0.7)'  # 红色表示高排放
-            elif emission > 1000:
+            elif emission > medium:
                 color = 'rgba(255, 200, 100, 0.7)'  # 橙色表示中高排放
             else:
                 color = 'rgba(100, 200, 100, 0.7)'  # 绿色表示低排放
 
-            # 绘制矩形作为工艺单元
-            fig.add_shape(
+            shapes.append(dict(
                 type="rect",
                 x0=coords["x"],
                 y0=coords["y"],
@@ -180,49 +353,57 @@ class PlantDiagramEngine:
                 fillcolor=color,
                 opacity=0.9,
                 layer="below"
-            )
-
-            # 添加单元名称标签
-            fig.add_annotation(
-                x=coords["x"] + coords["width"] / 2,
-                y=coords["y"] + coords["height"] / 2 + 5,
-                text=unit,
-                showarrow=False,
-                font=dict(size=12, color="black", family="Arial", weight="bold")
-            )
-
-            # 添加排放量标签
-            fig.add_annotation(
+            ))
+            # 排放量标签
+            annotations.append(dict(
                 x=coords["x"] + coords["width"] / 2,
                 y=coords["y"] + coords["height"] / 2 - 15,
                 text=f"{emission:.1f} kgCO2eq",
                 showarrow=False,
                 font=dict(size=10, color="black")
-            )
-
-            # 添加运行状态标签
-            status_text = "运行中" if enabled else "已关闭"
-            status_color = "green" if enabled else "red"
-            fig.add_annotation(
+            ))
+            # 运行状态标签
+            annotations.append(dict(
                 x=coords["x"] + coords["width"] / 2,
                 y=coords["y"] - 10,
-                text=status_text,
+                text="运行中" if enabled else "已关闭",
                 showarrow=False,
-                font=dict(size=10, color=status_color, weight="bold")
-            )
+                font=dict(size=10, color="green" if enabled else "red", weight="bold")
+            ))
 
-            # 添加透明点击区域（实现交互）
-            center_x = coords["x"] + coords["width"] / 2
-            center_y = coords["y"] + coords["height"] / 2
-            scatter_x.append(center_x)
-            scatter_y.append(center_y)
+            # 透明点击区域（实现交互）
+            scatter_x.append(coords["x"] + coords["width"] / 2)
+            scatter_y.append(coords["y"] + coords["height"] / 2)
             scatter_text.append(
                 f"单元: {unit}<br>排放: {emission:.1f} kgCO2eq<br>状态: {'运行中' if enabled else '关闭'}"
             )
             scatter_customdata.append(unit)
 
-        # 添加透明点击层
-        fig.add_trace(go.Scatter(
+        # 启用管道：每种流程类型一条轨迹，终点加箭头
+        data = self._pipe_traces(active_only=True, opacity=1.0)
+        geometry = self._pipe_geometry()
+        for start_unit, end_unit, color, _ in self.connections:
+            points = geometry.get((start_unit, end_unit))
+            if points is not None and self._is_path_active(start_unit, end_unit):
+                annotations.append(dict(
+                    x=points[4],
+                    y=points[5],
+                    ax=points[2],
+                    ay=points[3],
+                    xref='x',
+                    yref='y',
+                    axref='x',
+                    ayref='y',
+                    showarrow=True,
+                    arrowhead=2,
+                    arrowsize=1.5,
+                    arrowwidth=2,
+                    arrowcolor=color
+                ))
+
+        # 透明点击层
+        data.append(dict(
+            type="scatter",
             x=scatter_x,
             y=scatter_y,
             mode='markers',
@@ -233,144 +414,51 @@ class PlantDiagramEngine:
             name="点击交互层"
         ))
 
-        # 绘制管道连接
-        for start_unit, end_unit, color, flow_type in self.connections:
-            if start_unit in self.unit_coords and end_unit in self.unit_coords:
-                start_coords = self.unit_coords[start_unit]
-                end_coords = self.unit_coords[end_unit]
-
-                # 计算起点和终点坐标
-                start_x = start_coords["x"] + start_coords["width"]
-                start_y = start_coords["y"] + start_coords["height"] / 2
-                end_x = end_coords["x"]
-                end_y = end_coords["y"] + end_coords["height"] / 2
-
-                # 计算控制点（用于曲线）
-                mid_x = (start_x + end_x) / 2
-                mid_y = (start_y + end_y) / 2
-
-                # 根据连接类型调整曲线
-                if flow_type == "main":
-                    # 主流程使用较粗的线
-                    line_width = 4
-                else:
-                    line_width = 3
-
-                # 根据状态调整颜色透明度
-                if self._is_path_active(start_unit, end_unit):
-                    line_opacity = 1.0
-                else:
-                    line_opacity = 0.3
-
-                # 绘制带箭头的曲线管道
-                fig.add_trace(go.Scatter(
-                    x=[start_x, mid_x, end_x],
-                    y=[start_y, mid_y, end_y],
-                    mode='lines',
-                    line=dict(
-                        color=color,
-                        width=line_width,
-                        shape='spline'
-                    ),
-                    opacity=line_opacity,
-                    hoverinfo='none',
-                    showlegend=False
-                ))
-
-                # 添加箭头
-                if self._is_path_active(start_unit, end_unit):
-                    fig.add_annotation(
-                        x=end_x,
-                        y=end_y,
-                        ax=mid_x,
-                        ay=mid_y,
-                        xref='x',
-                        yref='y',
-                        axref='x',
-                        ayref='y',
-                        showarrow=True,
-                        arrowhead=2,
-                        arrowsize=1.5,
-                        arrowwidth=2,
-                        arrowcolor=color
-                    )
-
-        # 添加动态水流效果
+        # 动态水流效果
         if animation_active:
-            flow_particles = self._create_flow_particles(flow_position)
-            if flow_particles:
-                flow_x, flow_y, flow_colors, flow_sizes, flow_opacities = zip(*flow_particles)
-                fig.add_trace(go.Scatter(
-                    x=flow_x,
-                    y=flow_y,
-                    mode='markers',
-                    marker=dict(
-                        size=flow_sizes,
-                        color=flow_colors,
-                        opacity=flow_opacities,
-                        symbol='circle'
-                    ),
-                    showlegend=False,
-                    hoverinfo='none'
-                ))
-
-        # 添加图例
-        fig.add_trace(go.Scatter(
-            x=[1150], y=[650],
-            mode='markers',
-            marker=dict(size=10, color='#1e88e5'),
-            text='主流程',
-            hoverinfo='text',
-            showlegend=False
-        ))
-        fig.add_trace(go.Scatter(
-            x=[1150], y=[620],
-            mode='markers',
-            marker=dict(size=10, color='#4CAF50'),
-            text='生物处理流程',
-            hoverinfo='text',
-            showlegend=False
-        ))
-        fig.add_trace(go.Scatter(
-            x=[1150], y=[590],
-            mode='markers',
-            marker=dict(size=10, color='#795548'),
-            text='污泥流程',
-            hoverinfo='text',
-            showlegend=False
-        ))
-        fig.add_trace(go.Scatter(
-            x=[1150], y=[560],
-            mode='markers',
-            marker=dict(size=10, color='#9c27b0'),
-            text='臭气流程',
-            hoverinfo='text',
-            showlegend=False
-        ))
-
-        # 设置布局
-        fig.update_layout(
-            title='污水处理工艺流程仿真（基于PDF图纸）',
-            title_font=dict(size=24, family="Arial", color="black"),
-            xaxis=dict(
-                showgrid=False,
-                zeroline=False,
-                visible=False,
-                range=[0, 1200]
-            ),
-            yaxis=dict(
-                showgrid=False,
-                zeroline=False,
-                visible=False,
-                range=[400, 0]  # 反转Y轴，使顶部为0
-            ),
-            plot_bgcolor='rgba(245,245,245,1)',
-            paper_bgcolor='rgba(245,245,245,1)',
-            height=700,
-            width=1200,
-            hovermode='closest',
-            showlegend=False,
-            clickmode='event+select'  # 启用点击事件
-        )
-
-        return fig
\ No newline at end of file
+            flow_xy, flow_colors, flow_sizes, flow_opacities = self._create_flow_particles(
+                flow_position, flow_rate, density)
+            data.extend(self._particle_traces(flow_xy, flow_colors, flow_sizes, flow_opacities))
+
+        layout = dict(base["layout"], shapes=base["layout"]["shapes"] + shapes,
+                      annotations=base["layout"]["annotations"] + annotations)
+        return go.Figure(data=base["data"] + data, layout=layout)
+
+    def particle_frames(self, n_frames=20, density=PARTICLES_PER_PIPE):
+        """一个完整流动周期内全部粒子的位置，形状为 (帧数, 粒子数, 2)
+
+        与 _create_flow_particles 的粒子轨迹一致：第 k 帧对应 flow_position = 100·k/帧数。
+        同时返回与粒子顺序对应的颜色、大小、透明度（各帧相同）。
+        """
+        return self._particle_positions(np.arange(n_frames) * 100 / n_frames, density=density)
+
+    def render_animation(self, n_frames=20, frame_duration=100, flow_rate=REFERENCE_FLOW, density=PARTICLES_PER_PIPE):
+        """带预计算动画帧的工艺图：粒子位置一次性作为Plotly frames下发，由浏览器端播放
+
+        每帧只更新粒子轨迹的坐标，播放/暂停不经过服务端，也不重新渲染整张图。
+        水流速度 flow_rate 通过缩短/延长每帧时长体现，帧内容保持一个闭合周期。
+        """
+        fig = self.render(animation_active=False)
+        xy, colors, sizes, opacities = self.particle_frames(n_frames, density)
+        frame_duration = max(1, int(frame_duration * REFERENCE_FLOW / max(flow_rate, 1)))
+        if xy.shape[1] == 0:
+            return fig
+
+        first_trace = len(fig.data)
+        groups = self._particle_groups(colors)
+        fig.add_traces(self._particle_traces(xy[0], colors, sizes, opacities))
+        traces = list(range(first_trace, first_trace + len(groups)))
+        fig.frames = [go.Frame(data=[go.Scatter(x=frame[idx, 0], y=frame[idx, 1]) for _, idx in groups],
+                               traces=traces, name=str(k))
+                      for k, frame in enumerate(xy)]
+        play = dict(frame=dict(duration=frame_duration, redraw=False),
+                    transition=dict(duration=frame_duration, easing="linear"), fromcurrent=True, mode="immediate")
+        fig.update_layout(updatemenus=[dict(
+            type="buttons", showactive=False, x=0.02, y=0.02, xanchor="left", yanchor="bottom",
+            buttons=[
+                dict(label="▶ 播放", method="animate", args=[None, play]),
+                dict(label="⏸ 暂停", method="animate",
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")])
+            ]
+        )])
+        return fig
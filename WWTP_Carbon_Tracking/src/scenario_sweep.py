@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from .carbon_calculator import CarbonCalculator
+
+# 优化滑块的默认取值范围（%）
+AERATION_RANGE = np.arange(-30, 31)
+PAC_RANGE = np.arange(-20, 21)
+# 区域能耗调整的取值（%）：步长5，多个区域同时扫描时组合数仍在可控范围内
+ENERGY_RANGE = np.arange(-20, 21, 5)
+# 曝气、PAC调整按比例削减生物处理区、深度处理区的全部排放（含其分摊的电耗），
+# 这两个区域不再单独做能耗调整，以免同一部分电耗排放被重复计入减排
+SWEEP_COVERED_AREAS = ("生物处理区", "深度处理区")
+
+
+class ScenarioSweep:
+    """工艺优化情景扫描
+
+    对曝气时间、PAC投加量及各工艺区域能耗调整的全部组合一次广播计算减排量：
+    每个调整维度先算出一维的分项减排，再按 np.ix_ 广播相加成多维减排曲面。
+    df_calc 只在初始化时汇总一次，之后任意滑块位置都只是查表。
+
+    与原单点模拟口径一致：曝气调整按比例削减生物处理区排放，PAC调整按比例削减
+    深度处理区排放，能耗调整按比例削减该区域分摊的电耗排放；正值表示削减。
+    """
+
+    def __init__(self, df_calc, aeration=AERATION_RANGE, pac=PAC_RANGE, energy_adjust=None,
+                 energy_distribution=None):
+        required_cols = ['bio_CO2eq', 'depth_CO2eq', 'total_CO2eq']
+        if energy_adjust:
+            required_cols.append('energy_CO2eq')
+        missing_cols = [col for col in required_cols if col not in df_calc.columns]
+        if missing_cols:
+            raise ValueError(f"数据缺少必需列：{missing_cols}，请先完成碳核算！")
+
+        share = energy_distribution or CarbonCalculator().energy_distribution
+        self.baseline_total = float(df_calc['total_CO2eq'].sum())
+        bio = float(df_calc['bio_CO2eq'].sum())
+        depth = float(df_calc['depth_CO2eq'].sum())
+
+        # 各维度取值（%）及对应的一维分项减排
+        self.axes = {"曝气时间调整": np.asarray(aeration), "PAC投加量调整": np.asarray(pac)}
+        parts = [bio - bio * (1 - self.axes["曝气时间调整"] / 100),
+                 depth - depth * (1 - self.axes["PAC投加量调整"] / 100)]
+        if energy_adjust:
+            energy = float(df_calc['energy_CO2eq'].sum())
+            for area, values in energy_adjust.items():
+                if area not in share:
+                    raise ValueError(f"错误：未知的工艺区域：{area}")
+                if area in SWEEP_COVERED_AREAS:
+                    raise ValueError(f"错误：{area}的电耗排放已由曝气/PAC调整覆盖，不能再单独调整能耗")
+                values = np.asarray(values)
+                self.axes[f"{area}能耗调整"] = values
+                parts.append(energy * share[area] * values / 100)
+        self.parts = dict(zip(self.axes, parts))
+
+        grids = np.ix_(*parts)
+        self.reduction = sum(grids[1:], grids[0])
+        self.optimized_total = self.baseline_total - self.reduction
+        self._positions = {name: {v: i for i, v in enumerate(values.tolist())} for name, values in self.axes.items()}
+
+    def _index(self, setting):
+        index = []
+        for name in self.axes:
+            value = setting.get(name, 0)
+            try:
+                index.append(self._positions[name][value])
+            except KeyError:
+                raise KeyError(f"{name}={value} 不在扫描范围内") from None
+        return tuple(index)
+
+    def lookup(self, aeration=0, pac=0, **energy_adjust):
+        """查询某一组调整的减排结果，energy_adjust 以"<区域>能耗调整"为键
+
+        energy_reductions 为各区域能耗调整对应的电耗排放减排量（以维度名为键）。
+        """
+        setting = {"曝气时间调整": aeration, "PAC投加量调整": pac, **energy_adjust}
+        index = self._index(setting)
+        return {
+            "bio_reduction": float(self.parts["曝气时间调整"][index[0]]),
+            "depth_reduction": float(self.parts["PAC投加量调整"][index[1]]),
+            "energy_reductions": {name: float(self.parts[name][i])
+                                  for name, i in zip(list(self.axes)[2:], index[2:])},
+            "reduction": float(self.reduction[index]),
+            "optimized_total": float(self.optimized_total[index])
+        }
+
+    def surface(self, **fixed):
+        """曝气×PAC减排曲面（DataFrame，行为曝气调整、列为PAC调整），其他维度取 fixed 指定值（默认0）"""
+        index = self._index(fixed)
+        surface = self.reduction[(slice(None), slice(None), *index[2:])]
+        return pd.DataFrame(surface,
+                            index=pd.Index(self.axes["曝气时间调整"], name="曝气时间调整"),
+                            columns=pd.Index(self.axes["PAC投加量调整"], name="PAC投加量调整"))
+
+    def pareto_front(self):
+        """帕累托最优调整方案：调整幅度（各维度绝对值之和）更小时减排量不可能更大
+
+        按调整幅度升序、减排量降序排列全部组合，保留减排量创新高的组合。
+        """
+        grids = np.meshgrid(*self.axes.values(), indexing="ij")
+        effort = sum(np.abs(g) for g in grids).ravel()
+        reduction = self.reduction.ravel()
+        order = np.lexsort((-reduction, effort))
+        ranked = reduction[order]
+        best_before = np.concatenate(([-np.inf], np.maximum.accumulate(ranked)[:-1]))
+        keep = order[ranked > best_before]
+
+        front = pd.DataFrame({name: g.ravel()[keep] for name, g in zip(self.axes, grids)})
+        front["调整幅度"] = effort[keep]
+        front["减排量"] = reduction[keep]
+        front["优化后总排放"] = self.optimized_total.ravel()[keep]
+        return front.reset_index(drop=True)
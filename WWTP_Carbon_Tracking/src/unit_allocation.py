@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from .carbon_calculator import CarbonCalculator, AREA_COLUMNS
+
+# 分配矩阵的排放源（行）：核算结果中的分项排放列
+SOURCE_COLUMNS = ['energy_CO2eq', 'N2O_CO2eq', 'CH4_CO2eq', 'PAC_CO2eq', 'PAM_CO2eq', 'NaClO_CO2eq']
+
+# 工艺单元配置：所属工艺区域，以及各排放源在区域内部的分配权重
+# 电耗权重取各单元的典型能耗（kWh），N₂O/CH₄按产生部位，药剂按投加部位；
+# 按《可行性方案》口径药剂排放计入深度处理区，PAM在区域内计入DF系统。
+# 新增单元只需在此添加一项（或向 UnitAllocation.from_areas 传入自定义配置）。
+UNIT_ALLOCATION = {
+    "粗格栅": {"area": "预处理区", "energy_CO2eq": 1500},
+    "提升泵房": {"area": "预处理区", "energy_CO2eq": 3500},
+    "细格栅": {"area": "预处理区", "energy_CO2eq": 800},
+    "曝气沉砂池": {"area": "预处理区", "energy_CO2eq": 1200},
+    "膜格栅": {"area": "预处理区", "energy_CO2eq": 1000},
+    "厌氧池": {"area": "生物处理区", "energy_CO2eq": 3000, "CH4_CO2eq": 1},
+    "缺氧池": {"area": "生物处理区", "energy_CO2eq": 3500, "N2O_CO2eq": 0.4},
+    "好氧池": {"area": "生物处理区", "energy_CO2eq": 5000, "N2O_CO2eq": 0.6},
+    "MBR膜池": {"area": "生物处理区", "energy_CO2eq": 4000},
+    "鼓风机房": {"area": "生物处理区", "energy_CO2eq": 2500},
+    "DF系统": {"area": "深度处理区", "energy_CO2eq": 2500, "PAC_CO2eq": 1, "PAM_CO2eq": 1, "NaClO_CO2eq": 1},
+    "催化氧化": {"area": "深度处理区", "energy_CO2eq": 1800},
+    "污泥处理车间": {"area": "泥处理区", "energy_CO2eq": 2000},
+    "消毒接触池": {"area": "出水区", "energy_CO2eq": 1000},
+    "除臭系统": {"area": "除臭系统", "energy_CO2eq": 1800}
+}
+
+
+def area_matrix(energy_distribution=None):
+    """排放源×工艺区域分配矩阵，与 calculate_unit_emissions 的区域拆分口径一致"""
+    share = energy_distribution or CarbonCalculator().energy_distribution
+    matrix = pd.DataFrame(0.0, index=SOURCE_COLUMNS, columns=list(AREA_COLUMNS))
+    matrix.loc['energy_CO2eq'] = [share[area] for area in AREA_COLUMNS]
+    matrix.loc[['N2O_CO2eq', 'CH4_CO2eq'], "生物处理区"] = 1.0
+    matrix.loc[['PAC_CO2eq', 'PAM_CO2eq', 'NaClO_CO2eq'], "深度处理区"] = 1.0
+    return matrix
+
+
+class UnitAllocation:
+    """排放源→工艺单元的分配矩阵
+
+    matrix 为 排放源×单元 的DataFrame，元素为该排放源分配给该单元的比例；
+    unit_areas 为各单元所属工艺区域（from_areas 自动给出，用于分层展示）。
+    apply 对全部行做一次矩阵乘法（行数×排放源 @ 排放源×单元），得到逐行、逐单元排放。
+    """
+
+    def __init__(self, matrix, unit_areas=None):
+        missing = [src for src in SOURCE_COLUMNS if src not in matrix.index]
+        if missing:
+            raise ValueError(f"分配矩阵缺少排放源：{missing}")
+        if (matrix.to_numpy() < 0).any():
+            raise ValueError("错误：分配比例不能为负数")
+        self.matrix = matrix.loc[SOURCE_COLUMNS].astype(np.float64)
+        self.units = list(self.matrix.columns)
+        self.unit_areas = dict(unit_areas) if unit_areas is not None else None  # 单元 -> 所属工艺区域
+
+    @classmethod
+    def from_areas(cls, config=None, energy_distribution=None):
+        """由区域矩阵与单元配置组合出单元矩阵
+
+        每个排放源先按区域矩阵分到区域，再按区域内各单元的权重拆分，
+        因此同一区域各单元之和等于该区域的排放列。区域内没有单元承接某排放源时报错。
+        """
+        config = UNIT_ALLOCATION if config is None else config
+        areas = area_matrix(energy_distribution)
+        unknown = sorted({spec["area"] for spec in config.values()} - set(areas.columns))
+        if unknown:
+            raise ValueError(f"错误：未知的工艺区域：{unknown}")
+
+        weights = pd.DataFrame({unit: [spec.get(src, 0) for src in SOURCE_COLUMNS]
+                                for unit, spec in config.items()}, index=SOURCE_COLUMNS, dtype=np.float64)
+        unit_areas = pd.Series({unit: spec["area"] for unit, spec in config.items()})
+        area_weights = weights.T.groupby(unit_areas).sum().T.reindex(columns=areas.columns, fill_value=0.0)
+        orphan = (areas > 0) & (area_weights == 0)
+        if orphan.to_numpy().any():
+            pairs = [f"{area}/{src}" for src, area in orphan.stack()[lambda s: s].index]
+            raise ValueError(f"错误：以下区域/排放源没有承接的工艺单元：{pairs}")
+
+        # 单元比例 = 区域比例 × 单元权重 / 区域内权重之和
+        area_of = unit_areas.reindex(weights.columns).to_numpy()
+        totals = area_weights.loc[:, area_of].to_numpy()
+        fractions = np.divide(weights.to_numpy(), totals, out=np.zeros_like(totals), where=totals > 0)
+        matrix = areas.loc[:, area_of].to_numpy() * fractions
+        return cls(pd.DataFrame(matrix, index=SOURCE_COLUMNS, columns=weights.columns), unit_areas.to_dict())
+
+    def apply(self, df_calc):
+        """逐行逐单元排放（DataFrame，索引同 df_calc，列为工艺单元）"""
+        missing_cols = [col for col in SOURCE_COLUMNS if col not in df_calc.columns]
+        if missing_cols:
+            raise ValueError(f"数据缺少必需列：{missing_cols}，请先完成碳核算！")
+        sources = df_calc[SOURCE_COLUMNS].to_numpy(dtype=np.float64)
+        return pd.DataFrame(sources @ self.matrix.to_numpy(), index=df_calc.index, columns=self.units)
+
+    def daily_mean(self, df_calc):
+        """各单元日均排放（kgCO2eq/d）：先按日期汇总（同一日期多行时相加），再对各日取平均"""
+        days = pd.to_datetime(df_calc["日期"]).dt.normalize()
+        return self.apply(df_calc).groupby(days.to_numpy()).sum().mean()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  Parquet磁盘缓存依赖pyarrow
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+class UploadCache:
+    """按文件内容哈希缓存解析后的上传数据
+
+    第一层为进程内LRU（跨会话共享），第二层为可选的磁盘Parquet缓存，
+    磁盘总大小超过上限时按最近访问时间淘汰。同一份文件只解析一次，
+    拖动滑块等重跑只需计算一次内容哈希。
+    """
+
+    def __init__(self, max_entries=8, cache_dir=None, max_disk_bytes=512 * 1024 * 1024, version="1"):
+        self.max_entries = max_entries
+        self.version = version  # 解析流程变化时更换版本号，使旧的磁盘缓存失效
+        self.cache_dir = cache_dir if HAS_PARQUET else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # 内容哈希 -> (df, info)
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def content_hash(data):
+        """文件内容的SHA-256摘要"""
+        return hashlib.sha256(data).hexdigest()
+
+    def get_or_load(self, data, loader, key=None):
+        """命中缓存时直接返回 (df, info)，否则调用 loader(data) 解析并写入缓存
+
+        key 为调用方已计算的内容哈希，省略时自动计算。
+        """
+        key = key or self.content_hash(data)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return self._share(entry)
+
+        entry = self._read_disk(key)
+        if entry is None:
+            entry = loader(data)
+            self._write_disk(key, entry)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return self._share(entry)
+
+    def clear(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _share(entry):
+        """返回浅拷贝，调用方增删列不会影响缓存中的DataFrame"""
+        df, info = entry
+        return df.copy(deep=False), info
+
+    def _paths(self, key):
+        name = f"v{self.version}-{key}"
+        return os.path.join(self.cache_dir, f"{name}.parquet"), os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        data_path, info_path = self._paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(info_path)):
+            return None
+        try:
+            df = pd.read_parquet(data_path)
+            with open(info_path, encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError, TypeError):
+            return None
+        # 更新访问时间，供淘汰策略使用
+        os.utime(data_path)
+        os.utime(info_path)
+        return df, info
+
+    def _write_disk(self, key, entry):
+        if not self.cache_dir:
+            return
+        df, info = entry
+        data_path, info_path = self._paths(key)
+        try:
+            df.to_parquet(data_path)
+            with open(info_path, "w", encoding="utf-8") as f:
+                json.dump(info, f, ensure_ascii=False)
+        except (OSError, ValueError, TypeError):
+            # 含混合类型列等无法写入Parquet的数据只保留在内存缓存中
+            for path in (data_path, info_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """磁盘缓存超过上限时，按最近访问时间从旧到新删除"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith((".parquet", ".json")):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
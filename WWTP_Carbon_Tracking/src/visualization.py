@@ -1,7 +1,22 @@
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 
+from .unit_allocation import SOURCE_COLUMNS, UnitAllocation, area_matrix
+
+# 桑基图排放源节点名称；N₂O、CH₄为工艺区域内产生的直接排放
+SANKEY_SOURCE_LABELS = {
+    'energy_CO2eq': "电耗",
+    'N2O_CO2eq': "N2O排放",
+    'CH4_CO2eq': "CH4排放",
+    'PAC_CO2eq': "PAC",
+    'PAM_CO2eq': "PAM",
+    'NaClO_CO2eq': "次氯酸钠"
+}
+DIRECT_SOURCES = {'N2O_CO2eq', 'CH4_CO2eq'}
+SANKEY_COLORS = {"source": "#FFA500", "area": "#4169E1", "direct": "#32CD32", "unit": "#5F9EA0"}
+
 """工艺单元碳排热力图 - 修正为真正的热力图"""
 
 
@@ -70,85 +85,116 @@ def create_heatmap_overlay(emission_data: dict) -> go.Figure:
 """碳流动态追踪图谱"""
 
 
-def create_sankey_diagram(df: pd.DataFrame) -> go.Figure:
-    """碳流动态追踪图谱"""
+def _sankey_links(area_alloc, unit_alloc=None):
+    """由分配矩阵生成桑基图节点与连线
+
+    返回 (节点标签, 节点颜色, 连线起点, 连线终点, 连线矩阵)，连线矩阵为 排放源×连线，
+    排放源合计（行向量）乘以该矩阵即得全部连线流量。
+    每个排放源（含区域内产生的N₂O/CH₄）只经"排放源→区域"计入一次；unit_alloc 给出时
+    再把区域合计经"区域→工艺单元"分到单元，区域节点流入等于流出。
+    """
+    matrix = area_alloc.to_numpy()
+    sources, areas = list(area_alloc.index), list(area_alloc.columns)
+    labels = [SANKEY_SOURCE_LABELS[src] for src in sources] + areas
+    colors = [SANKEY_COLORS["direct" if src in DIRECT_SOURCES else "source"] for src in sources]
+    colors += [SANKEY_COLORS["area"]] * len(areas)
+
+    src_idx, area_idx = np.nonzero(matrix)
+    link_source = src_idx
+    link_target = len(sources) + area_idx
+    link_matrix = np.zeros((len(sources), len(src_idx)))
+    link_matrix[src_idx, np.arange(len(src_idx))] = matrix[src_idx, area_idx]
+
+    if unit_alloc is not None:
+        if unit_alloc.unit_areas is None:
+            raise ValueError("错误：单元级桑基图需要各工艺单元的所属区域（unit_areas）")
+        units = unit_alloc.units
+        unit_area = area_alloc.columns.get_indexer([unit_alloc.unit_areas[unit] for unit in units])
+        if (unit_area < 0).any():
+            raise ValueError("错误：工艺单元的所属区域不在区域分配矩阵中")
+        unit_nodes = len(labels) + np.arange(len(units))
+        labels += units
+        colors += [SANKEY_COLORS["unit"]] * len(units)
+        link_source = np.concatenate([link_source, len(sources) + unit_area])
+        link_target = np.concatenate([link_target, unit_nodes])
+        link_matrix = np.hstack([link_matrix, unit_alloc.matrix.reindex(sources).to_numpy()])
+    return labels, colors, link_source, link_target, link_matrix
+
+
+def create_sankey_diagram(df: pd.DataFrame, level="area", energy_distribution=None, unit_allocation=None,
+                          daily_frames=False) -> go.Figure:
+    """碳流动态追踪图谱
+
+    节点与连线由分配配置（排放源×区域矩阵、排放源×单元矩阵）生成，不再硬编码；
+    全部连线流量为一次列求和后乘以连线矩阵。level="unit" 时增加工艺单元一层；
+    daily_frames=True 时按日期分组求和一次，生成逐日动画帧。
+    """
     # 检查数据是否为空
     if df.empty:
         return go.Figure()
-    labels = [
-        "电耗", "PAC", "PAM", "次氯酸钠",
-        "预处理区", "生物处理区", "深度处理区", "泥处理区", "出水区", "除臭系统",
-        "N2O排放", "CH4排放", "能耗间接排放", "药耗间接排放"
-    ]
-    energy = df['energy_CO2eq'].sum()
-    pac = df['PAC_CO2eq'].sum() if 'PAC_CO2eq' in df else 0
-    pam = df['PAM_CO2eq'].sum() if 'PAM_CO2eq' in df else 0
-    naclo = df['NaClO_CO2eq'].sum() if 'NaClO_CO2eq' in df else 0
-    source = [0, 0, 0, 0, 0, 0, 1, 2, 3]  # 增加除臭系统源
-    target = [4, 5, 6, 7, 8, 9, 6, 6, 6]  # 增加除臭系统目标
-    value = [
-        energy * 0.3193,
-        energy * 0.4453,
-        energy * 0.1155,
-        energy * 0.0507,
-        energy * 0.0672,
-        energy * 0.0267,  # 除臭系统能耗
-        pac,
-        pam,
-        naclo
-    ]
-    # 添加直接排放
-    n2o_emission = df['N2O_CO2eq'].sum()
-    ch4_emission = df['CH4_CO2eq'].sum()
-    if n2o_emission > 0:
-        source.append(5)  # 生物处理区
-        target.append(10)  # N2O排放
-        value.append(n2o_emission)
-    if ch4_emission > 0:
-        source.append(5)  # 生物处理区
-        target.append(11)  # CH4排放
-        value.append(ch4_emission)
-    # 过滤零值
-    valid_indices = [i for i, v in enumerate(value) if v > 0]
-    source = [source[i] for i in valid_indices]
-    target = [target[i] for i in valid_indices]
-    value = [value[i] for i in valid_indices]
-
-    # 定义节点颜色
-    node_colors = [
-        "#FFD700", "#FFA500", "#FF6347", "#FF4500",  # 输入源（金色、橙色）
-        "#1E90FF", "#4169E1", "#4682B4", "#5F9EA0", "#1abc9c", "#1abc9c",  # 处理区（蓝色系，除臭系统用出水区颜色）
-        "#32CD32", "#228B22", "#2E8B57", "#3CB371"  # 排放（绿色系）
-    ]
+    area_alloc = area_matrix(energy_distribution)
+    if level == "unit":
+        unit_alloc = unit_allocation or UnitAllocation.from_areas(energy_distribution=energy_distribution)
+    else:
+        unit_alloc = None
+    labels, colors, link_source, link_target, link_matrix = _sankey_links(area_alloc, unit_alloc)
+
+    sources = df.reindex(columns=SOURCE_COLUMNS, fill_value=0.0).to_numpy(dtype=np.float64)
+    value = np.nan_to_num(sources).sum(axis=0) @ link_matrix
+    # 过滤零值连线（动画帧需要固定的连线集合，保留全部连线）
+    keep = slice(None) if daily_frames else value > 0
+
+    link = dict(
+        source=link_source[keep],
+        target=link_target[keep],
+        value=value[keep],
+        color="rgba(150, 150, 150, 0.5)",
+        hovertemplate='源: %{source.label}<br>目标: %{target.label}<br>流量: %{value} kgCO2eq'
+    )
     # 修正：移除node配置中的font属性，使用hoverlabel设置文字样式
     fig = go.Figure(data=[go.Sankey(
         node=dict(
             pad=20,
-            thickness=30,
+            thickness=30 if level == "area" else 15,
             line=dict(color="black", width=1.5),
             label=labels,
-            color=node_colors[:len(labels)],
+            color=colors,
             hovertemplate='%{label}<br>%{value} kgCO2eq',
             hoverlabel=dict(
                 font=dict(color='black', size=12)
             )
         ),
-        link=dict(
-            source=source,
-            target=target,
-            value=value,
-            color="rgba(150, 150, 150, 0.5)",
-            hovertemplate='源: %{source.label}<br>目标: %{target.label}<br>流量: %{value} kgCO2eq'
-        )
+        link=link
     )])
     fig.update_layout(
         title="碳流动态追踪图谱",
         title_font=dict(size=24, family="Arial", color="black"),
-        height=500,
+        height=500 if level == "area" else 800,
         font=dict(size=14, color="black"),
         plot_bgcolor="rgba(245, 245, 245, 1)",
         paper_bgcolor="rgba(245, 245, 245, 1)"
     )
+
+    if daily_frames and '日期' in df.columns:
+        days = pd.to_datetime(df['日期']).dt.normalize()
+        daily = pd.DataFrame(np.nan_to_num(sources), columns=SOURCE_COLUMNS).groupby(days.to_numpy()).sum()
+        daily_values = daily.to_numpy() @ link_matrix
+        names = daily.index.strftime("%Y-%m-%d")
+        fig.frames = [go.Frame(data=[go.Sankey(link=dict(value=row))], name=name)
+                      for name, row in zip(names, daily_values)]
+        fig.update_layout(
+            updatemenus=[dict(type="buttons", showactive=False, x=0, y=-0.05, xanchor="left", buttons=[
+                dict(label="播放", method="animate",
+                     args=[None, dict(frame=dict(duration=500, redraw=True), fromcurrent=True)]),
+                dict(label="暂停", method="animate",
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")])
+            ])],
+            sliders=[dict(x=0.1, y=-0.05, len=0.9, currentvalue=dict(prefix="日期："), steps=[
+                dict(label=name, method="animate",
+                     args=[[name], dict(frame=dict(duration=0, redraw=True), mode="immediate")])
+                for name in names
+            ])]
+        )
     return fig
 
 
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 测试以项目根目录为导入起点（与 app.py 的 from src.xxx import 一致）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.carbon_calculator import DIRECT_INPUT_COLUMNS, INDIRECT_INPUT_COLUMNS  # noqa: E402
+
+# 两行表头，COD/TN 的第二个单元格为空（Excel中为合并单元格）
+CSV_HEADER = (
+    "日期,处理水量 m3/d,能耗 kWh/d,CODcr(mg/l),,TN(mg/l),,PAC消耗 kg/d,次氯酸钠消耗 kg/d,污泥脱水药剂消耗(PAM) kg/d\n"
+    ",,,进水,出水,进水,出水,,,\n"
+)
+CSV_ROWS = (
+    "2024-01-01,1000,2000,300,30,40,10,50,20,5\n"
+    "2024-01-02,1100,2100,310,31,41,11,51,21,6\n"
+)
+
+
+def build_frame(dates, seed=0):
+    """按给定日期生成运行数据，核算所需输入列为随机正数"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"日期": pd.to_datetime(dates)})
+    for col in DIRECT_INPUT_COLUMNS + INDIRECT_INPUT_COLUMNS:
+        df[col] = rng.uniform(1, 100, len(df))
+    return df
+
+
+@pytest.fixture
+def make_frame():
+    """运行数据构造函数：make_frame(dates, seed=0)"""
+    return build_frame
+
+
+@pytest.fixture
+def csv_header():
+    """标准两行表头（合并单元格样式）"""
+    return CSV_HEADER
+
+
+@pytest.fixture
+def csv_rows():
+    """与 csv_header 列对应的两行数据"""
+    return CSV_ROWS
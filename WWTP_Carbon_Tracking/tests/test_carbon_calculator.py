@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.carbon_calculator import CarbonCalculator, EmissionTotals, RESULT_COLUMNS
+
+def legacy_chain(calculator, df):
+    """原三步计算链：直接排放 → 间接排放 → 单元拆分"""
+    df_calc = calculator.calculate_direct_emissions(df.copy())
+    df_calc = calculator.calculate_indirect_emissions(df_calc)
+    return calculator.calculate_unit_emissions(df_calc)
+
+
+def test_calculate_all_matches_legacy_chain():
+    df = pd.DataFrame({
+        "日期": pd.date_range("2024-01-01", periods=5),
+        # 文本数值与无法解析的文本（按缺失值处理）
+        "处理水量(m³)": ["10000", "12000.5", np.nan, "9000", "abc"],
+        "进水COD(mg/L)": [300.0, "280.25", 250.0, np.nan, 310.0],
+        "出水COD(mg/L)": [30.0, 25.0, "--", 20.0, 28.0],
+        "进水TN(mg/L)": [40.0, 38.0, 35.0, 36.0, np.nan],
+        "出水TN(mg/L)": [10.0, np.nan, 9.0, 8.0, 12.0],
+        "电耗(kWh)": [30000.0, np.nan, 28000.0, 31000.0, 29000.0],
+        "PAC投加量(kg)": [300.0, 280.0, np.nan, 310.0, 290.0],
+        "次氯酸钠投加量(kg)": [100.0, 90.0, 95.0, np.nan, 105.0],
+        "PAM投加量(kg)": [np.nan, 60.0, 55.0, 50.0, 65.0],
+    })
+    calculator = CarbonCalculator()
+    expected = legacy_chain(calculator, df)
+    result = calculator.calculate_all(df)
+
+    for col in RESULT_COLUMNS:
+        np.testing.assert_array_equal(result[col].to_numpy(), expected[col].to_numpy(dtype=np.float64), err_msg=col)
+    # 不修改输入表
+    assert df["处理水量(m³)"].iloc[0] == "10000"
+
+
+def test_stream_totals_match_in_memory_monthly_totals(tmp_path, make_frame):
+    df = make_frame(pd.date_range("2023-11-20", "2024-03-10", freq="6h"), seed=3)
+    path = tmp_path / "scada.csv"
+    df.to_csv(path, index=False)
+
+    calculator = CarbonCalculator()
+    totals = EmissionTotals()
+    # 分块大小与月份边界不对齐，同一月份跨多个分块
+    chunks = list(calculator.calculate_stream(path, chunksize=97, totals=totals, parse_dates=["日期"]))
+    assert len(chunks) > 1
+
+    expected = calculator.calculate_all(df)
+    months = expected["日期"].dt.to_period("M")
+    expected_monthly = expected.groupby(months)[EmissionTotals.COLUMNS].sum()
+
+    monthly = totals.monthly()
+    assert list(monthly.index) == list(expected_monthly.index)
+    np.testing.assert_allclose(monthly.to_numpy(), expected_monthly.to_numpy(), rtol=1e-12)
+    assert totals.row_count == len(df)
+
+
+def test_stream_rejects_excel_path(tmp_path):
+    calculator = CarbonCalculator()
+    with pytest.raises(ValueError, match="CSV"):
+        next(calculator.calculate_stream(tmp_path / "scada.xlsx"))
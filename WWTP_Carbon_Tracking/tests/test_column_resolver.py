@@ -0,0 +1,43 @@
+import pytest
+
+from src.column_resolver import PROFILE_DIR_ENV, ColumnResolver, default_profile_dir
+from src.data_ingestion import COLUMN_MAPPING, load_operating_data
+
+
+@pytest.fixture
+def fuzzy_csv(csv_rows):
+    """非标准表头：全部列名需模糊匹配"""
+    return (
+        "时间,处理量,用电量,COD进水,COD出水,总氮进水,总氮出水,PAC,次氯酸钠,PAM\n"
+        ",,,,,,,,,\n"
+    ) + csv_rows
+
+
+def test_profile_dir_is_configurable(monkeypatch, tmp_path):
+    monkeypatch.setenv(PROFILE_DIR_ENV, str(tmp_path))
+    assert default_profile_dir() == str(tmp_path)
+    monkeypatch.delenv(PROFILE_DIR_ENV)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_profile_dir() == str(tmp_path / "wwtp_carbon" / "column_profiles")
+
+
+def test_profile_saved_only_after_confirmation(tmp_path, fuzzy_csv):
+    resolver = ColumnResolver(exact=COLUMN_MAPPING, profile_dir=str(tmp_path))
+    _, info = load_operating_data(fuzzy_csv.encode("utf-8"), resolver=resolver)
+    # 解析本身不写入配置
+    assert list(tmp_path.iterdir()) == []
+    assert resolver.needs_confirmation(info["columns"], info["mapping"])
+
+    resolver.save_profile(info["columns"], info["mapping"], plant="一厂")
+    assert not resolver.needs_confirmation(info["columns"], info["mapping"])
+    assert ColumnResolver(profile_dir=str(tmp_path)).has_profile(info["columns"])
+
+    assert resolver.clear_profiles() == 1
+    assert list(tmp_path.iterdir()) == []
+    assert resolver.needs_confirmation(info["columns"], info["mapping"])
+
+
+def test_exact_layout_needs_no_confirmation():
+    resolver = ColumnResolver(exact=COLUMN_MAPPING)
+    headers = ["日期_Unnamed: 0_level_1"] + list(COLUMN_MAPPING)
+    assert not resolver.needs_confirmation(headers, resolver.resolve(headers))
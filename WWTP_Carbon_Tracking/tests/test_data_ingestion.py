@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from src.column_resolver import ColumnResolver
+from src.data_ingestion import COLUMN_MAPPING, compact_frame, load_operating_data, read_header
+
+def test_csv_blank_top_header_uses_left_name(csv_header, csv_rows):
+    data = (csv_header + csv_rows).encode("utf-8")
+    columns = read_header(data, "csv")
+    assert columns[3:7] == ["CODcr(mg/l)_进水", "CODcr(mg/l)_出水", "TN(mg/l)_进水", "TN(mg/l)_出水"]
+    assert all(col in COLUMN_MAPPING for col in columns[3:7])
+
+
+def test_csv_merged_style_header_loads(csv_header, csv_rows):
+    data = (csv_header + csv_rows).encode("utf-8")
+    df, info = load_operating_data(data, resolver=ColumnResolver(exact=COLUMN_MAPPING))
+    assert len(df) == 2
+    assert df["出水COD(mg/L)"].tolist() == [30, 31]
+    assert df["出水TN(mg/L)"].tolist() == [10, 11]
+    assert df["日期"].iloc[0] == pd.Timestamp("2024-01-01")
+
+
+def test_compact_frame_downcasts_only_exact_columns():
+    df = pd.DataFrame({
+        "处理水量(m³)": [1000.5, 2000.25],
+        "电耗(kWh)": [2 ** 24 + 1.0, 10.0],  # 超过float32精确表示范围
+        "进水COD(mg/L)": [4037.82, 300.0],  # 小数无法由float32精确还原
+        "PAC投加量(kg)": pd.array([50, None], dtype="Int64"),
+        "PAM投加量(kg)": np.array([5, 6], dtype=np.int64),
+    })
+    compact = compact_frame(df, keep_columns=list(df.columns))
+    assert compact["处理水量(m³)"].dtype == np.float32
+    assert compact["电耗(kWh)"].dtype == np.float64
+    assert compact["电耗(kWh)"].iloc[0] == 2 ** 24 + 1
+    assert compact["进水COD(mg/L)"].dtype == np.float64
+    assert compact["PAC投加量(kg)"].dtype == np.float32
+    assert np.isnan(compact["PAC投加量(kg)"].iloc[1])
+    assert compact["PAM投加量(kg)"].tolist() == [5.0, 6.0]
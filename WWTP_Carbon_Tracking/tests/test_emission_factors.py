@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from src.emission_factors import FactorRegistry
+
+
+def test_valid_to_covers_whole_day_for_timestamped_rows():
+    registry = FactorRegistry()
+    default = registry.calculator.emission_factors()["f_e"]
+    registry.add("华东电网", "f_e", 0.7, "2024-01-01", "2024-01-31")
+
+    dates = ["2023-12-31 23:00", "2024-01-01 00:00", "2024-01-31 18:00", "2024-01-31 23:59", "2024-02-01 00:00"]
+    factors = registry.factor_arrays(dates, "华东电网")
+
+    np.testing.assert_array_equal(factors["f_e"], [default, 0.7, 0.7, 0.7, default])
+
+
+def test_expired_record_falls_back_to_earlier_valid_record():
+    registry = FactorRegistry()
+    default = registry.calculator.emission_factors()["f_e"]
+    registry.add_records([
+        {"set_id": "华东电网", "factor": "f_e", "value": 0.5, "valid_from": "2023-01-01"},  # 长期有效
+        {"set_id": "华东电网", "factor": "f_e", "value": 0.6, "valid_from": "2023-06-01", "valid_to": "2024-06-30"},
+        {"set_id": "华东电网", "factor": "f_e", "value": 0.7, "valid_from": "2024-01-01", "valid_to": "2024-01-31"},
+        {"set_id": "华东电网", "factor": "EF_PAC", "value": 2.0, "valid_from": "2024-01-01", "valid_to": "2024-01-31"},
+    ])
+
+    dates = pd.to_datetime(["2022-12-31", "2023-03-01", "2023-06-01", "2024-01-31 18:00", "2024-02-01", "2024-07-01"],
+                           format="ISO8601")
+    factors = registry.factor_arrays(dates, "华东电网")
+
+    np.testing.assert_array_equal(factors["f_e"], [default, 0.5, 0.6, 0.7, 0.6, 0.5])
+    pac = registry.calculator.emission_factors()["EF_PAC"]
+    np.testing.assert_array_equal(factors["EF_PAC"], [pac, pac, pac, 2.0, pac, pac])
@@ -0,0 +1,74 @@
+import pandas as pd
+import plotly.graph_objects as go
+
+from src.figure_cache import FigureCache
+
+
+def make_figure(n):
+    return go.Figure(go.Bar(x=list(range(n)), y=list(range(n))))
+
+
+def figure_bytes(fig):
+    return len(fig.to_json(validate=False))
+
+
+def test_hit_returns_cached_figure():
+    cache = FigureCache()
+    built = []
+    build = lambda: built.append(1) or make_figure(3)
+    first = cache.get_or_build("bar", "k1", build)
+    assert cache.get_or_build("bar", "k1", build) is first
+    # 同一指纹、不同图表名称互不命中
+    cache.get_or_build("line", "k1", build)
+    assert len(built) == 2
+    assert cache.stats()["命中"] == 1
+    assert cache.stats()["未命中"] == 2
+
+
+def test_entry_cap_evicts_least_recently_used():
+    cache = FigureCache(max_entries=2)
+    a = cache.get_or_build("fig", "a", lambda: make_figure(1))
+    cache.get_or_build("fig", "b", lambda: make_figure(2))
+    cache.get_or_build("fig", "a", lambda: make_figure(1))  # a 成为最近使用
+    cache.get_or_build("fig", "c", lambda: make_figure(3))  # 淘汰 b
+
+    assert cache.stats()["条目数"] == 2
+    assert cache.get_or_build("fig", "a", lambda: make_figure(1)) is a
+    misses = cache.stats()["未命中"]
+    cache.get_or_build("fig", "b", lambda: make_figure(2))
+    assert cache.stats()["未命中"] == misses + 1
+
+
+def test_byte_cap():
+    small = figure_bytes(make_figure(5))
+    cache = FigureCache(max_bytes=2 * small)
+    cache.get_or_build("fig", "a", lambda: make_figure(5))
+    cache.get_or_build("fig", "b", lambda: make_figure(5))
+    assert cache.stats() == {"条目数": 2, "占用字节": 2 * small, "命中": 0, "未命中": 2}
+
+    # 超出字节上限时淘汰最久未使用的条目
+    cache.get_or_build("fig", "c", lambda: make_figure(5))
+    assert cache.stats()["条目数"] == 2
+    assert cache.stats()["占用字节"] == 2 * small
+
+    # 单个图表超过上限时直接返回，不进入缓存
+    large = make_figure(5000)
+    assert figure_bytes(large) > 2 * small
+    assert cache.get_or_build("fig", "big", lambda: large) is large
+    assert cache.stats()["条目数"] == 2
+    assert cache.stats()["占用字节"] == 2 * small
+
+
+def test_fingerprint_stability():
+    df = pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]})
+    key = FigureCache.fingerprint(df, "2024年05月", {"f_e": 0.5703, "EF_PAC": 1.62})
+
+    # 内容相同的新对象、字典键顺序不同，指纹不变
+    assert FigureCache.fingerprint(df.copy(), "2024年05月", {"EF_PAC": 1.62, "f_e": 0.5703}) == key
+    # 数据、列名、月份或因子变化时指纹改变
+    assert FigureCache.fingerprint(df.assign(a=[1.0, 2.5]), "2024年05月", {"f_e": 0.5703, "EF_PAC": 1.62}) != key
+    assert FigureCache.fingerprint(df.rename(columns={"b": "c"}), "2024年05月", {"f_e": 0.5703, "EF_PAC": 1.62}) != key
+    assert FigureCache.fingerprint(df, "2024年06月", {"f_e": 0.5703, "EF_PAC": 1.62}) != key
+    assert FigureCache.fingerprint(df, "2024年05月", {"f_e": 0.58, "EF_PAC": 1.62}) != key
+    # 各部分之间有分隔，拼接方式不同的输入不会撞键
+    assert FigureCache.fingerprint("ab", "c") != FigureCache.fingerprint("a", "bc")
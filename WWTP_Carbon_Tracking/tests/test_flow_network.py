@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from src.flow_network import FlowNetwork
+from src.plant_diagram import PlantDiagramEngine
+
+UNITS = ["粗格栅", "提升泵房", "细格栅", "曝气沉砂池", "膜格栅", "厌氧池", "缺氧池", "好氧池", "MBR膜池",
+         "DF系统", "催化氧化", "臭氧", "次氯酸钠", "污泥处理车间", "离心浓缩机", "离心脱水机", "鼓风机房", "除臭系统"]
+
+
+def make_unit_data():
+    return {unit: {"water_flow": 10000.0, "emission": 100.0 * (i + 1), "enabled": True}
+            for i, unit in enumerate(UNITS)}
+
+
+def full_network(unit_data):
+    return PlantDiagramEngine(unit_data).flow_network()
+
+
+def test_disabled_unit_holds_upstream_carbon():
+    unit_data = make_unit_data()
+    network = full_network(unit_data)
+    own_total = sum(info["emission"] for info in unit_data.values())
+    assert network.frame()["滞留排放(kgCO2eq)"].sum() == pytest.approx(own_total)
+
+    network.update("好氧池", enabled=False)
+    frame = network.frame()
+    # 好氧池停用：自身排放不计，上游传入的排放滞留在好氧池，合计只减少好氧池自身排放
+    assert frame["滞留排放(kgCO2eq)"].sum() == pytest.approx(own_total - unit_data["好氧池"]["emission"])
+    assert frame.loc["好氧池", "滞留排放(kgCO2eq)"] == pytest.approx(frame.loc["好氧池", "上游传入排放(kgCO2eq)"])
+    assert frame.loc["好氧池", "上游传入排放(kgCO2eq)"] > 0
+    assert frame.loc["MBR膜池", "进水量(m³)"] == 0
+
+
+def test_gas_pipes_carry_no_carbon():
+    network = full_network(make_unit_data())
+    gas = [(start, end) for start, end, flow_type in network.edges if flow_type == "gas"]
+    assert gas and all(network.edge_carbon[edge] == 0 for edge in gas)
+
+
+def test_enabled_default_matches_diagram():
+    unit_data = make_unit_data()
+    del unit_data["厌氧池"]["enabled"]
+    engine = PlantDiagramEngine(unit_data)
+    network = engine.flow_network()
+    assert network.frame().loc["厌氧池", "启用"] == engine._is_path_active("膜格栅", "厌氧池")
+
+
+def test_incremental_refresh_matches_full_recompute():
+    # 随机启停、修改排放与水量，每一步的增量结果都应与重新构建的管网完全一致
+    rng = random.Random(0)
+    unit_data = make_unit_data()
+    network = full_network(unit_data)
+    for _ in range(200):
+        unit = rng.choice(UNITS)
+        if rng.random() < 0.5:
+            network.update(unit, enabled=not unit_data[unit]["enabled"])
+        else:
+            network.update(unit, emission=rng.uniform(0, 2000), water_flow=rng.uniform(0, 20000))
+        reference = FlowNetwork(PlantDiagramEngine(unit_data).connections, unit_data)
+        assert network.state == reference.state
+        assert network.edge_water == reference.edge_water
+        assert network.edge_carbon == reference.edge_carbon
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from src.carbon_calculator import CarbonCalculator
+from src.incremental_calculator import IncrementalCalculator
+
+
+def test_duplicate_dates_match_calculate_all(make_frame):
+    # 同一日期多行（如逐时数据按日期截断后重复），每行都应单独计入
+    dates = ["2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02", "2024-01-02", "2024-02-01"]
+    df = make_frame(dates)
+    expected = CarbonCalculator().calculate_all(df)
+
+    calc = IncrementalCalculator()
+    result = calc.update(df)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert calc.totals.monthly()["total_CO2eq"].sum() == pytest.approx(expected["total_CO2eq"].sum())
+
+
+def test_duplicate_dates_month_slice_and_changes(make_frame):
+    df = make_frame(["2024-01-01", "2024-01-01", "2024-01-15", "2024-02-03", "2024-02-03"])
+    calc = IncrementalCalculator()
+    calc.update(df)
+
+    # 修改重复日期中的一行，只重新核算该行
+    changed = df.copy()
+    changed.loc[1, "电耗(kWh)"] = 500.0
+    result = calc.update(changed[changed["日期"] < "2024-02-01"])
+    assert calc.last_recomputed == 1
+    pd.testing.assert_frame_equal(result, CarbonCalculator().calculate_all(changed[changed["日期"] < "2024-02-01"]))
+
+    # 某日期行数减少时，多出的旧行从结果与合计中删除
+    reduced = changed.drop(index=4)
+    calc.update(reduced)
+    expected = CarbonCalculator().calculate_all(reduced)
+    assert calc.totals.monthly()["total_CO2eq"].sum() == pytest.approx(expected["total_CO2eq"].sum())
+    assert len(calc.month_result("2024-02")) == 1
+
+
+def test_sync_drops_dates_missing_from_new_history(make_frame):
+    calc = IncrementalCalculator()
+    calc.sync(make_frame(["2024-01-01", "2024-01-02", "2024-02-01"], seed=1))
+    df = make_frame(["2024-01-02", "2024-03-01"], seed=2)
+    result = calc.sync(df)
+
+    expected = CarbonCalculator().calculate_all(df)
+    pd.testing.assert_frame_equal(result, expected)
+    monthly = calc.monthly()
+    assert list(monthly.index.astype(str)) == ["2024-01", "2024-03"]
+    assert monthly["total_CO2eq"].sum() == pytest.approx(expected["total_CO2eq"].sum())
+    pd.testing.assert_frame_equal(calc.month_result("2024-01"), expected.iloc[:1])
+
+
+def test_nbytes_counts_stored_results(make_frame):
+    calc = IncrementalCalculator()
+    assert calc.nbytes() == 0
+    calc.update(make_frame(["2024-01-01", "2024-02-01"]))
+    assert calc.nbytes() > 0
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.month_index import MonthIndex
+
+
+def make_data(dates, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "日期": pd.to_datetime(dates),
+        "a": rng.uniform(0, 100, len(dates)),
+        "b": rng.uniform(-5, 5, len(dates)),
+    })
+
+
+def reference_select(df, label):
+    """布尔掩码参考实现：按日期稳定排序后逐行比较月份标签"""
+    ordered = df.sort_values("日期", kind="stable")
+    return ordered[ordered["日期"].dt.strftime(MonthIndex.LABEL_FORMAT) == label]
+
+
+# 乱序输入；2024年02月缺失（空月份），2024年03月与2024年06月各只有一行
+DATES = ["2024-04-02", "2024-01-15", "2024-01-03", "2024-03-31", "2024-04-01",
+         "2024-01-15", "2024-06-30", "2024-04-20", "2023-12-31"]
+
+
+def test_select_matches_boolean_mask():
+    df = make_data(DATES)
+    index = MonthIndex(df)
+    assert index.labels == ["2023年12月", "2024年01月", "2024年03月", "2024年04月", "2024年06月"]
+
+    for label in index.labels:
+        expected = reference_select(df, label)
+        selected = index.select(label)
+        pd.testing.assert_frame_equal(selected.drop(columns="年月"), expected)
+        assert (selected["年月"] == label).all()
+        # pd.Period 与标签等价
+        pd.testing.assert_frame_equal(index.select(pd.Period(selected["日期"].iloc[0], freq="M")), selected)
+
+    assert len(index.select("2024年03月")) == 1
+    assert "2024年02月" not in index
+    with pytest.raises(KeyError):
+        index.select("2024年02月")
+
+
+def test_select_aligned_frame():
+    df = make_data(DATES)
+    index = MonthIndex(df)
+    results = pd.DataFrame({"x": np.arange(len(df))}, index=index.frame.index)
+    for label in index.labels:
+        start, stop = index.bounds(label)
+        pd.testing.assert_frame_equal(index.select(label, results), results.iloc[start:stop])
+        assert list(index.select(label, results).index) == list(reference_select(df, label).index)
+
+
+def test_monthly_sums_match_groupby():
+    df = make_data(DATES, seed=1)
+    index = MonthIndex(df)
+    sums = index.monthly_sums(index.frame, ["a", "b"])
+
+    labels = df["日期"].dt.strftime(MonthIndex.LABEL_FORMAT)
+    expected = df.groupby(labels)[["a", "b"]].sum()
+    expected.index.name = "年月"
+    pd.testing.assert_frame_equal(sums, expected, rtol=1e-12)
+
+
+def test_single_row_frame():
+    df = make_data(["2024-05-09"])
+    index = MonthIndex(df)
+    assert index.labels == ["2024年05月"]
+    assert index.bounds("2024年05月") == (0, 1)
+    sums = index.monthly_sums(index.frame, ["a"])
+    assert sums.loc["2024年05月", "a"] == df["a"].iloc[0]
+
+
+def test_empty_frame():
+    df = make_data([])
+    index = MonthIndex(df)
+    assert len(index) == 0
+    assert index.labels == []
+    assert len(index.frame) == 0
+    sums = index.monthly_sums(index.frame, ["a", "b"])
+    assert sums.shape == (0, 2)
+    assert list(sums.columns) == ["a", "b"]
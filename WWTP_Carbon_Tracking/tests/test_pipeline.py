@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from src.carbon_calculator import CarbonCalculator
+from src.incremental_calculator import IncrementalCalculator
+from src.month_index import MonthIndex
+from src.pipeline import ComputePipeline, history_results, month_results
+
+
+def make_pipeline(incremental_calc=None):
+    incremental_calc = incremental_calc or IncrementalCalculator()
+    pipeline = ComputePipeline()
+    pipeline.declare_param("upload", "month")
+    pipeline.add_node("ingest", MonthIndex, ["upload"])
+    pipeline.add_node("history", lambda month_index: history_results(month_index, incremental_calc), ["ingest"])
+    pipeline.add_node("carbon", month_results, ["ingest", "history", "month"])
+    return pipeline
+
+
+def test_duplicate_dates_match_calculate_all(make_frame):
+    df = make_frame(["2024-01-01", "2024-01-01", "2024-01-02", "2024-02-01", "2024-02-01", "2024-02-01"])
+    pipeline = make_pipeline()
+    pipeline.set_param("upload", df, fingerprint="a")
+
+    for month in ["2024年01月", "2024年02月"]:
+        pipeline.set_param("month", month)
+        expected = CarbonCalculator().calculate_all(pipeline.get("ingest").select(month))
+        pd.testing.assert_frame_equal(pipeline.get("carbon"), expected)
+
+
+def test_new_upload_does_not_carry_over_rows(make_frame):
+    pipeline = make_pipeline()
+    pipeline.set_param("month", "2024年01月")
+    pipeline.set_param("upload", make_frame(["2024-01-01", "2024-01-05", "2024-01-09"], seed=1), fingerprint="a")
+    pipeline.get("carbon")
+
+    # 换一份日期部分重叠、行数不同的文件：结果只包含新文件的行
+    df = make_frame(["2024-01-05", "2024-01-05"], seed=2)
+    pipeline.set_param("upload", df, fingerprint="b")
+    expected = CarbonCalculator().calculate_all(pipeline.get("ingest").select("2024年01月"))
+    pd.testing.assert_frame_equal(pipeline.get("carbon"), expected)
+    assert pipeline.get("history")["total_CO2eq"].sum() == pytest.approx(expected["total_CO2eq"].sum())
+
+
+def test_appending_a_day_recomputes_only_that_month(make_frame):
+    calc = IncrementalCalculator()
+    pipeline = make_pipeline(calc)
+    pipeline.set_param("month", "2024年02月")
+    df = make_frame(["2024-01-01", "2024-01-15", "2024-02-01", "2024-02-02", "2024-03-01"])
+    pipeline.set_param("upload", df, fingerprint="v1")
+    pipeline.get("carbon")
+    cached = dict(calc._results)
+
+    # 新版表格在2月追加一天：只核算新增行，1月、3月的结果对象原样复用
+    appended = pd.concat([df, make_frame(["2024-02-03"], seed=3)], ignore_index=True)
+    pipeline.set_param("upload", appended, fingerprint="v2")
+    expected = CarbonCalculator().calculate_all(pipeline.get("ingest").select("2024年02月"))
+    pd.testing.assert_frame_equal(pipeline.get("carbon"), expected)
+    assert calc.last_recomputed == 1
+    assert calc._results[pd.Period("2024-01")] is cached[pd.Period("2024-01")]
+    assert calc._results[pd.Period("2024-03")] is cached[pd.Period("2024-03")]
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from src.plant_diagram import EMISSION_LEVELS, PARTICLES_PER_PIPE, REFERENCE_FLOW, PlantDiagramEngine
+
+
+def unit_colors(unit_data):
+    figure = PlantDiagramEngine(unit_data).render(animation_active=False)
+    return [shape.fillcolor for shape in figure.layout.shapes if shape.type == "rect"]
+
+
+def test_emission_colors_follow_data_scale():
+    # 核算得到的单元排放量级（如数万kgCO2eq）不应让所有单元都显示为高排放
+    emissions = {"粗格栅": 400.0, "提升泵房": 1000.0, "好氧池": 3000.0, "MBR膜池": 600.0}
+    small = {unit: {"emission": value, "enabled": True} for unit, value in emissions.items()}
+    large = {unit: {"emission": value * 30, "enabled": True} for unit, value in emissions.items()}
+
+    assert unit_colors(small) == unit_colors(large)
+    medium, high = PlantDiagramEngine(large).emission_thresholds()
+    assert medium < 3000.0 * 30 and high > 1000.0 * 30
+
+
+def all_units(**info):
+    units = PlantDiagramEngine({}).unit_coords
+    return {unit: dict({"water_flow": REFERENCE_FLOW, "emission": 100.0, "enabled": True}, **info) for unit in units}
+
+
+def test_emission_thresholds_scale_with_enabled_units():
+    unit_data = all_units()
+    unit_data["好氧池"]["emission"] = 1900.0
+    unit_data["MBR膜池"]["emission"] = 5000.0
+    unit_data["MBR膜池"]["enabled"] = False  # 停用单元不参与平均
+    unit_data["不在图中的单元"] = {"emission": 1e6, "enabled": True}
+
+    enabled = [info["emission"] for unit, info in unit_data.items()
+               if unit in PlantDiagramEngine({}).unit_coords and info["enabled"]]
+    mean = sum(enabled) / len(enabled)
+    thresholds = PlantDiagramEngine(unit_data).emission_thresholds()
+    assert thresholds == pytest.approx(tuple(mean * level for level in EMISSION_LEVELS))
+
+    # 排放整体放大k倍，阈值同样放大k倍
+    scaled = {unit: dict(info, emission=info["emission"] * 40) for unit, info in unit_data.items()}
+    assert PlantDiagramEngine(scaled).emission_thresholds() == pytest.approx(tuple(t * 40 for t in thresholds))
+    assert PlantDiagramEngine({}).emission_thresholds() == (0.0, 0.0)
+
+
+def active_pipes(engine):
+    paths = engine._path_arrays()
+    return [i for i, (start, end) in enumerate(paths["pipes"]) if engine._is_path_active(start, end)]
+
+
+def test_particle_frames_shape():
+    engine = PlantDiagramEngine(all_units())
+    xy, colors, sizes, opacities = engine.particle_frames(n_frames=12)
+    n_particles = len(active_pipes(engine)) * PARTICLES_PER_PIPE
+    assert xy.shape == (12, n_particles, 2)
+    assert len(colors) == len(sizes) == len(opacities) == n_particles
+
+    # 水量翻倍的单元，下游管道粒子数翻倍；停用单元的管道没有粒子
+    doubled = all_units()
+    doubled["粗格栅"]["water_flow"] = 2 * REFERENCE_FLOW
+    doubled["好氧池"]["enabled"] = False
+    engine = PlantDiagramEngine(doubled)
+    paths = engine._path_arrays()
+    pipes = active_pipes(engine)
+    expected = sum(2 * PARTICLES_PER_PIPE if paths["pipes"][i][0] == "粗格栅" else PARTICLES_PER_PIPE for i in pipes)
+    assert all("好氧池" not in paths["pipes"][i] for i in pipes)
+    assert engine.particle_frames(n_frames=4)[0].shape == (4, expected, 2)
+
+
+def test_particle_frames_positions():
+    engine = PlantDiagramEngine(all_units())
+    n_frames = 10
+    xy = engine.particle_frames(n_frames=n_frames)[0]
+
+    # 第k帧与 flow_position = 100·k/帧数 时逐帧绘制的粒子位置一致
+    for k in (0, 3, 9):
+        expected = engine._create_flow_particles(100 * k / n_frames)[0]
+        np.testing.assert_allclose(xy[k], expected)
+    # 一个周期后回到起点，便于循环播放
+    np.testing.assert_allclose(engine._create_flow_particles(100)[0], xy[0], atol=1e-9)
+
+    # 第0帧每根管道的首个粒子位于管道起点，其余粒子等间距分布在管道上
+    paths = engine._path_arrays()
+    pipes = active_pipes(engine)
+    first = xy[0, ::PARTICLES_PER_PIPE]
+    np.testing.assert_allclose(first, paths["start"][pipes])
+    for n, i in enumerate(pipes):
+        points = xy[0, n * PARTICLES_PER_PIPE:(n + 1) * PARTICLES_PER_PIPE]
+        progress = np.arange(PARTICLES_PER_PIPE) / PARTICLES_PER_PIPE
+        curve = 0.1 * np.sin(progress * np.pi)
+        expected = paths["start"][i] + np.outer(progress, paths["delta"][i]) + np.outer(curve, paths["normal"][i])
+        np.testing.assert_allclose(points, expected)
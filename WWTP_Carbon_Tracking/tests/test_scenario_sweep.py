@@ -0,0 +1,41 @@
+import pytest
+
+from src.carbon_calculator import CarbonCalculator
+from src.scenario_sweep import ENERGY_RANGE, SWEEP_COVERED_AREAS, ScenarioSweep
+
+
+def test_energy_adjust_lookup_and_surface(make_frame):
+    calculator = CarbonCalculator()
+    df_calc = calculator.calculate_all(make_frame(["2024-01-01", "2024-01-02", "2024-01-03"]))
+    sweep = ScenarioSweep(df_calc, energy_adjust={"预处理区": ENERGY_RANGE, "出水区": ENERGY_RANGE})
+
+    energy = df_calc["energy_CO2eq"].sum()
+    share = calculator.energy_distribution
+    result = sweep.lookup(10, -5, 预处理区能耗调整=20, 出水区能耗调整=-10)
+    assert result["energy_reductions"] == pytest.approx(
+        {"预处理区能耗调整": energy * share["预处理区"] * 0.2, "出水区能耗调整": -energy * share["出水区"] * 0.1})
+    assert result["reduction"] == pytest.approx(
+        result["bio_reduction"] + result["depth_reduction"] + sum(result["energy_reductions"].values()))
+
+    surface = sweep.surface(预处理区能耗调整=20, 出水区能耗调整=-10)
+    assert surface.loc[10, -5] == pytest.approx(result["reduction"])
+    assert "预处理区能耗调整" in sweep.pareto_front().columns
+
+
+def test_grid_point_matches_hand_computed_value(make_frame):
+    df_calc = CarbonCalculator().calculate_all(make_frame(["2024-01-01", "2024-01-02"]))
+    bio, depth = df_calc["bio_CO2eq"].sum(), df_calc["depth_CO2eq"].sum()
+    energy = df_calc["energy_CO2eq"].sum()
+    sweep = ScenarioSweep(df_calc, energy_adjust={"泥处理区": ENERGY_RANGE})
+
+    # 曝气-10%、PAC+20%、泥处理区能耗+15%（泥处理区电耗分配比例0.0507）
+    expected = bio * -0.10 + depth * 0.20 + energy * 0.0507 * 0.15
+    assert sweep.lookup(-10, 20, 泥处理区能耗调整=15)["reduction"] == pytest.approx(expected)
+    assert sweep.surface(泥处理区能耗调整=15).loc[-10, 20] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("area", SWEEP_COVERED_AREAS)
+def test_areas_covered_by_aeration_and_pac_are_rejected(area, make_frame):
+    df_calc = CarbonCalculator().calculate_all(make_frame(["2024-01-01"]))
+    with pytest.raises(ValueError):
+        ScenarioSweep(df_calc, energy_adjust={area: ENERGY_RANGE})
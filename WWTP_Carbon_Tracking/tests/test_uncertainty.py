@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src import uncertainty
+from src.emission_factors import FactorRegistry
+from src.uncertainty import SUMMARY_COLUMNS, FactorDistribution, MonteCarloEngine
+
+
+def make_registry():
+    registry = FactorRegistry()
+    registry.add("华东电网", "f_e", 0.5, "2024-01-01", "2024-01-31")
+    registry.add("华东电网", "EF_PAC", 3.0, "2024-01-01")
+    return registry
+
+
+def test_distributions_centred_on_factor_set(make_frame):
+    df = make_frame(["2024-01-01", "2024-01-15", "2024-02-01"])
+    registry = make_registry()
+    factors = registry.factor_arrays(df["日期"], "华东电网")
+    expected = registry.calculate(df, "华东电网")[SUMMARY_COLUMNS].sum().to_numpy()
+
+    # 分布退化为以默认因子为中心的定值时，每个样本都应等于所选因子集下的核算结果
+    centre = registry.calculator.emission_factors()
+    fixed = {name: FactorDistribution("fixed", value=value) for name, value in centre.items()}
+    totals = MonteCarloEngine(distributions=fixed, seed=0).sample_totals(df, 10, factors=factors)
+    np.testing.assert_allclose(totals.to_numpy(), np.tile(expected, (10, 1)), rtol=1e-6)
+
+    bands = MonteCarloEngine(seed=0).run(df, 20_000, factors=factors)
+    np.testing.assert_allclose(bands.loc["点估计"].to_numpy(), expected, rtol=1e-6)
+    assert bands.loc["P50", "total_CO2eq"] == pytest.approx(expected[-1], rel=0.05)
+
+
+def test_process_pool_only_above_size_threshold(monkeypatch, make_frame):
+    df = make_frame(["2024-01-01", "2024-01-02", "2024-01-03"])
+    engine = MonteCarloEngine(seed=0)
+    serial = engine.sample_totals(df, 200, block_size=50)
+
+    class NoPool:
+        def __init__(self, *args, **kwargs):
+            raise AssertionError("规模低于阈值时不应启用进程池")
+
+    # 默认阈值下小规模计算即使 n_jobs>1 也保持串行
+    monkeypatch.setattr(uncertainty, "ProcessPoolExecutor", NoPool)
+    small = engine.sample_totals(df, 200, block_size=50, n_jobs=2)
+    np.testing.assert_array_equal(small.to_numpy(), serial.to_numpy())
+
+    # 超过阈值时分发到进程池，结果与串行一致
+    pools = []
+
+    class CountingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs.get("max_workers"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(uncertainty, "ProcessPoolExecutor", CountingPool)
+    monkeypatch.setattr(uncertainty, "PARALLEL_MIN_CELLS", 0)
+    parallel = engine.sample_totals(df, 200, block_size=50, n_jobs=2)
+    assert pools == [2]
+    np.testing.assert_array_equal(parallel.to_numpy(), serial.to_numpy())
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+
+from src.carbon_calculator import CarbonCalculator
+from src.unit_allocation import UnitAllocation
+
+
+def test_daily_mean_sums_rows_of_the_same_day(make_frame):
+    # 同一天两行（如上下午两次记录）应先相加再按天平均
+    df_calc = CarbonCalculator().calculate_all(
+        make_frame(["2024-01-01 08:00", "2024-01-01 20:00", "2024-01-02 08:00"]))
+    allocation = UnitAllocation.from_areas()
+    per_row = allocation.apply(df_calc)
+    expected = (per_row.iloc[:2].sum() + per_row.iloc[2]) / 2
+
+    pd.testing.assert_series_equal(allocation.daily_mean(df_calc), expected)
+    assert allocation.daily_mean(df_calc).sum() == pytest.approx(
+        df_calc["total_CO2eq"].sum() / 2, rel=1e-6)
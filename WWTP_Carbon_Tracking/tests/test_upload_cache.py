@@ -0,0 +1,111 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.upload_cache import HAS_PARQUET, UploadCache
+
+
+class CountingLoader:
+    """记录调用次数的解析函数，每次返回内容相同的新DataFrame"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, data):
+        self.calls.append(data)
+        df = pd.DataFrame({"日期": pd.date_range("2024-01-01", periods=3), "处理水量(m³)": [1.0, 2.0, 3.0]})
+        return df, {"rows": len(df)}
+
+
+def disk_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith((".parquet", ".json")))
+
+
+def test_hit_and_miss_by_content_hash():
+    cache = UploadCache()
+    loader = CountingLoader()
+
+    df, info = cache.get_or_load(b"a,b\n1,2\n", loader)
+    again, _ = cache.get_or_load(b"a,b\n1,2\n", loader)
+    assert loader.calls == [b"a,b\n1,2\n"]
+    pd.testing.assert_frame_equal(again, df)
+
+    # 内容不同即未命中，与文件名无关
+    cache.get_or_load(b"a,b\n1,3\n", loader)
+    assert len(loader.calls) == 2
+    # 调用方传入预先计算的哈希与自动计算等价
+    cache.get_or_load(b"a,b\n1,3\n", loader, key=UploadCache.content_hash(b"a,b\n1,3\n"))
+    assert len(loader.calls) == 2
+    assert info == {"rows": 3}
+
+
+def test_returned_frame_does_not_alter_cache():
+    cache = UploadCache()
+    df, _ = cache.get_or_load(b"x", CountingLoader())
+    df["新列"] = 0
+    again, _ = cache.get_or_load(b"x", CountingLoader())
+    assert "新列" not in again.columns
+
+
+def test_lru_eviction_order():
+    cache = UploadCache(max_entries=2)
+    loader = CountingLoader()
+    cache.get_or_load(b"a", loader)
+    cache.get_or_load(b"b", loader)
+    cache.get_or_load(b"a", loader)  # a 成为最近使用
+    cache.get_or_load(b"c", loader)  # 淘汰最久未使用的 b
+    assert loader.calls == [b"a", b"b", b"c"]
+
+    cache.get_or_load(b"a", loader)
+    cache.get_or_load(b"c", loader)
+    assert loader.calls == [b"a", b"b", b"c"]
+    cache.get_or_load(b"b", loader)
+    assert loader.calls == [b"a", b"b", b"c", b"b"]
+
+
+@pytest.mark.skipif(not HAS_PARQUET, reason="需要pyarrow")
+def test_disk_tier_survives_memory_clear(tmp_path):
+    cache = UploadCache(cache_dir=str(tmp_path))
+    loader = CountingLoader()
+    df, info = cache.get_or_load(b"a", loader)
+    cache.clear()
+
+    again, again_info = cache.get_or_load(b"a", loader)
+    assert len(loader.calls) == 1
+    pd.testing.assert_frame_equal(again, df, check_freq=False)
+    assert again_info == info
+
+
+@pytest.mark.skipif(not HAS_PARQUET, reason="需要pyarrow")
+def test_disk_eviction_by_mtime(tmp_path):
+    loader = CountingLoader()
+    cache = UploadCache(cache_dir=str(tmp_path))
+    cache.get_or_load(b"a", loader)
+    entry_bytes = sum(os.path.getsize(tmp_path / name) for name in disk_files(tmp_path))
+    cache.get_or_load(b"b", loader)
+
+    # a 较旧、b 较新；随后重新读取 a（磁盘命中）会刷新其访问时间
+    for key, mtime in ((b"a", 1_000_000), (b"b", 2_000_000)):
+        for path in cache._paths(UploadCache.content_hash(key)):
+            os.utime(path, (mtime, mtime))
+    reader = UploadCache(cache_dir=str(tmp_path))
+    reader.get_or_load(b"a", loader)
+    assert len(loader.calls) == 2
+
+    # 上限只容纳两份数据：写入 c 时淘汰访问时间最旧的 b
+    limited = UploadCache(cache_dir=str(tmp_path), max_disk_bytes=2 * entry_bytes)
+    limited.get_or_load(b"c", loader)
+    names = {f"v1-{UploadCache.content_hash(k)}" for k in (b"a", b"c")}
+    assert disk_files(tmp_path) == sorted(f"{n}.{ext}" for n in names for ext in ("json", "parquet"))
+
+
+@pytest.mark.skipif(not HAS_PARQUET, reason="需要pyarrow")
+def test_version_change_invalidates_disk_cache(tmp_path):
+    loader = CountingLoader()
+    UploadCache(cache_dir=str(tmp_path), version="1").get_or_load(b"a", loader)
+    UploadCache(cache_dir=str(tmp_path), version="1").get_or_load(b"a", loader)
+    assert len(loader.calls) == 1
+
+    UploadCache(cache_dir=str(tmp_path), version="2").get_or_load(b"a", loader)
+    assert len(loader.calls) == 2
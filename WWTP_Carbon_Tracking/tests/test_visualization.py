@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from src import visualization as vis
+from src.carbon_calculator import AREA_COLUMNS, CarbonCalculator
+from src.unit_allocation import SOURCE_COLUMNS, area_matrix
+
+
+@pytest.fixture
+def positive_calc(make_frame):
+    df = make_frame(["2024-01-01", "2024-01-02", "2024-01-03"])
+    # 进水浓度高于出水，N₂O/CH₄为正，各排放源都有连线
+    df["进水TN(mg/L)"] = df["出水TN(mg/L)"] + 20
+    df["进水COD(mg/L)"] = df["出水COD(mg/L)"] + 200
+    return CarbonCalculator().calculate_all(df)
+
+
+@pytest.mark.parametrize("level", ["area", "unit"])
+def test_sankey_flow_is_conserved(level, positive_calc):
+    df_calc = positive_calc
+    sankey = vis.create_sankey_diagram(df_calc, level=level).data[0]
+    link, n_nodes = sankey.link, len(sankey.node.label)
+    inflow = np.bincount(link.target, weights=link.value, minlength=n_nodes)
+    outflow = np.bincount(link.source, weights=link.value, minlength=n_nodes)
+
+    # 排放源节点流出等于该排放源按区域分配比例计入的合计，每个排放源只计入一次
+    # （电耗分配比例沿用核算器的方案表取值，之和为1.0247）
+    totals = df_calc[SOURCE_COLUMNS].sum().to_numpy() * area_matrix().sum(axis=1).to_numpy()
+    np.testing.assert_allclose(outflow[:len(SOURCE_COLUMNS)], totals)
+    assert not inflow[:len(SOURCE_COLUMNS)].any()
+
+    # 区域节点流入等于区域排放列；单元级时区域流出等于流入
+    areas = slice(len(SOURCE_COLUMNS), len(SOURCE_COLUMNS) + len(AREA_COLUMNS))
+    np.testing.assert_allclose(inflow[areas], df_calc[list(AREA_COLUMNS.values())].sum().to_numpy())
+    if level == "unit":
+        np.testing.assert_allclose(outflow[areas], inflow[areas])
+    sinks = inflow[outflow == 0].sum()
+    assert sinks == pytest.approx(totals.sum())